@@ -0,0 +1,260 @@
+# ################### Many cubes on the cubie level as NumPy arrays ####################################################
+
+# A CubieBatch holds N cubes in an (N, 40) uint8 array with the same layout as the bytearray of a CubieCube: the corner
+# permutation, the edge permutation, the corner orientation and the edge orientation. All operations work on all cubes
+# at once. The coordinates are identical to the coordinates of CubieCube, so they can index the move tables directly,
+# for example with np_table from numpy_tables.py:
+#   twist_move = np_table(mv.twist_move, np.uint16, N_MOVE)
+#   twist1 = twist_move[batch.get_twist(), m]
+# NumPy is required.
+
+import numpy as np
+import twophase.cubie as cb
+from twophase.defs import cornerFacelet, edgeFacelet, cornerColor, edgeColor, N_MOVE
+from twophase.enums import Color
+from twophase.misc import C_NK as C_NK_LIST
+
+CO_MULT = np.frombuffer(cb.CO_MULT, dtype=np.uint8)
+CO_INV = np.frombuffer(cb.CO_INV, dtype=np.uint8)
+C_NK = np.array(C_NK_LIST, dtype=np.int64)  # binomial coefficients
+COLOR_NAMES = np.array([ord(c.name) for c in Color], dtype=np.uint8)
+
+
+def rotate(a, k, right):
+    """Rotate each row of a by the number of places in k, to the right or to the left."""
+    n = a.shape[1]
+    idx = (np.arange(n) + (-k if right else k)[:, None]) % n
+    return np.take_along_axis(a, idx, axis=1)
+
+
+def perm_rank(perm, offset=0):
+    """
+    The rank of permutations as computed by CubieCube.get_corners.
+    :param perm: An (N, n) array, each row is a permutation of offset, ..., offset + n - 1
+    """
+    perm = perm.astype(np.int64) - offset
+    b = np.zeros(len(perm), dtype=np.int64)
+    for j in range(perm.shape[1] - 1, 0, -1):
+        p = np.argmax(perm == j, axis=1)  # rotate left until perm[j] == j
+        k = (p + 1) % (j + 1)
+        perm = rotate(perm, k, False)[:, :j]
+        b = (j + 1) * b + k
+    return b
+
+
+def perm_unrank(idx, n, offset=0):
+    """The permutations with the given ranks as (N, n) array, the inverse of perm_rank."""
+    idx = np.asarray(idx, dtype=np.int64)
+    perm = np.tile(np.arange(offset, offset + n, dtype=np.uint8), (len(idx), 1))
+    for j in range(n):
+        k = idx % (j + 1)
+        idx = idx // (j + 1)
+        perm[:, :j + 1] = rotate(perm[:, :j + 1], k, True)
+    return perm
+
+
+def parity(perm):
+    """The parities of the permutations in the rows of perm."""
+    n = perm.shape[1]
+    i, j = np.triu_indices(n, 1)
+    return np.count_nonzero(perm[:, i] > perm[:, j], axis=1) % 2
+
+
+class CubieBatch:
+    """Represent N cubes on the cubie level."""
+
+    def __init__(self, data):
+        """
+        :param data: An (N, 40) uint8 array in the layout of the CubieCube bytearray, it is not copied
+        """
+        self.data = data
+        self.cp = data[:, cb.CP]
+        self.ep = data[:, cb.EP]
+        self.co = data[:, cb.CO]
+        self.eo = data[:, cb.EO]
+
+    @classmethod
+    def identity(cls, n):
+        """A batch of n solved cubes."""
+        return cls(np.tile(np.frombuffer(cb.CubieCube().data, dtype=np.uint8), (n, 1)))
+
+    @classmethod
+    def from_cubes(cls, cubes):
+        """A batch of copies of the cubes in CubieCube representation."""
+        return cls(np.frombuffer(b''.join(c.data for c in cubes), dtype=np.uint8).reshape(-1, 40).copy())
+
+    @classmethod
+    def random(cls, n, rng=None):
+        """
+        Generate n random cubes. The probability is the same for all possible states.
+        :param rng: A numpy.random.Generator, by default a new generator with random seed
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        b = cls(np.zeros((n, 40), dtype=np.uint8))
+        b.cp[:] = np.argsort(rng.random((n, 8)), axis=1)
+        b.ep[:] = np.argsort(rng.random((n, 12)), axis=1)
+        odd = parity(b.cp) != parity(b.ep)  # exchange two corners, so that the parities are the same
+        b.cp[odd, 6:8] = b.cp[odd, 7:5:-1]
+        b.set_twist(rng.integers(0, 2187, n))
+        b.set_flip(rng.integers(0, 2048, n))
+        return b
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, i):
+        """The cube with index i in CubieCube representation."""
+        return cb.CubieCube(self.cp[i].tobytes(), self.co[i].tobytes(), self.ep[i].tobytes(), self.eo[i].tobytes())
+
+    def to_cubes(self):
+        """Return the cubes as a list of CubieCubes."""
+        return [self[i] for i in range(len(self))]
+
+    def copy(self):
+        return CubieBatch(self.data.copy())
+
+    def to_facelet_strings(self):
+        """Return the cube definition strings of the cubes, see face.FaceCube.to_string."""
+        f = np.tile(np.repeat(np.arange(6, dtype=np.uint8), 9), (len(self), 1))  # the centers
+        colors = np.array(cornerColor)
+        for i in range(8):
+            for k in range(3):
+                f[np.arange(len(self)), np.array(cornerFacelet[i])[(k + self.co[:, i]) % 3]] = colors[self.cp[:, i], k]
+        colors = np.array(edgeColor)
+        for i in range(12):
+            for k in range(2):
+                f[np.arange(len(self)), np.array(edgeFacelet[i])[(k + self.eo[:, i]) % 2]] = colors[self.ep[:, i], k]
+        return [s.decode() for s in COLOR_NAMES[f].view('S54').ravel()]
+
+    def multiply(self, b):
+        """
+        Multiply all cubes with b. Does not change b.
+        :param b: A CubieBatch of the same length or a single CubieCube which multiplies all cubes
+        """
+        if isinstance(b, cb.CubieCube):
+            b = CubieBatch(np.frombuffer(b.data, dtype=np.uint8).reshape(1, 40))
+        b_cp = np.broadcast_to(b.cp, self.cp.shape)
+        b_ep = np.broadcast_to(b.ep, self.ep.shape)
+        co = CO_MULT[6 * np.take_along_axis(self.co, b_cp, axis=1) + b.co]
+        eo = np.take_along_axis(self.eo, b_ep, axis=1) ^ b.eo
+        self.cp[:] = np.take_along_axis(self.cp, b_cp, axis=1)
+        self.ep[:] = np.take_along_axis(self.ep, b_ep, axis=1)
+        self.co[:] = co
+        self.eo[:] = eo
+
+    def move(self, m):
+        """Apply the move m to all cubes, m may also be an array with a move for each cube."""
+        if np.ndim(m) == 0:
+            self.multiply(cb.moveCube[m])
+        else:
+            moves = CubieBatch.from_cubes(cb.moveCube)
+            self.multiply(CubieBatch(moves.data[np.asarray(m) % N_MOVE]))
+
+    def inverse(self):
+        """Return the inverse cubes."""
+        d = CubieBatch(np.zeros_like(self.data))
+        np.put_along_axis(d.cp, self.cp.astype(np.int64), np.arange(8, dtype=np.uint8)[None, :], axis=1)
+        np.put_along_axis(d.co, self.cp.astype(np.int64), CO_INV[self.co], axis=1)
+        np.put_along_axis(d.ep, self.ep.astype(np.int64), np.arange(12, dtype=np.uint8)[None, :], axis=1)
+        np.put_along_axis(d.eo, self.ep.astype(np.int64), self.eo, axis=1)
+        return d
+
+    def corner_parity(self):
+        return parity(self.cp)
+
+    def edge_parity(self):
+        return parity(self.ep)
+
+    def verify(self):
+        """Return a boolean array, True for the valid cubes. See CubieCube.verify for the conditions."""
+        ok = np.all(np.sort(self.cp, axis=1) == np.arange(8), axis=1)
+        ok &= np.all(np.sort(self.ep, axis=1) == np.arange(12), axis=1)
+        ok &= np.all(self.co < 3, axis=1) & np.all(self.eo < 2, axis=1)
+        ok &= (self.co.sum(axis=1) % 3 == 0) & (self.eo.sum(axis=1) % 2 == 0)
+        return ok & (self.corner_parity() == self.edge_parity())
+
+# ###################################### coordinates for phase 1 and 2 #################################################
+    def get_twist(self):
+        return self.co[:, :7].astype(np.int64) @ 3 ** np.arange(6, -1, -1)
+
+    def set_twist(self, twist):
+        twist = np.asarray(twist, dtype=np.int64)
+        for i in range(6, -1, -1):
+            self.co[:, i] = twist % 3
+            twist = twist // 3
+        self.co[:, 7] = -self.co[:, :7].sum(axis=1, dtype=np.int64) % 3
+
+    def get_flip(self):
+        return self.eo[:, :11].astype(np.int64) @ 2 ** np.arange(10, -1, -1)
+
+    def set_flip(self, flip):
+        flip = np.asarray(flip, dtype=np.int64)
+        for i in range(10, -1, -1):
+            self.eo[:, i] = flip % 2
+            flip = flip // 2
+        self.eo[:, 11] = self.eo[:, :11].sum(axis=1, dtype=np.int64) % 2
+
+    @staticmethod
+    def get_edges4(ep, first):
+        """The location index a < 495 and the permutation index b < 24 of the edges first, ..., first + 3 in ep."""
+        mask = (ep >= first) & (ep < first + 4)
+        x = np.cumsum(mask[:, ::-1], axis=1)[:, ::-1]  # number of these edges at positions >= j
+        a = np.where(mask, C_NK[11 - np.arange(12), x], 0).sum(axis=1)
+        return a, perm_rank(ep[mask].reshape(-1, 4), first)
+
+    @staticmethod
+    def set_edges4(idx, first, other):
+        """The edge permutations with the edges first, ..., first + 3 at the location and in the order given by idx."""
+        idx = np.asarray(idx, dtype=np.int64)
+        a = idx // 24
+        edge4 = perm_unrank(idx % 24, 4, first)
+        ep = np.zeros((len(idx), 12), dtype=np.uint8)
+        x = np.full(len(idx), 4)
+        n_other = np.zeros(len(idx), dtype=np.int64)
+        for j in range(12):
+            c = C_NK[11 - j, x]
+            is4 = (x > 0) & (a - c >= 0)
+            ep[:, j] = np.where(is4, edge4[np.arange(len(idx)), np.minimum(4 - x, 3)],
+                                np.asarray(other, dtype=np.uint8)[np.minimum(n_other, 7)])
+            a -= np.where(is4, c, 0)
+            x -= is4
+            n_other += ~is4
+        return ep
+
+    def get_slice(self):
+        return self.get_edges4(self.ep, 8)[0]
+
+    def get_slice_sorted(self):
+        a, b = self.get_edges4(self.ep, 8)
+        return 24 * a + b
+
+    def set_slice_sorted(self, idx):
+        self.ep[:] = self.set_edges4(idx, 8, range(8))
+
+    def get_u_edges(self):
+        a, b = self.get_edges4(np.roll(self.ep, 4, axis=1), 0)
+        return 24 * a + b
+
+    def set_u_edges(self, idx):
+        self.ep[:] = np.roll(self.set_edges4(idx, 0, range(4, 12)), -4, axis=1)
+
+    def get_d_edges(self):
+        a, b = self.get_edges4(np.roll(self.ep, 4, axis=1), 4)
+        return 24 * a + b
+
+    def set_d_edges(self, idx):
+        self.ep[:] = np.roll(self.set_edges4(idx, 4, list(range(8, 12)) + list(range(4))), -4, axis=1)
+
+    def get_corners(self):
+        return perm_rank(self.cp)
+
+    def set_corners(self, idx):
+        self.cp[:] = perm_unrank(idx, 8)
+
+    def get_ud_edges(self):
+        """ud_edges is only defined for cubes in phase 2, where the first 8 edges are the U and D edges."""
+        return perm_rank(self.ep[:, :8])
+
+    def set_ud_edges(self, idx):
+        self.ep[:, :8] = perm_unrank(idx, 8)
+# ###################################### end coordinates for phase 1 and 2 #############################################
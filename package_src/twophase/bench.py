@@ -0,0 +1,327 @@
+# ################### Benchmarks of the solver #########################################################################
+
+# python -m twophase.bench --json result.json
+# python -m twophase.bench --baseline result.json
+# The cubes are taken from corpora generated with a fixed seed, so two runs with the same arguments measure the same
+# cubes. The micro-benchmarks measure single parts of the solver, the solve benchmarks the complete solver as used by
+# solver.solve. The results can be saved as JSON and compared with a saved baseline, a metric which is worse than in
+# the baseline by more than the tolerance counts as regression.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import threading as thr
+import time
+import twophase.coord as coord
+import twophase.cubie as cubie
+import twophase.pruning as pr
+import twophase.solver as sv
+import twophase.tables as tables
+from twophase.enums import Move
+
+CORPORA = ('random', 'scramble12', 'phase2')
+# metric suffix: 1 if higher values are better, -1 if lower values are better, the first matching suffix counts
+BETTER = {'_per_s': 1, '_s': -1, '_ms': -1, '_us': -1, 'avg_length': -1}
+
+
+def scramble(rng, length, moves=tuple(Move)):
+    """Return the cube, in CubieCube representation, generated by length random moves."""
+    cc = cubie.CubieCube()
+    last = None
+    for _ in range(length):
+        m = rng.choice([m for m in moves if last is None or m // 3 != last // 3])  # no two moves on the same face
+        cc.multiply(cubie.moveCube[m])
+        last = m
+    return cc
+
+
+def corpus(name, n, seed=1):
+    """
+    Return n cubes in CubieCube representation, the same cubes for the same name, n and seed.
+    :param name: 'random' for cubes with the same probability for all states, 'scramble12' for cubes scrambled by 12
+     random moves, 'phase2' for cubes scrambled by 10 random phase 2 moves, which are in the subgroup H and can be
+     solved by phase 2 alone
+    """
+    rng = random.Random('%s-%d' % (name, seed))
+    cubes = []
+    for _ in range(n):
+        if name == 'random':
+            cc = cubie.CubieCube()
+            cc.randomize(rng)
+        elif name == 'scramble12':
+            cc = scramble(rng, 12)
+        elif name == 'phase2':
+            cc = scramble(rng, 10, pr.PHASE2_MOVES)
+        else:
+            raise ValueError('corpus must be one of ' + ', '.join(CORPORA))
+        cubes.append(cc)
+    return cubes
+
+
+def cubestrings(cubes):
+    return [cc.to_facelet_cube().to_string() for cc in cubes]
+
+
+def per_call_us(func, args):
+    """Call func for each element of args and return the average time per call in microseconds."""
+    t = time.perf_counter()
+    for a in args:
+        func(a)
+    return 1e6 * (time.perf_counter() - t) / len(args)
+
+
+# ####################################### the benchmarks ###############################################################
+# Each benchmark takes the parsed command line arguments and returns a dictionary of metrics.
+
+def bench_table_load(args):
+    """The time to load all tables, which exist as files."""
+    tables.load()
+    times = []
+    for _ in range(3):
+        tables.unload()
+        t = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tables.load()
+        times.append(time.perf_counter() - t)
+    return {'load_s': min(times)}
+
+
+def bench_coord_cube(args):
+    """The time to compute the coordinates of a cube."""
+    tables.load()
+    cubes = corpus('random', args.cubes, args.seed)
+    return {'coord_cube_us': per_call_us(coord.CoordCube, cubes)}
+
+
+def bench_depth_phase1(args):
+    """The time to compute the exact phase 1 distance of a cube from the pruning table."""
+    tables.load()
+    cubes = [coord.CoordCube(cc) for cc in corpus('random', args.cubes, args.seed)]
+    return {'depth_phase1_us': per_call_us(coord.CoordCube.get_depth_phase1, cubes)}
+
+
+def search_stats(cubes, ret_length, timeout):
+    """Search each cube with a single thread without rotation and inversion, see SolverThread, return SearchStats."""
+    stats = sv.SearchStats()
+    for cc in cubes:
+        th = sv.CountingSolverThread(cc, 0, 0, ret_length, timeout, time.monotonic(), [], thr.Event(), [999],
+                                     stats=stats)
+        th.run()
+    return stats
+
+
+def bench_phase1_nodes(args):
+    """The node rate of a single search thread on random cubes, where almost all nodes are phase 1 nodes."""
+    tables.load()
+    t = search_stats(corpus('random', args.cubes, args.seed), 0, args.timeout).totals()  # search until the timeout
+    return {'phase1_nodes_per_s': t['phase1_nodes'] / t['time'], 'nodes_per_s': t['nodes_per_second']}
+
+
+def bench_phase2_nodes(args):
+    """The phase 2 node rate of a single search thread on cubes in the subgroup H, where phase 1 is solved at once and
+    almost all nodes are phase 2 nodes. The search stops at the first solution, the time includes the setup of the
+    search."""
+    tables.load()
+    cubes = corpus('phase2', args.cubes, args.seed)
+    t = search_stats(cubes, 99, args.timeout).totals()
+    return {'phase2_nodes_per_s': t['phase2_nodes'] / t['time'], 'phase2_search_us': 1e6 * t['time'] / len(cubes)}
+
+
+def solve_corpus(name, args):
+    """Solve the cubes of a corpus with solver.solve."""
+    tables.load()
+    times, lengths = [], []
+    stats = sv.SearchStats()
+    for s in cubestrings(corpus(name, args.cubes, args.seed)):
+        t = time.perf_counter()
+        man = sv.solve(s, args.max_length, args.timeout, stats=stats, deterministic=args.deterministic,
+                       max_nodes=args.max_nodes)
+        times.append(time.perf_counter() - t)
+        lengths.append(int(man.split('(')[1].split('f')[0]))
+    return {'avg_length': statistics.mean(lengths), 'solve_avg_ms': 1e3 * statistics.mean(times),
+            'solve_max_ms': 1e3 * max(times), 'nodes_per_s': stats.totals()['nodes_per_second'],
+            'lengths': {str(k): lengths.count(k) for k in sorted(set(lengths))}}
+
+
+def bench_solve_random(args):
+    """solver.solve on random cubes."""
+    return solve_corpus('random', args)
+
+
+def bench_solve_scramble12(args):
+    """solver.solve on cubes scrambled by 12 moves."""
+    return solve_corpus('scramble12', args)
+
+
+def bench_socket(args):
+    """The round-trip time of requests to the socket server with a single worker process."""
+    import asyncio
+    import twophase.sockets as sockets
+    tables.load()
+    with socket.socket() as s:  # find a free port
+        s.bind(('localhost', 0))
+        port = s.getsockname()[1]
+    server = sockets.SolverServer(args.max_length, args.timeout, workers=1)
+    running = {}
+
+    async def serve():
+        running['loop'], running['task'] = asyncio.get_running_loop(), asyncio.current_task()
+        try:
+            await server.serve(port)
+        except asyncio.CancelledError:
+            pass
+
+    th = thr.Thread(target=asyncio.run, args=(serve(),))
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):  # the server prints each connection
+        th.start()
+        try:
+            defstrs = cubestrings(corpus('scramble12', min(args.cubes, 20), args.seed))
+            for i, defstr in enumerate([defstrs[0]] + defstrs):  # the first request only starts the worker
+                t = time.perf_counter()
+                for _ in range(100):
+                    try:
+                        conn = socket.create_connection(('localhost', port))
+                        break
+                    except ConnectionRefusedError:  # the server is still starting
+                        time.sleep(0.1)
+                else:
+                    raise RuntimeError('the socket server does not start')
+                with conn, conn.makefile('rb') as f:
+                    conn.sendall((defstr + '\n').encode())
+                    f.readline()
+                    conn.shutdown(socket.SHUT_WR)  # the worker process started by the first request inherits conn
+                    if i > 0:
+                        times.append(time.perf_counter() - t)
+                        f.read()  # wait until the server has closed the connection
+        finally:
+            running['loop'].call_soon_threadsafe(running['task'].cancel)
+            th.join()
+    return {'round_trip_avg_ms': 1e3 * statistics.mean(times), 'round_trip_max_ms': 1e3 * max(times)}
+
+
+BENCHMARKS = {'table_load': bench_table_load, 'coord_cube': bench_coord_cube, 'depth_phase1': bench_depth_phase1,
+              'phase1_nodes': bench_phase1_nodes, 'phase2_nodes': bench_phase2_nodes,
+              'solve_random': bench_solve_random, 'solve_scramble12': bench_solve_scramble12, 'socket': bench_socket}
+# ######################################################################################################################
+
+
+def run(names=None, cubes=100, seed=1, timeout=0.1, max_length=20, backend=None, deterministic=False, max_nodes=None):
+    """
+    Run benchmarks and return the results as dictionary, with the benchmark names as keys of 'results'.
+    :param names: The names of the benchmarks, see BENCHMARKS, by default all
+    :param cubes: The number of cubes taken from the corpora
+    :param seed: The seed of the corpora
+    :param timeout: The timeout of the searches, see solver.solve
+    :param max_length: The max_length of the solves, see solver.solve
+    :param backend: The search backend, see solver.set_backend, by default the current one
+    :param deterministic: If True, the solve benchmarks use deterministic solves with the node limit max_nodes instead
+     of the timeout, so the solutions and the node counts are the same in each run, see solver.SolveHandle
+    :param max_nodes: The node limit of the solves, see solver.solve
+    """
+    if backend is not None:
+        sv.set_backend(backend)
+    args = argparse.Namespace(cubes=cubes, seed=seed, timeout=timeout, max_length=max_length,
+                              deterministic=deterministic, max_nodes=max_nodes)
+    result = {'info': {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+                       'implementation': platform.python_implementation(), 'machine': platform.machine(),
+                       'cpus': os.cpu_count(), 'backend': sv.backend, 'options': dict(tables.options),
+                       'cubes': cubes, 'seed': seed, 'timeout': timeout, 'max_length': max_length,
+                       'deterministic': deterministic, 'max_nodes': max_nodes},
+              'results': {}}
+    for name in names or BENCHMARKS:
+        print(name + '...', flush=True)
+        result['results'][name] = BENCHMARKS[name](args)
+    return result
+
+
+def direction(metric):
+    """Return 1 if higher values of the metric are better, -1 if lower values are better, 0 if it is not compared."""
+    for suffix, d in BETTER.items():
+        if metric.endswith(suffix):
+            return d
+    return 0
+
+
+def compare(result, baseline, tolerance=0.1):
+    """
+    Compare the metrics of two results of run.
+    :param tolerance: A metric is a regression if it is worse than in the baseline by more than this fraction
+    :return: A list of (benchmark, metric, baseline value, value, relative change, regression), the relative change is
+     positive for improvements
+    """
+    rows = []
+    for name, metrics in result['results'].items():
+        old_metrics = baseline['results'].get(name, {})
+        for metric, value in metrics.items():
+            d = direction(metric)
+            old = old_metrics.get(metric)
+            if d == 0 or not isinstance(old, (int, float)) or old == 0:
+                continue
+            change = d * (value - old) / old
+            rows.append((name, metric, old, value, change, change < -tolerance))
+    return rows
+
+
+def print_result(result):
+    for name, metrics in result['results'].items():
+        print(name)
+        for metric, value in metrics.items():
+            print('    %-20s %s' % (metric, '%.4g' % value if isinstance(value, float) else value))
+
+
+def print_comparison(rows):
+    print('%-18s %-20s %12s %12s %8s' % ('benchmark', 'metric', 'baseline', 'now', 'change'))
+    for name, metric, old, value, change, regression in rows:
+        print('%-18s %-20s %12.4g %12.4g %+7.1f%%%s' % (name, metric, old, value, 100 * change,
+                                                        '  REGRESSION' if regression else ''))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the two-phase solver.')
+    parser.add_argument('--only', default=None,
+                        help='comma separated benchmarks, default: all of ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--cubes', type=int, default=100, help='number of cubes of each corpus, default: 100')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the corpora, default: 1')
+    parser.add_argument('--timeout', type=float, default=0.1, help='timeout of the searches, default: 0.1')
+    parser.add_argument('--max-length', type=int, default=20, help='max_length of the solves, default: 20')
+    parser.add_argument('--deterministic', action='store_true',
+                        help='deterministic solves with the node limit --max-nodes instead of the timeout')
+    parser.add_argument('--max-nodes', type=int, default=None, help='node limit of the solves, see solver.solve')
+    parser.add_argument('--backend', choices=sv.BACKENDS, default=None, help='search backend, default: ' + sv.backend)
+    parser.add_argument('--folder', default=None, help='folder of the table files, default: ' + tables.table_folder)
+    for option in tables.OPTIONS:
+        parser.add_argument('--' + option.replace('_', '-'), choices=tables.OPTIONS[option], default=None,
+                            help='table option, see tables.OPTIONS')
+    parser.add_argument('--json', default=None, help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=None, help='compare the results with this JSON file of a former run')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='relative change of a metric which counts as regression, default: 0.1')
+    args = parser.parse_args()
+    names = args.only.split(',') if args.only else None
+    for n in names or []:
+        if n not in BENCHMARKS:
+            parser.error('unknown benchmark ' + n)
+    tables.configure(args.folder, **{option: getattr(args, option) for option in tables.OPTIONS})
+    res = run(names, args.cubes, args.seed, args.timeout, args.max_length, args.backend, args.deterministic,
+              args.max_nodes)
+    print_result(res)
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(res, fp, indent=2)
+    if args.baseline:
+        with open(args.baseline) as fp:
+            base = json.load(fp)
+        for key in ('backend', 'options', 'cubes', 'seed', 'timeout', 'max_length', 'deterministic', 'max_nodes'):
+            if base['info'].get(key) != res['info'][key]:
+                print('warning: the baseline was measured with ' + key + ' ' + str(base['info'].get(key)))
+        rows = compare(res, base, args.tolerance)
+        print_comparison(rows)
+        if any(r[-1] for r in rows):
+            raise SystemExit(1)
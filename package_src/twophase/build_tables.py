@@ -0,0 +1,112 @@
+# ################### Create all tables with several processes #########################################################
+
+# python -m twophase.build_tables --jobs 4
+# The tables which depend only on the cube model are created concurrently, one table per process. Then the pruning
+# tables are created from these, the two large ones with their breadth first search levels split across the processes
+# (needs NumPy, see numpy_tables.py). The table files are identical to the files created on the first run of the solver.
+
+import argparse
+import importlib
+import multiprocessing as mp
+import os
+import time
+import twophase.tables as tables
+
+# (module, variable) of the tables which do not depend on other tables
+INDEPENDENT_TABLES = [('symmetries', 'flipslice_classidx'), ('symmetries', 'corner_classidx'),
+                      ('symmetries', 'ud_edges_conj'), ('symmetries', 'twist_conj'),
+                      ('moves', 'ud_edges_move'), ('moves', 'corners_move'), ('moves', 'slice_sorted_move'),
+                      ('moves', 'u_edges_move'), ('moves', 'd_edges_move'), ('moves', 'flip_move'),
+                      ('moves', 'twist_move'), ('coord', 'u_edges_plus_d_edges_to_ud_edges')]
+
+
+def create_table(module_name, name, folder):
+    """Create (or load if the file exists) the table module_name.name in a worker process."""
+    tables.configure(folder, 'mmap')
+    getattr(importlib.import_module('twophase.' + module_name), name)
+    return module_name + '.' + name
+
+
+def worker_pool(jobs):
+    """Return a pool of jobs processes for create_table. A fresh process for each table, so a worker does not keep the
+    tables it created in memory. The pool starts the replacement workers from a thread of its own while the main thread
+    creates tables under tables.lock, so the workers are spawned: a forked worker would inherit the lock held by a
+    thread which does not exist in the worker and wait for it forever."""
+    return mp.get_context('spawn').Pool(jobs, maxtasksperchild=1)
+
+
+def create_tables(pool, names, folder):
+    """Start the creation of the tables (module, variable) in names in the worker processes of pool."""
+    return [pool.apply_async(create_table, (module_name, name, folder)) for module_name, name in names]
+
+
+def build(folder=None, jobs=None, force=False, bundle=False, successors=None, phase2_prun=None, phase1_prun=None):
+    """
+    Create all missing tables.
+    :param folder: The folder with the table files, see tables.configure
+    :param jobs: The number of processes, by default the number of cores
+    :param force: Delete the existing table files first, so that all tables are created again
+    :param bundle: Pack all tables into the bundle file tables.bundle afterwards, see tables.create_bundle
+    :param successors: 'mask' or 'full' to create the optional phase 2 successor table too, see tables.OPTIONS
+    :param phase2_prun: 'full' or 'exact' to create the optional complete phase 2 pruning table too
+    :param phase1_prun: 'huge' to create the optional huge phase 1 pruning table too, needs about 13 GB of memory
+    """
+    import twophase.pruning as pr
+    jobs = jobs or os.cpu_count()
+    # first the tables which are always needed
+    tables.configure(folder, 'mmap', successors='off', phase2_prun='depth10', phase1_prun='normal')
+    folder = tables.table_folder
+    if force:
+        tables.unload()
+        for fname in tables.FILES + tables.OPTIONAL_FILES + (tables.BUNDLE_FILE,):
+            if os.path.isfile(os.path.join(folder, fname)):
+                os.remove(os.path.join(folder, fname))
+    if pr.np_tables is None:
+        print('NumPy is not installed, the pruning tables are created by a single process.')
+
+    s_time = time.monotonic()
+    with worker_pool(jobs) as pool:
+        for r in create_tables(pool, INDEPENDENT_TABLES, folder):
+            print(r.get() + ' done')
+
+        cornslice, = create_tables(pool, [('pruning', 'cornslice_depth')], folder)
+        pr.create_phase1_prun_table(jobs)
+        print('pruning.flipslice_twist_depth3 done')
+        pr.create_phase2_prun_table(jobs)
+        print('pruning.corners_ud_edges_depth3 done')
+        print(cornslice.get() + ' done')
+    tables.configure(successors=successors, phase2_prun=phase2_prun, phase1_prun=phase1_prun)
+    if tables.enabled('phase2_successors'):
+        pr.create_phase2_successor_table(jobs)
+        print('pruning.phase2_successors done')
+    if tables.options['phase2_prun'] == 'full':
+        pr.create_phase2_prun_table(jobs)
+        print('pruning.corners_ud_edges_depth3 (complete) done')
+    if tables.enabled('corners_ud_edges_depth'):
+        pr.create_phase2_exact_prun_table(jobs)
+        print('pruning.corners_ud_edges_depth done')
+    if tables.enabled('flipslice_twist_tetrad_depth3'):
+        pr.create_phase1_huge_prun_table(jobs)
+        print('pruning.flipslice_twist_tetrad_depth3 done')
+    tables.load()
+    print('all tables created in ' + os.path.abspath(folder) + ' in ' + str(round(time.monotonic() - s_time)) + ' s')
+    if bundle:
+        tables.create_bundle()
+        tables.verify_bundle()
+        print('bundle file ' + os.path.join(folder, tables.BUNDLE_FILE) + ' created and verified')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create the tables of the two-phase solver with several processes.')
+    parser.add_argument('--jobs', type=int, default=None, help='number of processes, default: number of cores')
+    parser.add_argument('--folder', default=None, help='folder of the table files, default: ' + tables.table_folder)
+    parser.add_argument('--force', action='store_true', help='delete existing table files and create them again')
+    parser.add_argument('--bundle', action='store_true', help='pack all tables into the file ' + tables.BUNDLE_FILE)
+    parser.add_argument('--successors', choices=tables.OPTIONS['successors'][1:], default=None,
+                        help='also create the optional phase 2 successor table')
+    parser.add_argument('--phase2-prun', choices=tables.OPTIONS['phase2_prun'][1:], default=None,
+                        help='also create the optional complete phase 2 pruning table')
+    parser.add_argument('--phase1-prun', choices=tables.OPTIONS['phase1_prun'][1:], default=None,
+                        help='also create the optional huge phase 1 pruning table')
+    args = parser.parse_args()
+    build(args.folder, args.jobs, args.force, args.bundle, args.successors, args.phase2_prun, args.phase1_prun)
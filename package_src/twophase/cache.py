@@ -0,0 +1,227 @@
+# ################### Cache of solutions, shared by all cubes which are equivalent by symmetry ########################
+
+# The 48 symmetries of the cube and the inversion map a cube to up to 96 cubes which have solutions of the same length.
+# SolutionCache stores one solution for all of them, keyed on a canonical representative. The solution of a cube is
+# obtained from the solution of its representative by conjugation with a symmetry (see symmetries.conj_move) and
+# inversion of the maneuver. Set solver.solution_cache to a SolutionCache to use it in solver.solve.
+# SolutionDatabase is a persistent sqlite store of the solutions of exactly the cubes solved before, for workloads which
+# solve the same cubes again and again. Set solver.solution_db to a SolutionDatabase to use it in solver.solve.
+
+import dbm
+import sqlite3
+import threading as thr
+from collections import OrderedDict
+from operator import itemgetter
+import twophase.symmetries as sy
+from twophase.cubie import CO_MULT, CO_INV
+from twophase.defs import N_SYM, N_MOVE
+
+sym_cubes = None  # (cp, co, ep, eo) of symCube[j] and of its inverse for all symmetries j, see conjugate
+corner_maps = None  # (gather, translation) which conjugate a corner permutation by symCube[j], see canonical_form
+
+
+def conjugate(cp, co, ep, eo, j):
+    """Return the cube S*C*S^-1 with S = symCube[j] and C given by cp, co, ep and eo (sequences of ints) as one list."""
+    global sym_cubes
+    if sym_cubes is None:
+        sym_cubes = [tuple(list(map(int, getattr(sy.symCube[i], a))) for i in (k, sy.inv_idx[k])
+                           for a in ('cp', 'co', 'ep', 'eo')) for k in range(N_SYM)]
+    s_cp, s_co, s_ep, s_eo, i_cp, i_co, i_ep, i_eo = sym_cubes[j]
+    c = [cp[i_cp[k]] for k in range(8)]
+    e = [ep[i_ep[k]] for k in range(12)]
+    return ([s_cp[c[k]] for k in range(8)] +
+            [CO_MULT[6 * CO_MULT[6 * s_co[c[k]] + co[i_cp[k]]] + i_co[k]] for k in range(8)] +
+            [s_ep[e[k]] for k in range(12)] +
+            [(i_eo[k] + eo[i_ep[k]] + s_eo[e[k]]) % 2 for k in range(12)])
+
+
+def canonical_form(cc):
+    """
+    Find the canonical representative of the cubes equivalent to cc by symmetry and inversion.
+    :param cc: The cube in CubieCube representation
+    :return: (key, j, inv) where key is a bytes representation of the representative K and K = S*cc*S^-1 (inv = 0) or
+     K = (S*cc*S^-1)^-1 (inv = 1) with S = symCube[j]
+    """
+    global corner_maps
+    if corner_maps is None:
+        corner_maps = []
+        for j in range(N_SYM):
+            gather = itemgetter(*sy.symCube[sy.inv_idx[j]].cp)  # the corner permutation of C*S^-1
+            translation = bytes.maketrans(bytes(range(8)), bytes(sy.symCube[j].cp))  # of S*C*S^-1
+            corner_maps.append((gather, translation))
+    cube = (bytes(cc.cp), bytes(cc.co), bytes(cc.ep), bytes(cc.eo))
+    cp, co, ep, eo = cube
+    inverse = (bytearray(8), bytearray(8), bytearray(12), bytearray(12))
+    for c in range(8):
+        inverse[0][cp[c]] = c
+    for c in range(8):
+        inverse[1][c] = CO_INV[co[inverse[0][c]]]
+    for e in range(12):
+        inverse[2][ep[e]] = e
+    for e in range(12):
+        inverse[3][e] = eo[inverse[2][e]]
+
+    # The key starts with the corner permutation. So only the conjugates with the smallest corner permutation, mostly
+    # only one, are computed completely.
+    keys_cp = [bytes(gather(c_cp)).translate(translation) for c_cp in (cp, bytes(inverse[0]))
+               for gather, translation in corner_maps]  # in the order inv * N_SYM + j
+    best_cp = min(keys_cp)
+    best = None
+    for i, key_cp in enumerate(keys_cp):
+        if key_cp == best_cp:
+            inv, j = divmod(i, N_SYM)
+            key = bytes(conjugate(*(cube, inverse)[inv], j))
+            if best is None or key < best[0]:
+                best = (key, j, inv)
+    return best
+
+
+def invert_maneuver(man):
+    """Return the inverse maneuver, R1->R3, R2->R2, R3->R1 etc. in reversed order."""
+    return [(m // 3) * 3 + (2 - m % 3) for m in reversed(man)]
+
+
+def to_representative(man, j, inv):
+    """Transform a maneuver which solves a cube into a maneuver which solves its representative."""
+    if inv == 1:
+        man = invert_maneuver(man)
+    return [sy.conj_move[N_MOVE * j + m] for m in man]
+
+
+def from_representative(man, j, inv):
+    """Transform a maneuver which solves the representative into a maneuver which solves the cube."""
+    man = [sy.conj_move[N_MOVE * sy.inv_idx[j] + m] for m in man]
+    if inv == 1:
+        man = invert_maneuver(man)
+    return man
+
+
+class SolutionCache:
+    """LRU cache of solutions keyed on the canonical representative, with an optional on-disk backing store."""
+
+    def __init__(self, maxsize=100000, path=None):
+        """
+        :param maxsize: The maximal number of solutions kept in memory
+        :param path: The file of the on-disk store (a dbm database), None for a cache in memory only. The store must
+         not be used by several processes at the same time.
+        """
+        self.maxsize = maxsize
+        self.solutions = OrderedDict()  # key of representative -> maneuver as bytes
+        self.lock = thr.Lock()
+        self.db = dbm.open(path, 'c') if path is not None else None
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        """Close the on-disk store."""
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def lookup(self, key):
+        """Return the maneuver of the representative key as bytes or None."""
+        with self.lock:
+            man = self.solutions.get(key)
+            if man is not None:
+                self.solutions.move_to_end(key)
+                return man
+            if self.db is not None and key in self.db:
+                man = self.db[key]
+                self.insert(key, man)
+                return man
+            return None
+
+    def insert(self, key, man):
+        """Insert a maneuver into the LRU cache, called with the lock held."""
+        self.solutions[key] = man
+        self.solutions.move_to_end(key)
+        if len(self.solutions) > self.maxsize:
+            self.solutions.popitem(last=False)
+
+    def get(self, cc, max_length=20):
+        """
+        Return a cached maneuver which solves the cube.
+        :param cc: The cube in CubieCube representation
+        :param max_length: Only maneuvers with at most max_length moves are returned
+        :return: The maneuver as list of moves or None
+        """
+        key, j, inv = canonical_form(cc)
+        man = self.lookup(key)
+        if man is None or len(man) > max_length:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return from_representative(list(man), j, inv)
+
+    def put(self, cc, man):
+        """
+        Store a maneuver which solves the cube if no shorter maneuver is cached.
+        :param cc: The cube in CubieCube representation
+        :param man: The maneuver as list of moves
+        """
+        key, j, inv = canonical_form(cc)
+        man = bytes(to_representative([int(m) for m in man], j, inv))
+        old = self.lookup(key)
+        if old is not None and len(old) <= len(man):
+            return
+        with self.lock:
+            self.insert(key, man)
+            if self.db is not None:
+                self.db[key] = man
+
+
+class SolutionDatabase:
+    """Persistent store cubestring -> (maneuver, length, search time, max_length, timeout) in an sqlite file."""
+
+    def __init__(self, path):
+        """
+        :param path: The sqlite file, it is created if it does not exist. Several processes may use the same file.
+        """
+        self.lock = thr.Lock()
+        self.con = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self.con:
+            self.con.execute('CREATE TABLE IF NOT EXISTS solutions (cubestring TEXT PRIMARY KEY, maneuver TEXT, '
+                             'length INTEGER, time REAL, max_length INTEGER, timeout REAL)')
+
+    def close(self):
+        """Close the database."""
+        with self.lock:
+            self.con.close()
+
+    def entry(self, cubestring):
+        """Return (maneuver, length, time, max_length, timeout) of the stored solution of the cube or None."""
+        with self.lock:
+            return self.con.execute('SELECT maneuver, length, time, max_length, timeout FROM solutions '
+                                    'WHERE cubestring = ?', (cubestring,)).fetchone()
+
+    def get(self, cubestring, max_length=20, timeout=3):
+        """
+        Return the stored solution if it meets the request. This is the case if it has at most max_length moves or if
+        it was found by a search with at most max_length and at least timeout, so a new search gives no better result.
+        :return: The maneuver string as returned by solver.solve or None
+        """
+        e = self.entry(cubestring)
+        if e is None:
+            return None
+        maneuver, length, _, stored_max_length, stored_timeout = e
+        if length <= max_length or (stored_max_length <= max_length and stored_timeout >= timeout):
+            return maneuver
+        return None
+
+    def put(self, cubestring, maneuver, length, time, max_length, timeout):
+        """
+        Store a solution. An existing entry is replaced if the new solution is shorter. For a solution of the same
+        length the entry records the stronger search, the smaller max_length and the larger timeout.
+        :param maneuver: The maneuver string as returned by solver.solve
+        :param length: The number of moves of the maneuver
+        :param time: The search time in seconds
+        """
+        with self.lock, self.con:
+            e = self.con.execute('SELECT length, max_length, timeout FROM solutions WHERE cubestring = ?',
+                                 (cubestring,)).fetchone()
+            if e is None or length < e[0]:
+                self.con.execute('INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)',
+                                 (cubestring, maneuver, length, time, max_length, timeout))
+            elif length == e[0]:
+                self.con.execute('UPDATE solutions SET max_length = ?, timeout = ? WHERE cubestring = ?',
+                                 (min(max_length, e[1]), max(timeout, e[2]), cubestring))
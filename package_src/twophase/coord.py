@@ -1,6 +1,5 @@
 # ##### The cube on the coordinate level. It is described by a 3-tuple of natural numbers in phase 1 and phase 2. ######
 
-from os import path
 import array as ar
 
 import twophase.cubie as cb
@@ -8,11 +7,12 @@ import twophase.enums as enums
 import twophase.moves as mv
 import twophase.pruning as pr
 import twophase.symmetries as sy
-from twophase.defs import FOLDER, N_U_EDGES_PHASE2, N_PERM_4, N_CHOOSE_8_4, N_FLIP, N_TWIST, N_UD_EDGES, N_MOVE
+import twophase.tables as tables
+from twophase.defs import N_U_EDGES_PHASE2, N_PERM_4, N_CHOOSE_8_4, N_FLIP, N_TWIST, N_UD_EDGES, N_MOVE, \
+    N_CORNER_TETRAD
 from twophase.enums import Edge as Ed
 
 SOLVED = 0  # 0 is index of solved state (except for u_edges coordinate)
-u_edges_plus_d_edges_to_ud_edges = None  # global variable
 
 
 class CoordCube:
@@ -36,6 +36,8 @@ class CoordCube:
             self.d_edges = SOLVED  # Valid in phase 1 (<11880) and phase 2 (<1680)
             self.corners = SOLVED  # corner permutation. Valid in phase1 and phase2
             self.ud_edges = SOLVED  # permutation of the ud-edges. Valid only in phase 2
+            # location of the corners URF, ULB, DLF, DRB. Only maintained if the huge phase 1 table is enabled
+            self.corner_tetrad = SOLVED
         else:
             self.twist = cc.get_twist()
             self.flip = cc.get_flip()
@@ -43,6 +45,10 @@ class CoordCube:
             self.u_edges = cc.get_u_edges()
             self.d_edges = cc.get_d_edges()
             self.corners = cc.get_corners()
+            if tables.enabled('flipslice_twist_tetrad_depth3'):
+                self.corner_tetrad = cc.get_corner_tetrad()
+            else:
+                self.corner_tetrad = SOLVED
             if self.slice_sorted < N_PERM_4:  # phase 2 cube
                 self.ud_edges = cc.get_ud_edges()
             else:
@@ -77,6 +83,8 @@ class CoordCube:
         self.u_edges = mv.u_edges_move[N_MOVE * self.u_edges + m]  # u_edges and d_edges retrieve ud_edges easily
         self.d_edges = mv.d_edges_move[N_MOVE * self.d_edges + m]  # if phase 1 is finished and phase 2 starts
         self.corners = mv.corners_move[N_MOVE * self.corners + m]  # Is needed only in phase 2
+        if tables.enabled('flipslice_twist_tetrad_depth3'):
+            self.corner_tetrad = mv.corner_tetrad_move[N_MOVE * self.corner_tetrad + m]
 
         self.flipslice_classidx = sy.flipslice_classidx[N_FLIP * (self.slice_sorted // N_PERM_4) + self.flip]
         self.flipslice_sym = sy.flipslice_sym[N_FLIP * (self.slice_sorted // N_PERM_4) + self.flip]
@@ -129,6 +137,46 @@ class CoordCube:
                     break
         return depth
 
+    def get_depth_phase1_huge(self):
+        """
+        Compute the distance to the positions with solved phase 1 and the corners URF, ULB, DLF, DRB at their places,
+        from the huge phase 1 pruning table. This is a lower bound for the length of a maneuver which solves the cube.
+        The CoordCube must have been created with the huge phase 1 table enabled, see tables.configure.
+        :return: The distance
+        """
+        slice_ = self.slice_sorted // N_PERM_4
+        flip = self.flip
+        twist = self.twist
+        tetrad = self.corner_tetrad
+        flipslice = N_FLIP * slice_ + flip
+        classidx = sy.flipslice_classidx[flipslice]
+        sym = sy.flipslice_sym[flipslice]
+        depth_mod3 = pr.get_flipslice_twist_tetrad_depth3(N_CORNER_TETRAD * (N_TWIST * classidx + sy.twist_conj[
+            (twist << 4) + sym]) + sy.corner_tetrad_conj[(tetrad << 4) + sym])
+
+        depth = 0
+        while flip != SOLVED or slice_ != SOLVED or twist != SOLVED or tetrad != SOLVED:
+            if depth_mod3 == 0:
+                depth_mod3 = 3
+            for m in enums.Move:
+                twist1 = mv.twist_move[N_MOVE * twist + m]
+                flip1 = mv.flip_move[N_MOVE * flip + m]
+                slice1 = mv.slice_sorted_move[N_MOVE * slice_ * N_PERM_4 + m] // N_PERM_4
+                tetrad1 = mv.corner_tetrad_move[N_MOVE * tetrad + m]
+                flipslice1 = N_FLIP * slice1 + flip1
+                classidx1 = sy.flipslice_classidx[flipslice1]
+                sym = sy.flipslice_sym[flipslice1]
+                if pr.get_flipslice_twist_tetrad_depth3(N_CORNER_TETRAD * (N_TWIST * classidx1 + sy.twist_conj[
+                        (twist1 << 4) + sym]) + sy.corner_tetrad_conj[(tetrad1 << 4) + sym]) == depth_mod3 - 1:
+                    depth += 1
+                    twist = twist1
+                    flip = flip1
+                    slice_ = slice1
+                    tetrad = tetrad1
+                    depth_mod3 -= 1
+                    break
+        return depth
+
     @staticmethod
     def get_depth_phase2(corners, ud_edges):
         """
@@ -140,6 +188,8 @@ class CoordCube:
         """
         classidx = sy.corner_classidx[corners]
         sym = sy.corner_sym[corners]
+        if tables.options['phase2_prun'] == 'exact':
+            return pr.get_corners_ud_edges_depth(N_UD_EDGES * classidx + sy.ud_edges_conj[(ud_edges << 4) + sym])
         depth_mod3 = pr.get_corners_ud_edges_depth3(N_UD_EDGES * classidx + sy.ud_edges_conj[(ud_edges << 4) + sym])
         if depth_mod3 == 3:  # unfilled entry, depth >= 11
             return 11
@@ -175,7 +225,7 @@ def create_phase2_edgemerge_table():
     edge_d = [Ed.DR, Ed.DF, Ed.DL, Ed.DB]
     edge_ud = [Ed.UR, Ed.UF, Ed.UL, Ed.UB, Ed.DR, Ed.DF, Ed.DL, Ed.DB]
 
-    if not path.isfile(path.join(FOLDER, fname)):
+    if tables.must_create(fname):
         cnt = 0
         print("creating " + fname + " table...")
         u_edges_plus_d_edges_to_ud_edges = ar.array('H', [0 for _ in range(N_U_EDGES_PHASE2 * N_PERM_4)])
@@ -185,12 +235,12 @@ def create_phase2_edgemerge_table():
                 c_d.set_d_edges(j * N_PERM_4)
                 invalid = False
                 for e in edge_ud:
-                    c_ud.ep[e] = -1  # invalidate edges
+                    c_ud.ep[e] = cb.UNDEFINED  # invalidate edges
                     if c_u.ep[e] in edge_u:
                         c_ud.ep[e] = c_u.ep[e]
                     if c_d.ep[e] in edge_d:
                         c_ud.ep[e] = c_d.ep[e]
-                    if c_ud.ep[e] == -1:
+                    if c_ud.ep[e] == cb.UNDEFINED:
                         invalid = True  # edge collision
                         break
                 if not invalid:
@@ -206,18 +256,19 @@ def create_phase2_edgemerge_table():
                         if cnt % 2000 == 0:
                             print('.', end='', flush=True)
         print()
-        fh = open(path.join(FOLDER, fname), "wb")
-        u_edges_plus_d_edges_to_ud_edges.tofile(fh)
-        fh.close()
+        tables.save_table(fname, u_edges_plus_d_edges_to_ud_edges)
         print()
     else:
         print("loading " + fname + " table...")
-        fh = open(path.join(FOLDER, fname), "rb")
-        u_edges_plus_d_edges_to_ud_edges = ar.array('H')
-        u_edges_plus_d_edges_to_ud_edges.fromfile(fh, N_U_EDGES_PHASE2 * N_PERM_4)
+        u_edges_plus_d_edges_to_ud_edges = tables.load_table(fname, 'H', N_U_EDGES_PHASE2 * N_PERM_4)
 
 
 ########################################################################################################################
 
 
-create_phase2_edgemerge_table()
+# The phase2_edgemerge table is created or loaded on the first access of its global variable, see tables.py.
+table_creators = {'u_edges_plus_d_edges_to_ud_edges': create_phase2_edgemerge_table}
+
+
+def __getattr__(name):
+    return tables.init_table(globals(), table_creators, name)
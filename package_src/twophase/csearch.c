@@ -0,0 +1,458 @@
+/* ################# Optional compiled search kernel for the two-phase algorithm ###################################### */
+
+/* The functions in this file do exactly the same as SolverThread.search and SolverThread.search_phase2 in solver.py,
+   on the same tables. The kernel releases the GlobalInterpreterLock while it searches, so the solver threads really run
+   in parallel. Every SYNC_NODES nodes and for each solution found the kernel calls back into the SolverThread to learn
+   about termination requests and shorter solutions of the other threads. */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdint.h>
+
+#define N_MOVE 18
+#define N_TWIST 2187
+#define N_FLIP 2048
+#define N_PERM_4 24
+#define N_UD_EDGES 40320
+#define N_CORNER_TETRAD 70
+#define SYNC_NODES 4096
+#define MAX_DEPTH 32
+
+/* the tables in the order of kernel_tables() in solver.py, with their item sizes */
+enum {
+    T_TWIST_MOVE, T_FLIP_MOVE, T_SLICE_SORTED_MOVE, T_U_EDGES_MOVE, T_D_EDGES_MOVE, T_UD_EDGES_MOVE, T_CORNERS_MOVE,
+    T_FLIPSLICE_CLASSIDX, T_FLIPSLICE_SYM, T_TWIST_CONJ, T_CORNER_CLASSIDX, T_CORNER_SYM, T_UD_EDGES_CONJ,
+    T_FLIPSLICE_TWIST_DEPTH3, T_CORNERS_UD_EDGES_DEPTH3, T_CORNSLICE_DEPTH, T_EDGEMERGE, T_DISTANCE,
+    T_PHASE2_SUCCESSORS, T_PHASE2_SUCCESSOR_SLOT, T_CORNERS_UD_EDGES_DEPTH, T_CORNER_TETRAD_MOVE,
+    T_CORNER_TETRAD_CONJ, T_FLIPSLICE_TWIST_TETRAD_DEPTH3, N_TABLES
+};
+/* the optional tables may be None, phase2_successors has item size 2 (mask table) or 4 (full table) */
+static const Py_ssize_t itemsize[N_TABLES] = {2, 2, 2, 2, 2, 2, 2, 2, 1, 2, 2, 1, 2, 4, 4, 1, 2, 1, 0, 1, 4, 1, 1, 4};
+#define FIRST_OPTIONAL T_PHASE2_SUCCESSORS
+
+/* the phase 2 moves U1, U2, U3, R2, F2, D1, D2, D3, L2, B2 */
+static const int phase2_moves[10] = {0, 1, 2, 4, 7, 9, 10, 11, 13, 16};
+static const int is_phase2_move[N_MOVE] = {1, 1, 1, 0, 1, 0, 0, 1, 0, 1, 1, 1, 0, 1, 0, 0, 1, 0};
+
+typedef struct {
+    Py_buffer buf[N_TABLES];
+    const uint16_t *twist_move, *flip_move, *slice_sorted_move, *u_edges_move, *d_edges_move, *ud_edges_move,
+        *corners_move, *flipslice_classidx, *twist_conj, *corner_classidx, *ud_edges_conj, *edgemerge;
+    const uint8_t *flipslice_sym, *corner_sym;
+    const uint32_t *flipslice_twist_depth3, *corners_ud_edges_depth3;
+    const int8_t *cornslice_depth, *distance;
+    const uint16_t *successor_mask;  /* the phase 2 successor table, at most one of both is not NULL */
+    const uint32_t *successor_changes;
+    const uint8_t *successor_slot;
+    const uint32_t *corners_ud_edges_depth;  /* the optional phase 2 pruning table with exact depths, 4 bits each */
+    const uint8_t *corner_tetrad_move, *corner_tetrad_conj;
+    const uint32_t *flipslice_twist_tetrad_depth3;  /* the optional huge phase 1 pruning table */
+
+    PyObject *thread;  /* the SolverThread which runs the kernel */
+    PyThreadState *tstate;  /* saved thread state while the GIL is released */
+    int corners, u_edges, d_edges;  /* the phase 1 start coordinates needed to set up phase 2 */
+    int togo2_cap;  /* the maximal number of phase 2 moves + 1 */
+    int sofar_phase1[MAX_DEPTH], n1;
+    int sofar_phase2[MAX_DEPTH], n2;
+    int phase2_done;
+    int shortest_length;  /* the length of the shortest solution of all threads, as known at the last sync */
+    int stop;  /* termination requested or Python error */
+    long long nodes;  /* all nodes, counts the nodes between the syncs */
+    long long nodes1, nodes2, phase1_solutions, rejections;  /* the counters returned by run, see SearchStats */
+} Kernel;
+
+static inline int get_depth3(const uint32_t *table, long long ix)
+{
+    return (table[ix >> 4] >> ((ix & 15) * 2)) & 3;
+}
+
+static inline int get_depth4(const uint32_t *table, long long ix)
+{
+    return (table[ix >> 3] >> ((ix & 7) * 4)) & 15;
+}
+
+/* Update shortest_length and stop from the return value of a SolverThread callback. Called with the GIL held. */
+static void update_from_result(Kernel *k, PyObject *res)
+{
+    long bound;
+    if (res == NULL) {
+        k->stop = 1;  /* the exception propagates to the caller of run */
+        return;
+    }
+    bound = PyLong_AsLong(res);
+    Py_DECREF(res);
+    if (bound == -1 && PyErr_Occurred()) {
+        k->stop = 1;
+        return;
+    }
+    if (bound < 0)
+        k->stop = 1;
+    else
+        k->shortest_length = (int)bound;
+}
+
+/* Ask the SolverThread for termination requests and the current shortest solution length. */
+static void sync_thread(Kernel *k)
+{
+    PyEval_RestoreThread(k->tstate);
+    update_from_result(k, PyObject_CallMethod(k->thread, "sync", "LL", k->nodes,
+                                              k->phase1_solutions - k->rejections));
+    k->tstate = PyEval_SaveThread();
+}
+
+static void store_solution(Kernel *k)
+{
+    PyObject *man;
+    int i;
+    PyEval_RestoreThread(k->tstate);
+    man = PyList_New(k->n1 + k->n2);
+    if (man == NULL) {
+        k->stop = 1;
+    } else {
+        for (i = 0; i < k->n1; i++)
+            PyList_SET_ITEM(man, i, PyLong_FromLong(k->sofar_phase1[i]));
+        for (i = 0; i < k->n2; i++)
+            PyList_SET_ITEM(man, k->n1 + i, PyLong_FromLong(k->sofar_phase2[i]));
+        update_from_result(k, PyObject_CallMethod(k->thread, "store_solution", "O", man));
+        Py_DECREF(man);
+    }
+    k->tstate = PyEval_SaveThread();
+}
+
+/* See CoordCube.get_depth_phase2 */
+static int get_depth_phase2(Kernel *k, int corners, int ud_edges)
+{
+    int classidx = k->corner_classidx[corners];
+    int sym = k->corner_sym[corners];
+    long long ix = (long long)N_UD_EDGES * classidx + k->ud_edges_conj[(ud_edges << 4) + sym];
+    int depth_mod3, depth = 0, i, m, corners1, ud_edges1;
+    if (k->corners_ud_edges_depth != NULL)
+        return get_depth4(k->corners_ud_edges_depth, ix);
+    depth_mod3 = get_depth3(k->corners_ud_edges_depth3, ix);
+    if (depth_mod3 == 3)  /* unfilled entry, depth >= 11 */
+        return 11;
+    while (corners != 0 || ud_edges != 0) {
+        if (depth_mod3 == 0)
+            depth_mod3 = 3;
+        for (i = 0; i < 10; i++) {
+            m = phase2_moves[i];
+            corners1 = k->corners_move[N_MOVE * corners + m];
+            ud_edges1 = k->ud_edges_move[N_MOVE * ud_edges + m];
+            classidx = k->corner_classidx[corners1];
+            sym = k->corner_sym[corners1];
+            if (get_depth3(k->corners_ud_edges_depth3, (long long)N_UD_EDGES * classidx
+                           + k->ud_edges_conj[(ud_edges1 << 4) + sym]) == depth_mod3 - 1) {
+                depth++;
+                corners = corners1;
+                ud_edges = ud_edges1;
+                depth_mod3--;
+                break;
+            }
+        }
+    }
+    return depth;
+}
+
+static void search_phase2(Kernel *k, int corners, int ud_edges, int slice_sorted, int dist, int togo_phase2);
+
+/* Expand a phase 2 node with the successor table, see pruning.get_phase2_successors. Only the moves which may reach the
+   solved cube in togo_phase2 - 1 moves are tried, ordered by the depth change. */
+static void expand_phase2(Kernel *k, int corners, int ud_edges, int slice_sorted, int dist, int togo_phase2, int last)
+{
+    int sym = k->corner_sym[corners];
+    long long ix = (long long)N_UD_EDGES * k->corner_classidx[corners] + k->ud_edges_conj[(ud_edges << 4) + sym];
+    const uint8_t *slot = k->successor_slot + 10 * sym;
+    int change[10], max_change, c, i, m, diff, corners_new, slice_sorted_new;
+    if (k->successor_changes != NULL) {
+        uint32_t entry = k->successor_changes[ix];
+        for (i = 0; i < 10; i++)
+            change[i] = (int)((entry >> 2 * slot[i]) & 3) - 1;
+        max_change = togo_phase2 - dist - 1;
+        if (max_change > 1)
+            max_change = 1;
+    } else {
+        uint16_t entry = k->successor_mask[ix];
+        for (i = 0; i < 10; i++)
+            change[i] = (entry >> slot[i]) & 1 ? -1 : 2;
+        max_change = -1;
+    }
+    for (c = -1; c <= max_change; c++) {
+        for (i = 0; i < 10; i++) {
+            if (change[i] != c)
+                continue;
+            m = phase2_moves[i];
+            if (last >= 0) {
+                diff = last / 3 - m / 3;
+                if (diff == 0 || diff == 3)  /* successive moves: on same face or on same axis with wrong order */
+                    continue;
+            }
+            corners_new = k->corners_move[N_MOVE * corners + m];
+            slice_sorted_new = k->slice_sorted_move[N_MOVE * slice_sorted + m];
+            if (k->cornslice_depth[N_PERM_4 * corners_new + slice_sorted_new] >= togo_phase2)
+                continue;  /* impossible to reach solved cube in togo_phase2 - 1 moves */
+
+            k->sofar_phase2[k->n2++] = m;
+            search_phase2(k, corners_new, k->ud_edges_move[N_MOVE * ud_edges + m], slice_sorted_new, dist + c,
+                          togo_phase2 - 1);
+            k->n2--;
+            if (k->stop || k->phase2_done)
+                return;
+        }
+    }
+}
+
+static void search_phase2(Kernel *k, int corners, int ud_edges, int slice_sorted, int dist, int togo_phase2)
+{
+    int i, m, last, diff, corners_new, ud_edges_new, slice_sorted_new, classidx, sym, dist_new, cs;
+    long long ix;
+    if (++k->nodes % SYNC_NODES == 0)
+        sync_thread(k);
+    if (k->stop || k->phase2_done)
+        return;
+    k->nodes2++;
+    if (togo_phase2 == 0 && slice_sorted == 0) {
+        store_solution(k);
+        k->phase2_done = 1;
+        return;
+    }
+    last = k->n2 > 0 ? k->sofar_phase2[k->n2 - 1] : (k->n1 > 0 ? k->sofar_phase1[k->n1 - 1] : -1);
+    if (k->successor_changes != NULL || (k->successor_mask != NULL && togo_phase2 == dist)) {
+        expand_phase2(k, corners, ud_edges, slice_sorted, dist, togo_phase2, last);
+        return;
+    }
+    for (i = 0; i < 10; i++) {
+        m = phase2_moves[i];
+        if (last >= 0) {
+            diff = last / 3 - m / 3;
+            if (diff == 0 || diff == 3)  /* successive moves: on same face or on same axis with wrong order */
+                continue;
+        }
+        corners_new = k->corners_move[N_MOVE * corners + m];
+        ud_edges_new = k->ud_edges_move[N_MOVE * ud_edges + m];
+        slice_sorted_new = k->slice_sorted_move[N_MOVE * slice_sorted + m];
+
+        classidx = k->corner_classidx[corners_new];
+        sym = k->corner_sym[corners_new];
+        ix = (long long)N_UD_EDGES * classidx + k->ud_edges_conj[(ud_edges_new << 4) + sym];
+        if (k->corners_ud_edges_depth != NULL)
+            dist_new = get_depth4(k->corners_ud_edges_depth, ix);
+        else
+            dist_new = k->distance[3 * dist + get_depth3(k->corners_ud_edges_depth3, ix)];
+        cs = k->cornslice_depth[N_PERM_4 * corners_new + slice_sorted_new];
+        if ((dist_new > cs ? dist_new : cs) >= togo_phase2)
+            continue;  /* impossible to reach solved cube in togo_phase2 - 1 moves */
+
+        k->sofar_phase2[k->n2++] = m;
+        search_phase2(k, corners_new, ud_edges_new, slice_sorted_new, dist_new, togo_phase2 - 1);
+        k->n2--;
+        if (k->stop || k->phase2_done)
+            return;
+    }
+}
+
+static void phase1_solved(Kernel *k, int slice_sorted)
+{
+    int corners = k->corners, u_edges = k->u_edges, d_edges = k->d_edges;
+    int i, m, togo2_limit, ud_edges, dist2, togo2;
+    k->phase1_solutions++;
+    for (i = 0; i < k->n1; i++) {
+        m = k->sofar_phase1[i];
+        corners = k->corners_move[N_MOVE * corners + m];
+    }
+    /* new solution must be shorter and we do not use phase 2 maneuvers with length > togo2_cap - 1 */
+    togo2_limit = k->shortest_length - k->n1;
+    if (togo2_limit > k->togo2_cap)
+        togo2_limit = k->togo2_cap;
+    /* precheck speeds up the computation */
+    if (k->cornslice_depth[N_PERM_4 * corners + slice_sorted] >= togo2_limit) {
+        k->rejections++;
+        return;
+    }
+    for (i = 0; i < k->n1; i++) {
+        m = k->sofar_phase1[i];
+        u_edges = k->u_edges_move[N_MOVE * u_edges + m];
+        d_edges = k->d_edges_move[N_MOVE * d_edges + m];
+    }
+    ud_edges = k->edgemerge[N_PERM_4 * u_edges + d_edges % N_PERM_4];
+    dist2 = get_depth_phase2(k, corners, ud_edges);
+    for (togo2 = dist2; togo2 < togo2_limit; togo2++) {
+        k->n2 = 0;
+        k->phase2_done = 0;
+        search_phase2(k, corners, ud_edges, slice_sorted, dist2, togo2);
+        if (k->phase2_done || k->stop)
+            break;
+    }
+}
+
+static void search(Kernel *k, int flip, int twist, int slice_sorted, int dist, int togo_phase1, int tetrad,
+                   int dist_huge)
+{
+    int m, diff, flip_new, twist_new, slice_sorted_new, flipslice, classidx, sym, dist_new, tetrad_new, dist_huge_new;
+    long long ix;
+    if (++k->nodes % SYNC_NODES == 0)
+        sync_thread(k);
+    if (k->stop)
+        return;
+    k->nodes1++;
+    if (togo_phase1 == 0) {
+        phase1_solved(k, slice_sorted);
+        return;
+    }
+    for (m = 0; m < N_MOVE; m++) {
+        /* dist = 0 means that we are already are in the subgroup H. If there are less than 5 moves left this forces
+           all remaining moves to be phase 2 moves. So we can forbid these at the end of phase 1 and generate these
+           moves in phase 2. */
+        if (dist == 0 && togo_phase1 < 5 && is_phase2_move[m])
+            continue;
+        if (k->n1 > 0) {
+            diff = k->sofar_phase1[k->n1 - 1] / 3 - m / 3;
+            if (diff == 0 || diff == 3)  /* successive moves: on same face or on same axis with wrong order */
+                continue;
+        }
+        flip_new = k->flip_move[N_MOVE * flip + m];
+        twist_new = k->twist_move[N_MOVE * twist + m];
+        slice_sorted_new = k->slice_sorted_move[N_MOVE * slice_sorted + m];
+
+        flipslice = N_FLIP * (slice_sorted_new / N_PERM_4) + flip_new;
+        classidx = k->flipslice_classidx[flipslice];
+        sym = k->flipslice_sym[flipslice];
+        dist_new = k->distance[3 * dist + get_depth3(k->flipslice_twist_depth3, (long long)N_TWIST * classidx
+                                                    + k->twist_conj[(twist_new << 4) + sym])];
+        if (dist_new >= togo_phase1)  /* impossible to reach subgroup H in togo_phase1 - 1 moves */
+            continue;
+
+        tetrad_new = dist_huge_new = 0;
+        if (k->flipslice_twist_tetrad_depth3 != NULL) {  /* dist_huge_new is a lower bound for the moves to solve */
+            tetrad_new = k->corner_tetrad_move[N_MOVE * tetrad + m];
+            ix = N_CORNER_TETRAD * ((long long)N_TWIST * classidx + k->twist_conj[(twist_new << 4) + sym])
+                + k->corner_tetrad_conj[(tetrad_new << 4) + sym];
+            dist_huge_new = k->distance[3 * dist_huge + get_depth3(k->flipslice_twist_tetrad_depth3, ix)];
+            if (k->n1 + 1 + dist_huge_new >= k->shortest_length)
+                continue;  /* impossible to find a shorter solution */
+        }
+
+        k->sofar_phase1[k->n1++] = m;
+        search(k, flip_new, twist_new, slice_sorted_new, dist_new, togo_phase1 - 1, tetrad_new, dist_huge_new);
+        k->n1--;
+        if (k->stop)
+            return;
+    }
+}
+
+static void release_tables(Kernel *k, int n)
+{
+    int i;
+    for (i = 0; i < n; i++)
+        PyBuffer_Release(&k->buf[i]);
+}
+
+PyDoc_STRVAR(run_doc,
+"run(tables, thread, flip, twist, slice_sorted, u_edges, d_edges, corners, dist, shortest_length, togo2_cap,\n"
+"    corner_tetrad, dist_huge)\n\n"
+"Run the iterative deepening search of SolverThread.run for the cube with the given phase 1 coordinates.\n"
+"Phase 2 maneuvers have less than togo2_cap moves. corner_tetrad and dist_huge are only used with the huge\n"
+"phase 1 pruning table.\n"
+"thread.sync(nodes, phase2_calls), called every SYNC_NODES nodes with the number of nodes and of phase 2\n"
+"searches so far, and\n"
+"thread.store_solution(man) return the length of the shortest solution found so far or -1\n"
+"if the search has to terminate.\n"
+"Return the tuple (phase1_nodes, phase1_solutions, precheck_rejections, phase2_nodes), see solver.SearchStats.");
+
+static PyObject *run(PyObject *self, PyObject *args)
+{
+    PyObject *tables, *seq;
+    Kernel k;
+    int flip, twist, slice_sorted, dist, togo1, i, tetrad, dist_huge;
+    const void *p[N_TABLES];
+
+    memset(&k, 0, sizeof(k));
+    if (!PyArg_ParseTuple(args, "OOiiiiiiiiiii", &tables, &k.thread, &flip, &twist, &slice_sorted, &k.u_edges,
+                          &k.d_edges, &k.corners, &dist, &k.shortest_length, &k.togo2_cap, &tetrad, &dist_huge))
+        return NULL;
+    if (k.togo2_cap > MAX_DEPTH)
+        k.togo2_cap = MAX_DEPTH;
+    seq = PySequence_Fast(tables, "tables must be a sequence");
+    if (seq == NULL)
+        return NULL;
+    if (PySequence_Fast_GET_SIZE(seq) != N_TABLES) {
+        Py_DECREF(seq);
+        PyErr_SetString(PyExc_ValueError, "wrong number of tables");
+        return NULL;
+    }
+    for (i = 0; i < N_TABLES; i++) {
+        if (i >= FIRST_OPTIONAL && PySequence_Fast_GET_ITEM(seq, i) == Py_None) {
+            p[i] = NULL;  /* k.buf[i].obj stays NULL, releasing the buffer does nothing */
+            continue;
+        }
+        if (PyObject_GetBuffer(PySequence_Fast_GET_ITEM(seq, i), &k.buf[i], PyBUF_C_CONTIGUOUS) < 0) {
+            release_tables(&k, i);
+            Py_DECREF(seq);
+            return NULL;
+        }
+        if (itemsize[i] == 0 ? k.buf[i].itemsize != 2 && k.buf[i].itemsize != 4 : k.buf[i].itemsize != itemsize[i]) {
+            release_tables(&k, i + 1);
+            Py_DECREF(seq);
+            PyErr_Format(PyExc_ValueError, "table %d has item size %zd instead of %zd", i, k.buf[i].itemsize,
+                         itemsize[i]);
+            return NULL;
+        }
+        p[i] = k.buf[i].buf;
+    }
+    Py_DECREF(seq);
+    k.twist_move = p[T_TWIST_MOVE];
+    k.flip_move = p[T_FLIP_MOVE];
+    k.slice_sorted_move = p[T_SLICE_SORTED_MOVE];
+    k.u_edges_move = p[T_U_EDGES_MOVE];
+    k.d_edges_move = p[T_D_EDGES_MOVE];
+    k.ud_edges_move = p[T_UD_EDGES_MOVE];
+    k.corners_move = p[T_CORNERS_MOVE];
+    k.flipslice_classidx = p[T_FLIPSLICE_CLASSIDX];
+    k.flipslice_sym = p[T_FLIPSLICE_SYM];
+    k.twist_conj = p[T_TWIST_CONJ];
+    k.corner_classidx = p[T_CORNER_CLASSIDX];
+    k.corner_sym = p[T_CORNER_SYM];
+    k.ud_edges_conj = p[T_UD_EDGES_CONJ];
+    k.flipslice_twist_depth3 = p[T_FLIPSLICE_TWIST_DEPTH3];
+    k.corners_ud_edges_depth3 = p[T_CORNERS_UD_EDGES_DEPTH3];
+    k.cornslice_depth = p[T_CORNSLICE_DEPTH];
+    k.edgemerge = p[T_EDGEMERGE];
+    k.distance = p[T_DISTANCE];
+    if (p[T_PHASE2_SUCCESSORS] != NULL && p[T_PHASE2_SUCCESSOR_SLOT] != NULL) {
+        if (k.buf[T_PHASE2_SUCCESSORS].itemsize == 2)
+            k.successor_mask = p[T_PHASE2_SUCCESSORS];
+        else
+            k.successor_changes = p[T_PHASE2_SUCCESSORS];
+        k.successor_slot = p[T_PHASE2_SUCCESSOR_SLOT];
+    }
+    k.corners_ud_edges_depth = p[T_CORNERS_UD_EDGES_DEPTH];
+    if (p[T_CORNER_TETRAD_MOVE] != NULL && p[T_CORNER_TETRAD_CONJ] != NULL) {
+        k.corner_tetrad_move = p[T_CORNER_TETRAD_MOVE];
+        k.corner_tetrad_conj = p[T_CORNER_TETRAD_CONJ];
+        k.flipslice_twist_tetrad_depth3 = p[T_FLIPSLICE_TWIST_TETRAD_DEPTH3];
+    }
+
+    k.tstate = PyEval_SaveThread();
+    for (togo1 = dist; togo1 < 20 && !k.stop; togo1++) {  /* iterative deepening, solution has at least dist moves */
+        k.n1 = 0;
+        search(&k, flip, twist, slice_sorted, dist, togo1, tetrad, dist_huge);
+    }
+    PyEval_RestoreThread(k.tstate);
+    release_tables(&k, N_TABLES);
+    if (PyErr_Occurred())
+        return NULL;
+    return Py_BuildValue("(LLLL)", k.nodes1, k.phase1_solutions, k.rejections, k.nodes2);
+}
+
+static PyMethodDef csearch_methods[] = {
+    {"run", run, METH_VARARGS, run_doc},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef csearch_module = {
+    PyModuleDef_HEAD_INIT, "csearch", "Compiled search kernel for the two-phase algorithm.", -1, csearch_methods
+};
+
+PyMODINIT_FUNC PyInit_csearch(void)
+{
+    return PyModule_Create(&csearch_module);
+}
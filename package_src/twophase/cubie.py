@@ -3,8 +3,9 @@
 from twophase.defs import cornerFacelet, edgeFacelet, cornerColor, edgeColor, N_SYM
 from twophase.enums import Color, Corner as Co, Edge as Ed
 import twophase.face
-from twophase.misc import c_nk, rotate_left, rotate_right
+from twophase.misc import C_NK, perm_rank, perm_unrank
 from random import randrange
+import threading as thr
 
 
 # ################## The basic six cube moves described by permutations and changes in orientation #####################
@@ -47,6 +48,69 @@ eoB = [0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 1, 1]
 ########################################################################################################################
 
 CUBE_OK = True
+UNDEFINED = 255  # marks a cubie position which is not yet defined, for example while a cube is constructed
+
+# All data of a CubieCube are kept in a single bytearray of 40 bytes, the permutations of the 8 corners and the 12 edges
+# followed by the orientations of the corners and the edges. cp, ep, co and eo are memoryviews into this bytearray.
+CP, EP, CO, EO = slice(0, 8), slice(8, 20), slice(20, 28), slice(28, 40)
+FIELDS = {'cp': CP, 'co': CO, 'ep': EP, 'eo': EO}
+
+# CO_MULT[6 * ori_a + ori_b] is the orientation of a corner with orientation ori_a in cube a and ori_b in cube b in the
+# product a*b, see corner_multiply. The orientations 3, 4 and 5 belong to mirrored cubes.
+CO_MULT = bytes((a + b) % 3 if a < 3 and b < 3 else 3 + (a + b) % 3 if a < 3 else 3 + (a - b) % 3 if b < 3
+                else (a - b) % 3 for a in range(6) for b in range(6))
+# CO_INV[ori] is the orientation of a corner in the inverse cube
+CO_INV = bytes(ori if ori >= 3 else -ori % 3 for ori in range(6))
+
+
+class Scratch(thr.local):
+    """The multiplications copy the old state of the cube into the buffer data of the running thread, so they do not
+    allocate. Each thread has its own buffer since a thread switch can happen within a multiplication."""
+
+    def __init__(self):
+        self.data = bytearray(40)
+
+
+scratch = Scratch()
+
+# the edges which are not part of the UD-slice, the U-face and the D-face, in the order used by set_edges4
+OTHER_EDGES_SLICE = bytes([Ed.UR, Ed.UF, Ed.UL, Ed.UB, Ed.DR, Ed.DF, Ed.DL, Ed.DB])
+OTHER_EDGES_U = bytes([Ed.DR, Ed.DF, Ed.DL, Ed.DB, Ed.FR, Ed.FL, Ed.BL, Ed.BR])
+OTHER_EDGES_D = bytes([Ed.FR, Ed.FL, Ed.BL, Ed.BR, Ed.UR, Ed.UF, Ed.UL, Ed.UB])
+# The corners URF, ULB, DLF and DRB form a tetrad, no two of them are adjacent. The corner_tetrad coordinate gives their
+# location, the positions are taken in the order TETRAD_ORDER, which puts the positions of the tetrad last.
+TETRAD = bytes([Co.URF, Co.ULB, Co.DLF, Co.DRB])
+OTHER_CORNERS = bytes([Co.UFL, Co.UBR, Co.DFR, Co.DBL])
+TETRAD_ORDER = OTHER_CORNERS + TETRAD
+
+
+def get_edges4(ep, first):
+    """
+    Get the location and permutation of the edges first, ..., first + 3 in the edge permutation ep, as bytes.
+    :return: 24 * a + b with the location a < 495 (the index of the combination of the 4 positions) and the
+     permutation b < 24 of the 4 edges ordered by their position
+    """
+    pos = sorted((ep.index(first), ep.index(first + 1), ep.index(first + 2), ep.index(first + 3)), reverse=True)
+    a = C_NK[11 - pos[0]][1] + C_NK[11 - pos[1]][2] + C_NK[11 - pos[2]][3] + C_NK[11 - pos[3]][4]
+    return 24 * a + perm_rank(bytes((ep[pos[3]] - first, ep[pos[2]] - first, ep[pos[1]] - first, ep[pos[0]] - first)))
+
+
+def set_edges4(idx, first, other):
+    """Return the edge permutation as bytes with the edges first, ..., first + 3 given by idx, see get_edges4. The
+    remaining positions get the edges in other in that order."""
+    a, b = divmod(idx, 24)
+    edge4 = perm_unrank(b, 4)
+    ep = bytearray(12)
+    x = 4  # number of edges first, ..., first + 3 not yet placed
+    for j in range(12):
+        c = C_NK[11 - j][x]
+        if a >= c:
+            ep[j] = first + edge4[4 - x]
+            a -= c
+            x -= 1
+        else:
+            ep[j] = other[j - 4 + x]
+    return bytes(ep)
 
 
 class CubieCube:
@@ -56,6 +120,8 @@ class CubieCube:
     1. the 18 cube moves
     2. the 48 symmetries of the cube.
     """
+    __slots__ = ('data', 'cp', 'co', 'ep', 'eo')
+
     def __init__(self, cp=None, co=None, ep=None, eo=None):
         """
         Initializes corners and edges.
@@ -64,39 +130,43 @@ class CubieCube:
         :param ep: edge permutation
         :param eo: edge orientation
         """
-        if cp is None:
-            self.cp = [Co(i) for i in range(8)]  # You may not put this as the default two lines above!
-        else:
-            self.cp = cp[:]
-        if co is None:
-            self.co = [0]*8
-        else:
-            self.co = co[:]
-        if ep is None:
-            self.ep = [Ed(i) for i in range(12)]
-        else:
-            self.ep = ep[:]
-        if eo is None:
-            self.eo = [0] * 12
-        else:
-            self.eo = eo[:]
+        data = bytearray(40)
+        data[CP] = bytes(cp) if cp is not None else b'\x00\x01\x02\x03\x04\x05\x06\x07'
+        data[EP] = bytes(ep) if ep is not None else b'\x00\x01\x02\x03\x04\x05\x06\x07\x08\x09\x0a\x0b'
+        if co is not None:
+            data[CO] = bytes(co)
+        if eo is not None:
+            data[EO] = bytes(eo)
+        view = memoryview(data)
+        setattr_ = object.__setattr__
+        setattr_(self, 'data', data)
+        setattr_(self, 'cp', view[CP])
+        setattr_(self, 'co', view[CO])
+        setattr_(self, 'ep', view[EP])
+        setattr_(self, 'eo', view[EO])
+
+    def __setattr__(self, name, value):
+        """Assigning cp, co, ep or eo copies the values into the bytearray."""
+        if name not in FIELDS:
+            raise AttributeError(name + ' of a CubieCube cannot be set')
+        self.data[FIELDS[name]] = bytes(value)
+
+    def __reduce__(self):
+        return CubieCube, (bytes(self.cp), bytes(self.co), bytes(self.ep), bytes(self.eo))
 
     def __str__(self):
         """Print string for a cubie cube."""
         s = ''
         for i in Co:
-            s = s + '(' + str(self.cp[i]) + ',' + str(self.co[i]) + ')'
+            s = s + '(' + str(Co(self.cp[i])) + ',' + str(self.co[i]) + ')'
         s += '\n'
         for i in Ed:
-            s = s + '(' + str(self.ep[i]) + ',' + str(self.eo[i]) + ')'
+            s = s + '(' + str(Ed(self.ep[i])) + ',' + str(self.eo[i]) + ')'
         return s
 
     def __eq__(self, other):
         """Define equality of two cubie cubes."""
-        if self.cp == other.cp and self.co == other.co and self.ep == other.ep and self.eo == other.eo:
-            return True
-        else:
-            return False
+        return self.data == other.data
 
     def to_facelet_cube(self):
         """Return a facelet representation of the cube."""
@@ -115,66 +185,50 @@ class CubieCube:
 
     def corner_multiply(self, b):
         """Multiply this cubie cube with another cubie cube b, restricted to the corners. Does not change b."""
-        c_perm = [0]*8
-        c_ori = [0]*8
-        ori = 0
-        for c in Co:
-            c_perm[c] = self.cp[b.cp[c]]
-            ori_a = self.co[b.cp[c]]
-            ori_b = b.co[c]
-            if ori_a < 3 and ori_b < 3:  # two regular cubes
-                ori = ori_a + ori_b
-                if ori >= 3:
-                    ori -= 3
-            elif ori_a < 3 <= ori_b:  # cube b is in a mirrored state
-                ori = ori_a + ori_b
-                if ori >= 6:
-                    ori -= 3  # the composition also is in a mirrored state
-            elif ori_a >= 3 > ori_b:  # cube a is in a mirrored state
-                ori = ori_a - ori_b
-                if ori < 3:
-                    ori += 3  # the composition is a mirrored cube
-            elif ori_a >= 3 and ori_b >= 3:  # if both cubes are in mirrored states
-                ori = ori_a - ori_b
-                if ori < 0:
-                    ori += 3  # the composition is a regular cube
-            c_ori[c] = ori
-        for c in Co:
-            self.cp[c] = c_perm[c]
-            self.co[c] = c_ori[c]
+        d = self.data
+        a = scratch.data
+        a[:] = d
+        b = a if b is self else b.data
+        for c in range(8):
+            k = b[c]
+            d[c] = a[k]
+            d[20 + c] = CO_MULT[6 * a[20 + k] + b[20 + c]]
 
     def edge_multiply(self, b):
         """ Multiply this cubie cube with another cubiecube b, restricted to the edges. Does not change b."""
-        e_perm = [0]*12
-        e_ori = [0]*12
-        for e in Ed:
-            e_perm[e] = self.ep[b.ep[e]]
-            e_ori[e] = (b.eo[e] + self.eo[b.ep[e]]) % 2
-        for e in Ed:
-            self.ep[e] = e_perm[e]
-            self.eo[e] = e_ori[e]
+        d = self.data
+        a = scratch.data
+        a[:] = d
+        b = a if b is self else b.data
+        for e in range(12):
+            k = b[8 + e]
+            d[8 + e] = a[8 + k]
+            d[28 + e] = a[28 + k] ^ b[28 + e]
 
     def multiply(self, b):
-        self.corner_multiply(b)
-        self.edge_multiply(b)
+        d = self.data
+        a = scratch.data
+        a[:] = d
+        b = a if b is self else b.data
+        for c in range(8):
+            k = b[c]
+            d[c] = a[k]
+            d[20 + c] = CO_MULT[6 * a[20 + k] + b[20 + c]]
+        for e in range(8, 20):
+            k = 8 + b[e]
+            d[e] = a[k]
+            d[e + 20] = a[k + 20] ^ b[e + 20]
 
     def inv_cubie_cube(self, d):
         """Store the inverse of this cubie cube in d."""
-        for e in Ed:
-            d.ep[self.ep[e]] = e
-        for e in Ed:
-            d.eo[e] = self.eo[d.ep[e]]
-
-        for c in Co:
-            d.cp[self.cp[c]] = c
-        for c in Co:
-            ori = self.co[d.cp[c]]
-            if ori >= 3:
-                d.co[c] = ori
-            else:
-                d.co[c] = -ori
-                if d.co[c] < 0:
-                    d.co[c] += 3
+        a = self.data
+        d = d.data
+        for c in range(8):
+            d[a[c]] = c
+            d[20 + a[c]] = CO_INV[a[20 + c]]
+        for e in range(8, 20):
+            d[8 + a[e]] = e - 8
+            d[28 + a[e]] = a[e + 20]
 
     def corner_parity(self):
         """Give the parity of the corner permutation."""
@@ -198,15 +252,16 @@ class CubieCube:
         """Generate a list of the symmetries and antisymmetries of the cubie cube."""
         from twophase.symmetries import symCube, inv_idx  # not nice here but else we have circular imports
         s = []
+        c = CubieCube()
         d = CubieCube()
         for j in range(N_SYM):
-            c = CubieCube(symCube[j].cp, symCube[j].co, symCube[j].ep, symCube[j].eo)
+            c.data[:] = symCube[j].data
             c.multiply(self)
             c.multiply(symCube[inv_idx[j]])
-            if self == c:
+            if self.data == c.data:
                 s.append(j)
             c.inv_cubie_cube(d)
-            if self == d:  # then we have antisymmetry
+            if self.data == d.data:  # then we have antisymmetry
                 s.append(j + N_SYM)
         return s
 
@@ -244,271 +299,101 @@ class CubieCube:
     def get_slice(self):
         """Get the location of the UD-slice edges FR,FL,BL and BR ignoring their permutation.
             0<= slice < 495 in phase 1, slice = 0 in phase 2."""
-        a = x = 0
-        # Compute the index a < (12 choose 4)
-        for j in range(Ed.BR, Ed.UR - 1, -1):
-            if Ed.FR <= self.ep[j] <= Ed.BR:
-                a += c_nk(11 - j, x + 1)
-                x += 1
-        return a
+        return get_edges4(bytes(self.ep), Ed.FR) // 24
 
     def set_slice(self, idx):
-        slice_edge = list(range(Ed.FR, Ed.BR + 1))
-        other_edge = [Ed.UR, Ed.UF, Ed.UL, Ed.UB, Ed.DR, Ed.DF, Ed.DL, Ed.DB]
-        a = idx  # Location
-        for e in Ed:
-            self.ep[e] = -1  # Invalidate all edge positions
-
-        x = 4  # set slice edges
-        for j in Ed:
-            if a - c_nk(11 - j, x) >= 0:
-                self.ep[j] = slice_edge[4 - x]
-                a -= c_nk(11 - j, x)
-                x -= 1
-
-        x = 0  # set the remaining edges UR..DB
-        for j in Ed:
-            if self.ep[j] == -1:
-                self.ep[j] = other_edge[x]
-                x += 1
+        self.ep = set_edges4(24 * idx, Ed.FR, OTHER_EDGES_SLICE)
 
     def get_slice_sorted(self):
         """Get the permutation and location of the UD-slice edges FR,FL,BL and BR.
         0 <= slice_sorted < 11880 in phase 1, 0 <= slice_sorted < 24 in phase 2, slice_sorted = 0 for solved cube."""
-        a = x = 0
-        edge4 = [0]*4
-        # First compute the index a < (12 choose 4) and the permutation array perm.
-        for j in range(Ed.BR, Ed.UR - 1, -1):
-            if Ed.FR <= self.ep[j] <= Ed.BR:
-                a += c_nk(11 - j, x + 1)
-                edge4[3 - x] = self.ep[j]
-                x += 1
-        # Then compute the index b < 4! for the permutation in edge4
-        b = 0
-        for j in range(3, 0, -1):
-            k = 0
-            while edge4[j] != j + 8:
-                rotate_left(edge4, 0, j)
-                k += 1
-            b = (j + 1)*b + k
-        return 24*a + b
+        return get_edges4(bytes(self.ep), Ed.FR)
 
     def set_slice_sorted(self, idx):
-        slice_edge = [Ed.FR, Ed.FL, Ed.BL, Ed.BR]
-        other_edge = [Ed.UR, Ed.UF, Ed.UL, Ed.UB, Ed.DR, Ed.DF, Ed.DL, Ed.DB]
-        b = idx % 24  # Permutation
-        a = idx // 24  # Location
-        for e in Ed:
-            self.ep[e] = -1  # Invalidate all edge positions
-
-        j = 1  # generate permutation from index b
-        while j < 4:
-            k = b % (j + 1)
-            b //= j + 1
-            while k > 0:
-                rotate_right(slice_edge, 0, j)
-                k -= 1
-            j += 1
-
-        x = 4  # set slice edges
-        for j in Ed:
-            if a - c_nk(11 - j, x) >= 0:
-                self.ep[j] = slice_edge[4 - x]
-                a -= c_nk(11 - j, x)
-                x -= 1
-
-        x = 0  # set the remaining edges UR..DB
-        for j in Ed:
-            if self.ep[j] == -1:
-                self.ep[j] = other_edge[x]
-                x += 1
+        self.ep = set_edges4(idx, Ed.FR, OTHER_EDGES_SLICE)
 
     def get_u_edges(self):
         """Get the permutation and location of edges UR, UF, UL and UB.
             0 <= u_edges < 11880 in phase 1, 0 <= u_edges < 1680 in phase 2, u_edges = 1656 for solved cube."""
-        a = x = 0
-        edge4 = [0]*4
-        ep_mod = self.ep[:]
-        for j in range(4):
-            rotate_right(ep_mod, 0, 11)
-        # First compute the index a < (12 choose 4) and the permutation array perm.
-        for j in range(Ed.BR, Ed.UR - 1, -1):
-            if Ed.UR <= ep_mod[j] <= Ed.UB:
-                a += c_nk(11 - j, x + 1)
-                edge4[3 - x] = ep_mod[j]
-                x += 1
-        # Then compute the index b < 4! for the permutation in edge4
-        b = 0
-        for j in range(3, 0, -1):
-            k = 0
-            while edge4[j] != j:
-                rotate_left(edge4, 0, j)
-                k += 1
-            b = (j + 1)*b + k
-        return 24*a + b
+        ep = bytes(self.ep)
+        return get_edges4(ep[8:] + ep[:8], Ed.UR)  # the edges rotated right by 4 positions
 
     def set_u_edges(self, idx):
-        slice_edge = [Ed.UR, Ed.UF, Ed.UL, Ed.UB]
-        other_edge = [Ed.DR, Ed.DF, Ed.DL, Ed.DB, Ed.FR, Ed.FL, Ed.BL, Ed.BR]
-        b = idx % 24  # Permutation
-        a = idx // 24  # Location
-        for e in Ed:
-            self.ep[e] = -1  # Invalidate all edge positions
-
-        j = 1  # generate permutation from index b
-        while j < 4:
-            k = b % (j + 1)
-            b //= j + 1
-            while k > 0:
-                rotate_right(slice_edge, 0, j)
-                k -= 1
-            j += 1
-
-        x = 4  # set slice edges
-        for j in Ed:
-            if a - c_nk(11 - j, x) >= 0:
-                self.ep[j] = slice_edge[4 - x]
-                a -= c_nk(11 - j, x)
-                x -= 1
-
-        x = 0  # set the remaining edges UR..DB
-        for j in Ed:
-            if self.ep[j] == -1:
-                self.ep[j] = other_edge[x]
-                x += 1
-        for j in range(4):
-            rotate_left(self.ep, 0, 11)
+        ep = set_edges4(idx, Ed.UR, OTHER_EDGES_U)
+        self.ep = ep[4:] + ep[:4]  # rotate left by 4 positions
 
     def get_d_edges(self):
         """Get the permutation and location of the edges DR, DF, DL and DB.
             0 <= d_edges < 11880 in phase 1, 0 <= d_edges < 1680 in phase 2, d_edges = 0 for solved cube."""
-        a = x = 0
-        edge4 = [0] * 4
-        ep_mod = self.ep[:]
-        for j in range(4):
-            rotate_right(ep_mod, 0, 11)
-        # First compute the index a < (12 choose 4) and the permutation array perm.
-        for j in range(Ed.BR, Ed.UR - 1, -1):
-            if Ed.DR <= ep_mod[j] <= Ed.DB:
-                a += c_nk(11 - j, x + 1)
-                edge4[3 - x] = ep_mod[j]
-                x += 1
-        # Then compute the index b < 4! for the permutation in edge4
-        b = 0
-        for j in range(3, 0, -1):
-            k = 0
-            while edge4[j] != j + 4:
-                rotate_left(edge4, 0, j)
-                k += 1
-            b = (j + 1) * b + k
-        return 24 * a + b
+        ep = bytes(self.ep)
+        return get_edges4(ep[8:] + ep[:8], Ed.DR)
 
     def set_d_edges(self, idx):
-        slice_edge = [Ed.DR, Ed.DF, Ed.DL, Ed.DB]
-        other_edge = [Ed.FR, Ed.FL, Ed.BL, Ed.BR, Ed.UR, Ed.UF, Ed.UL, Ed.UB]
-        b = idx % 24  # Permutation
-        a = idx // 24  # Location
-        for e in Ed:
-            self.ep[e] = -1  # Invalidate all edge positions
-
-        j = 1  # generate permutation from index b
-        while j < 4:
-            k = b % (j + 1)
-            b //= j + 1
-            while k > 0:
-                rotate_right(slice_edge, 0, j)
-                k -= 1
-            j += 1
-
-        x = 4  # set slice edges
-        for j in Ed:
-            if a - c_nk(11 - j, x) >= 0:
-                self.ep[j] = slice_edge[4 - x]
-                a -= c_nk(11 - j, x)
-                x -= 1
-
-        x = 0  # set the remaining edges UR..DB
-        for j in Ed:
-            if self.ep[j] == -1:
-                self.ep[j] = other_edge[x]
-                x += 1
-        for j in range(4):
-            rotate_left(self.ep, 0, 11)
+        ep = set_edges4(idx, Ed.DR, OTHER_EDGES_D)
+        self.ep = ep[4:] + ep[:4]
 
     def get_corners(self):
         """Get the permutation of the 8 corners.
             0 <= corners < 40320 defined but unused in phase 1, 0 <= corners < 40320 in phase 2,
             corners = 0 for solved cube"""
-        perm = list(self.cp)  # duplicate cp
-        b = 0
-        for j in range(Co.DRB, Co.URF, -1):
-            k = 0
-            while perm[j] != j:
-                rotate_left(perm, 0, j)
-                k += 1
-            b = (j + 1) * b + k
-        return b
+        return perm_rank(bytes(self.cp))
 
     def set_corners(self, idx):
-        self.cp = [i for i in Co]
-        for j in Co:
-            k = idx % (j + 1)
-            idx //= j + 1
-            while k > 0:
-                rotate_right(self.cp, 0, j)
-                k -= 1
+        self.cp = perm_unrank(idx, 8)
 
     def get_ud_edges(self):
         """Get the permutation of the 8 U and D edges.
             ud_edges undefined in phase 1, 0 <= ud_edges < 40320 in phase 2, ud_edges = 0 for solved cube."""
-        perm = self.ep[0:8]  # duplicate first 8 elements of ep
-        b = 0
-        for j in range(Ed.DB, Ed.UR, -1):
-            k = 0
-            while perm[j] != j:
-                rotate_left(perm, 0, j)
-                k += 1
-            b = (j + 1) * b + k
-        return b
+        return perm_rank(bytes(self.ep[0:8]))
 
     def set_ud_edges(self, idx):
         # positions of FR FL BL BR edges are not affected
-        for i in list(Ed)[0:8]:
-            self.ep[i] = i
-        for j in list(Ed)[0:8]:
-            k = idx % (j + 1)
-            idx //= j + 1
-            while k > 0:
-                rotate_right(self.ep, 0, j)
-                k -= 1
+        self.ep[0:8] = perm_unrank(idx, 8)
+
+    def get_corner_tetrad(self):
+        """Get the location of the tetrad corners URF, ULB, DLF and DRB ignoring their permutation.
+            0 <= corner_tetrad < 70, corner_tetrad = 0 for solved cube. Used by the huge phase 1 pruning table."""
+        cp = bytes(self.cp)
+        pos = [j for j in range(7, -1, -1) if cp[TETRAD_ORDER[j]] in TETRAD]
+        return C_NK[7 - pos[0]][1] + C_NK[7 - pos[1]][2] + C_NK[7 - pos[2]][3] + C_NK[7 - pos[3]][4]
+
+    def set_corner_tetrad(self, idx):
+        """Set a corner permutation with the tetrad corners at the location idx."""
+        cp = bytearray(8)
+        x = 4  # number of tetrad corners not yet placed
+        for j in range(8):
+            c = C_NK[7 - j][x]
+            if idx >= c:
+                cp[TETRAD_ORDER[j]] = TETRAD[4 - x]
+                idx -= c
+                x -= 1
+            else:
+                cp[TETRAD_ORDER[j]] = OTHER_CORNERS[j - 4 + x]
+        self.cp = cp
 # ###################################### end coordinates for phase 1 and 2 #############################################
 
 # ############################################ other usefull functions #################################################
-    def randomize(self):
-        """Generate a random cube. The probability is the same for all possible states."""
-        def set_edges(idx):
-            """The permutation of the 12 edges. 0 <= idx < 12!."""
-            self.ep = [i for i in Ed]
-            for j in Ed:
-                k = idx % (j + 1)
-                idx //= j + 1
-                while k > 0:
-                    rotate_right(self.ep, 0, j)
-                    k -= 1
-        set_edges(randrange(479001600))  # 12!
+    def randomize(self, rng=None):
+        """
+        Generate a random cube. The probability is the same for all possible states.
+        :param rng: A random.Random object, for example with a fixed seed, by default the module random is used
+        """
+        rand = randrange if rng is None else rng.randrange
+        self.ep = perm_unrank(rand(479001600), 12)  # 12!
         p = self.edge_parity()
         while True:
-            self.set_corners(randrange(40320))  # 8!
+            self.set_corners(rand(40320))  # 8!
             if p == self.corner_parity():  # parities of edge and corner permutations must be the same
                 break
-        self.set_flip(randrange(2048))  # 2^11
-        self.set_twist(randrange(2187))  # 3^7
+        self.set_flip(rand(2048))  # 2^11
+        self.set_twist(rand(2187))  # 3^7
 
     def verify(self):
         """Check if cubiecube is valid."""
         edge_count = [0]*12
         for i in Ed:
-            edge_count[self.ep[i]] += 1
+            if self.ep[i] != UNDEFINED:
+                edge_count[self.ep[i]] += 1
         for i in Ed:
             if edge_count[i] != 1:
                 return 'Error: Some edges are undefined.'
@@ -521,7 +406,8 @@ class CubieCube:
 
         corner_count = [0] * 8
         for i in Co:
-            corner_count[self.cp[i]] += 1
+            if self.cp[i] != UNDEFINED:
+                corner_count[self.cp[i]] += 1
         for i in Co:
             if corner_count[i] != 1:
                 return 'Error: Some corners are undefined.'
@@ -86,8 +86,8 @@ class FaceCube:
     def to_cubie_cube(self):
         """Return a cubie representation of the facelet cube."""
         cc = twophase.cubie.CubieCube()
-        cc.cp = [-1] * 8  # invalidate corner and edge permutation
-        cc.ep = [-1] * 12
+        cc.cp = [twophase.cubie.UNDEFINED] * 8  # invalidate corner and edge permutation
+        cc.ep = [twophase.cubie.UNDEFINED] * 12
         for i in Corner:
             fac = cornerFacelet[i]  # facelets of corner  at position i
             ori = 0
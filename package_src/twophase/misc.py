@@ -29,3 +29,30 @@ def c_nk(n, k):
         i -= 1
         j += 1
     return s
+
+
+C_NK = [[c_nk(n, k) for k in range(13)] for n in range(13)]  # C_NK[n][k] = c_nk(n, k) for n, k <= 12
+
+
+def perm_rank(perm):
+    """
+    Rank a permutation of 0, 1, ..., n-1 given as bytes. The rank is the number of left rotations of perm[0..j] which
+    bring j to position j, for j = n-1 down to 1, as a number with mixed radix. Instead of rotating step by step the
+    number of rotations is found with perm.index.
+    """
+    b = 0
+    for j in range(len(perm) - 1, 0, -1):
+        k = (perm.index(j) + 1) % (j + 1)
+        perm = perm[k:] + perm[:k - 1] if k > 0 else perm[:j]  # rotated left by k places, j at the end removed
+        b = (j + 1) * b + k
+    return b
+
+
+def perm_unrank(idx, n):
+    """The permutation of 0, 1, ..., n-1 with rank idx as bytes, the inverse of perm_rank."""
+    perm = bytearray(range(n))
+    for j in range(1, n):
+        idx, k = divmod(idx, j + 1)
+        if k > 0:
+            perm[:j + 1] = perm[j + 1 - k:j + 1] + perm[:j + 1 - k]  # rotate perm[0..j] right by k places
+    return bytes(perm)
@@ -0,0 +1,325 @@
+# ################### Table generators vectorized with NumPy ###########################################################
+
+# The generators in pruning.py walk through the table entries one by one. The functions here expand a whole breadth
+# first search level at once with NumPy gather/scatter operations on the move and symmetry tables. They produce
+# exactly the same table files. NumPy is optional, pruning.py uses these functions only if NumPy is installed.
+# With jobs > 1 each search level is split into ranges of classes which are expanded by separate processes. The exact
+# depths are kept in a shared array. Processes only write the depth of the next level into unfilled entries, so the
+# result does not depend on the order in which the processes run.
+
+import array as ar
+import multiprocessing as mp
+import numpy as np
+import twophase.defs as defs
+import twophase.moves as mv
+import twophase.symmetries as sy
+
+uint32 = 'I' if ar.array('I').itemsize >= 4 else 'L'  # type codes differ between architectures
+UNFILLED = 255
+CHUNK = 1 << 22  # number of table entries processed at a time, limits the memory used by the temporary arrays
+PHASE2_MOVES = (0, 1, 2, 4, 7, 9, 10, 11, 13, 16)  # U1, U2, U3, R2, F2, D1, D2, D3, L2, B2
+
+
+def np_table(table, dtype, n_cols=None):
+    """View an array.array or memoryview table as NumPy array without copying it."""
+    t = np.frombuffer(table, dtype=dtype)
+    if n_cols is not None:
+        t = t.reshape(-1, n_cols)
+    return t
+
+
+def pack_depth4(depth, n_words):
+    """
+    Pack the exact depths with 4 bits per entry, depths > 15 become 15.
+    :param depth: The depth of each entry
+    :param n_words: The number of uint32 words of the table
+    :return: The table as array.array
+    """
+    shifts = np.arange(0, 32, 4, dtype=np.uint32)
+    table = ar.array(uint32)
+    for start in range(0, n_words, CHUNK // 8):
+        stop = min(start + CHUNK // 8, n_words)
+        d = np.minimum(depth[8 * start:8 * stop], 15).astype(np.uint32)
+        words = np.bitwise_or.reduce(d.reshape(-1, 8) << shifts, axis=1)
+        table.frombytes(words.astype(np.uint32).tobytes())
+    return table
+
+
+def pack_depth3(depth, n_words):
+    """
+    Pack the exact depths into the 2-bit format of the pruning tables.
+    :param depth: The depth of each entry, UNFILLED for unknown depths
+    :param n_words: The number of uint32 words of the table. Entries beyond len(depth) get the value 3.
+    :return: The pruning table as array.array
+    """
+    shifts = np.arange(0, 32, 2, dtype=np.uint32)
+    table = ar.array(uint32)
+    for start in range(0, n_words, CHUNK // 16):
+        stop = min(start + CHUNK // 16, n_words)
+        d = np.full(16 * (stop - start), 3, dtype=np.uint32)
+        chunk = depth[16 * start:16 * stop]
+        d[:len(chunk)] = np.where(chunk == UNFILLED, 3, chunk % 3)
+        words = np.bitwise_or.reduce(d.reshape(-1, 16) << shifts, axis=1)
+        table.frombytes(words.astype(np.uint32).tobytes())
+    return table
+
+
+class ClassSearch:
+    """
+    Breadth first search over the table entries n_coord * classidx + coord of a pruning table. classidx is the
+    symmetry class of the flipslice (phase 1) or corners (phase 2) coordinate, coord is the twist (phase 1) or the
+    ud_edges (phase 2) coordinate. The huge phase 1 table combines the twist with the corner tetrad coordinate.
+    """
+
+    def __init__(self, n_coord, class_move, sym_move, coord_move, coord_conj, self_sym):
+        """
+        :param n_coord: The number of values of coord
+        :param class_move: class_move[classidx, m] is the class after applying move m to the class representant
+        :param sym_move: sym_move[classidx, m] is the symmetry which maps this position to its class representant
+        :param coord_move: coord_move[coord, m] is the coord after applying move m
+        :param coord_conj: coord_conj[coord, s] is the coord conjugated by symmetry s
+        :param self_sym: self_sym[classidx] is the bitmask of the symmetries which leave the class representant
+         unchanged
+        """
+        self.n_coord = n_coord
+        self.class_move = class_move.astype(np.int64)
+        self.sym_move = sym_move
+        self.coord_move_conj = coord_conj[coord_move]  # index [coord, move, sym]
+        self.coord_conj = coord_conj
+        self.self_sym = np.array(self_sym, dtype=np.int64)
+        self.n_move = class_move.shape[1]
+
+    def neighbors(self, idx, m):
+        """The table indices after applying move m to the entries idx."""
+        c = idx // self.n_coord
+        return self.class_move[c, m] * self.n_coord + self.coord_move_conj[idx % self.n_coord, m, self.sym_move[c, m]]
+
+    def forward(self, depth_table, depth, lo, hi):
+        """Fill the unfilled neighbors of the entries with the given depth in the range lo <= idx < hi."""
+        for start in range(lo, hi, CHUNK):  # the range is scanned in chunks, the huge phase 1 table has 10^10 entries
+            idx = np.flatnonzero(depth_table[start:min(start + CHUNK, hi)] == depth) + start
+            for m in range(self.n_move):
+                idx1 = self.neighbors(idx, m)
+                idx1 = idx1[depth_table[idx1] == UNFILLED]
+                depth_table[idx1] = depth + 1
+                # symmetric position has eventually more than one representation
+                c1 = idx1 // self.n_coord
+                symmetric = self.self_sym[c1] != 1
+                c1, coord1 = c1[symmetric], idx1[symmetric] % self.n_coord
+                for k in range(1, defs.N_SYM_D4h):
+                    has_k = (self.self_sym[c1] >> k) & 1 == 1
+                    idx2 = c1[has_k] * self.n_coord + self.coord_conj[coord1[has_k], k]
+                    depth_table[idx2[depth_table[idx2] == UNFILLED]] = depth + 1
+
+    def backward(self, depth_table, depth, lo, hi):
+        """Fill the unfilled entries in the range lo <= idx < hi which have a neighbor with the given depth."""
+        for start in range(lo, hi, CHUNK):
+            idx = np.flatnonzero(depth_table[start:min(start + CHUNK, hi)] == UNFILLED) + start
+            found = np.zeros(len(idx), dtype=bool)
+            for m in range(self.n_move):
+                found |= depth_table[self.neighbors(idx, m)] == depth
+            depth_table[idx[found]] = depth + 1
+
+
+def phase1_search(fs_sym):
+    """The ClassSearch for the flipslice_twist_depth3 table."""
+    rep = np_table(sy.flipslice_rep, np.uint32).astype(np.int64)
+    flip_move = np_table(mv.flip_move, np.uint16, defs.N_MOVE)
+    slice_sorted_move = np_table(mv.slice_sorted_move, np.uint16, defs.N_MOVE)
+    slice1 = slice_sorted_move[(rep // defs.N_FLIP) * defs.N_PERM_4] // defs.N_PERM_4
+    flipslice1 = slice1.astype(np.int64) * defs.N_FLIP + flip_move[rep % defs.N_FLIP]
+    twist_move = np_table(mv.twist_move, np.uint16, defs.N_MOVE)
+    return ClassSearch(defs.N_TWIST, np_table(sy.flipslice_classidx, np.uint16)[flipslice1],
+                       np_table(sy.flipslice_sym, np.uint8)[flipslice1], twist_move,
+                       np_table(sy.twist_conj, np.uint16, defs.N_SYM_D4h), fs_sym)
+
+
+def phase2_search(c_sym):
+    """The ClassSearch for the corners_ud_edges_depth3 table, only phase 2 moves are used."""
+    rep = np_table(sy.corner_rep, np.uint16).astype(np.int64)
+    corners1 = np_table(mv.corners_move, np.uint16, defs.N_MOVE)[rep][:, PHASE2_MOVES]
+    ud_edges_move = np_table(mv.ud_edges_move, np.uint16, defs.N_MOVE)[:, PHASE2_MOVES]
+    return ClassSearch(defs.N_UD_EDGES, np_table(sy.corner_classidx, np.uint16)[corners1],
+                       np_table(sy.corner_sym, np.uint8)[corners1], ud_edges_move,
+                       np_table(sy.ud_edges_conj, np.uint16, defs.N_SYM_D4h), c_sym)
+
+
+def phase1_huge_search(fs_sym):
+    """The ClassSearch for the flipslice_twist_tetrad_depth3 table. Its coord is N_CORNER_TETRAD * twist +
+    corner_tetrad, the goal is the position with solved phase 1 and solved corner tetrad."""
+    search = phase1_search(fs_sym)
+    twist_move = np_table(mv.twist_move, np.uint16, defs.N_MOVE).astype(np.uint32)
+    tetrad_move = np_table(mv.corner_tetrad_move, np.uint8, defs.N_MOVE)
+    twist_conj = np_table(sy.twist_conj, np.uint16, defs.N_SYM_D4h).astype(np.uint32)
+    tetrad_conj = np_table(sy.corner_tetrad_conj, np.uint8, defs.N_SYM_D4h)
+    coord_move = (defs.N_CORNER_TETRAD * twist_move[:, None, :] + tetrad_move[None, :, :]).reshape(-1, defs.N_MOVE)
+    coord_conj = (defs.N_CORNER_TETRAD * twist_conj[:, None, :] + tetrad_conj[None, :, :]).reshape(-1, defs.N_SYM_D4h)
+    return ClassSearch(defs.N_TWIST * defs.N_CORNER_TETRAD, search.class_move, search.sym_move, coord_move, coord_conj,
+                       fs_sym)
+
+
+SEARCHES = {'phase1': phase1_search, 'phase2': phase2_search, 'phase1_huge': phase1_huge_search}
+
+# these variables are set in each worker process by init_worker
+worker_search = None
+worker_depth_table = None
+
+
+def init_worker(name, self_sym, shared_depth):
+    """Initialize a worker process for a parallel search."""
+    global worker_search, worker_depth_table
+    worker_search = SEARCHES[name](self_sym)
+    worker_depth_table = np.frombuffer(shared_depth, dtype=np.uint8)
+
+
+def expand(args):
+    """Expand the range of entries lo <= idx < hi in a worker process. args is (backwards, depth, lo, hi)."""
+    backwards, depth, lo, hi = args
+    if backwards:
+        worker_search.backward(worker_depth_table, depth, lo, hi)
+    else:
+        worker_search.forward(worker_depth_table, depth, lo, hi)
+
+
+def breadth_first_search(name, self_sym, n_class, n_coord, max_depth, backwards_depth, jobs):
+    """
+    Compute the exact depths of all entries of a pruning table.
+    :param name: 'phase1', 'phase1_huge' or 'phase2'
+    :param self_sym: The bitmasks of the symmetries which leave the class representants unchanged
+    :param max_depth: Stop the search after this depth, None to fill all entries
+    :param backwards_depth: Search backwards from this depth on, which is faster if most entries are filled
+    :param jobs: The number of processes
+    :return: The array with the depths, UNFILLED for entries deeper than max_depth
+    """
+    total = n_class * n_coord
+    pool = None
+    if jobs > 1:
+        ctx = mp.get_context()
+        shared_depth = ctx.RawArray('B', total)
+        depth_table = np.frombuffer(shared_depth, dtype=np.uint8)
+        depth_table[:] = UNFILLED
+        pool = ctx.Pool(jobs, init_worker, (name, self_sym, shared_depth))
+        # more ranges than processes balance the load, the ranges start at class boundaries
+        bounds = [n_coord * (n_class * i // (4 * jobs)) for i in range(4 * jobs + 1)]
+    else:
+        search = SEARCHES[name](self_sym)
+        depth_table = np.full(total, UNFILLED, dtype=np.uint8)
+        bounds = [0, total]
+
+    depth_table[0] = 0  # solved position
+    done = 1
+    depth = 0
+    print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
+    try:
+        while done != total and depth != max_depth:
+            backwards = backwards_depth is not None and depth >= backwards_depth
+            ranges = [(backwards, depth, bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+            if pool is not None:
+                for _ in pool.imap_unordered(expand, ranges):
+                    print('.', end='', flush=True)
+            elif backwards:
+                search.backward(depth_table, depth, 0, total)
+            else:
+                search.forward(depth_table, depth, 0, total)
+            depth += 1
+            done = total - sum(np.count_nonzero(depth_table[i:i + CHUNK] == UNFILLED)
+                               for i in range(0, total, CHUNK))
+            print()
+            print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return depth_table
+
+
+def phase1_prun_table(fs_sym, jobs=1):
+    """
+    Create the flipslice_twist_depth3 pruning table for phase 1.
+    :param fs_sym: For each flipslice class the bitmask of the symmetries which leave the representant unchanged
+    :param jobs: The number of processes
+    :return: The pruning table as array.array, identical to the table created by pruning.fill_phase1_prun_table
+    """
+    depth_table = breadth_first_search('phase1', fs_sym, defs.N_FLIPSLICE_CLASS, defs.N_TWIST, None, 9, jobs)
+    return pack_depth3(depth_table, defs.N_FLIPSLICE_CLASS * defs.N_TWIST // 16 + 1)
+
+
+def phase1_huge_prun_table(fs_sym, jobs=1):
+    """
+    Create the huge flipslice_twist_tetrad_depth3 pruning table, see pruning.create_phase1_huge_prun_table. The depth
+    array of the search needs one byte per entry, about 10 GB.
+    :param fs_sym: For each flipslice class the bitmask of the symmetries which leave the representant unchanged
+    :param jobs: The number of processes
+    :return: The pruning table as array.array
+    """
+    n_coord = defs.N_TWIST * defs.N_CORNER_TETRAD
+    depth_table = breadth_first_search('phase1_huge', fs_sym, defs.N_FLIPSLICE_CLASS, n_coord, None, 11, jobs)
+    return pack_depth3(depth_table, defs.N_FLIPSLICE_CLASS * n_coord // 16 + 1)
+
+
+def phase2_prun_table(c_sym, jobs=1, full=False):
+    """
+    Create the corners_ud_edges_depth3 pruning table for phase 2. As in pruning.fill_phase2_prun_table the table is
+    filled only up to depth 10, the remaining entries have depth >= 11.
+    :param c_sym: For each corner class the bitmask of the symmetries which leave the representant unchanged
+    :param jobs: The number of processes
+    :param full: Fill the complete table instead, see phase2_depths
+    :return: The pruning table as array.array
+    """
+    if full:
+        depth_table = phase2_depths(c_sym, jobs)
+    else:
+        depth_table = breadth_first_search('phase2', c_sym, defs.N_CORNERS_CLASS, defs.N_UD_EDGES, 10, None, jobs)
+        print('remaining unfilled entries have depth >=11')
+    return pack_depth3(depth_table, defs.N_CORNERS_CLASS * defs.N_UD_EDGES // 16)
+
+
+def phase2_exact_prun_table(c_sym, jobs=1):
+    """
+    Create the corners_ud_edges_depth pruning table for phase 2 with the exact depths, see
+    pruning.create_phase2_exact_prun_table.
+    :param c_sym: For each corner class the bitmask of the symmetries which leave the representant unchanged
+    :param jobs: The number of processes
+    :return: The pruning table as array.array
+    """
+    return pack_depth4(phase2_depths(c_sym, jobs), defs.N_CORNERS_CLASS * defs.N_UD_EDGES // 8)
+
+
+def phase2_depths(c_sym, jobs=1):
+    """
+    The exact phase 2 depths of all entries n_ud_edges * corner_classidx + ud_edges, from a complete breadth first
+    search. The deepest entries have depth 18.
+    :param c_sym: For each corner class the bitmask of the symmetries which leave the representant unchanged
+    :param jobs: The number of processes
+    :return: The depths as NumPy uint8 array
+    """
+    return breadth_first_search('phase2', c_sym, defs.N_CORNERS_CLASS, defs.N_UD_EDGES, None, 11, jobs)
+
+
+def phase2_successor_table(c_sym, mask, jobs=1):
+    """
+    Create the phase 2 successor table, see pruning.create_phase2_successor_table.
+    :param c_sym: For each corner class the bitmask of the symmetries which leave the representant unchanged
+    :param mask: True for the table of 10-bit masks of the moves which decrease the depth, False for the table of
+     2-bit depth changes
+    :param jobs: The number of processes used for the breadth first search
+    :return: The table as array.array
+    """
+    depth_table = phase2_depths(c_sym, jobs)
+    search = phase2_search(c_sym)
+    total = len(depth_table)
+    table = ar.array('H' if mask else uint32)
+    for start in range(0, total, CHUNK):
+        idx = np.arange(start, min(start + CHUNK, total), dtype=np.int64)
+        depth = depth_table[idx].astype(np.int8)
+        entries = np.zeros(len(idx), dtype=np.uint32)
+        for i in range(len(PHASE2_MOVES)):
+            change = depth_table[search.neighbors(idx, i)].astype(np.int8) - depth  # -1, 0 or 1
+            if mask:
+                entries |= (change < 0).astype(np.uint32) << i
+            else:
+                entries |= (change + 1).astype(np.uint32) << 2 * i
+        table.frombytes(entries.astype(np.uint16 if mask else np.uint32).tobytes())
+        print('.', end='', flush=True)
+    print()
+    return table
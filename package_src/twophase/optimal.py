@@ -0,0 +1,305 @@
+# ################### Optimal solutions with an IDA* search on the tables of the two-phase algorithm ###################
+
+# solve_optimal returns a shortest maneuver, which takes far longer than the two-phase search of solver.solve.
+# The search deepens the length of the whole maneuver and prunes with the phase 1 table flipslice_twist_depth3 for the
+# cube and for the cube rotated by 120° and 240° along the long diagonal (see solver.rotate_cube), so the distances to
+# the subgroups H of the UD, RL and FB axis are all taken into account. Each of these distances is a lower bound for
+# the length of a solution, because the solved cube is in all three subgroups. With the option phase1_prun='huge' the
+# huge phase 1 table gives a further lower bound for each axis.
+# A solution splits into a first part which ends with a move that is not a phase 2 move, and a rest of phase 2 moves.
+# The first part brings the cube into H, so each time the search reaches H with such a move a phase 2 search looks for
+# the rest, with the moves left. The search itself goes on with all moves, so unlike the two-phase algorithm this
+# continues with phase 2 searches at every phase 1 depth and no solution is missed.
+#
+# python -m twophase.optimal DUUBULDBFRBFRRULLLBRDFFFBLURDBFDFDRFRULBLUFDURRBLBDUDL --processes 4
+
+import argparse
+import multiprocessing as mp
+import time
+import twophase.coord as coord
+import twophase.cubie as cubie
+import twophase.moves as mv
+import twophase.parallel as parallel
+import twophase.pruning as pr
+import twophase.solver as solver
+import twophase.symmetries as sy
+import twophase.tables as tables
+from twophase.defs import N_MOVE
+from twophase.enums import Move
+
+AXES = 3  # the UD, RL and FB axis
+PHASE2_MOVES = frozenset(pr.PHASE2_MOVES)
+SPLIT_DEPTH = 2  # with several processes, the maneuvers of this length are searched further by the worker processes
+NO_SOLUTION = 'Error: No optimal solution found within the timeout.'
+
+
+def axis_moves():
+    """Return the table axis_moves()[rot][m] of the move of the rotated cube (see solver.rotate_cube) which corresponds
+    to the move m of the cube."""
+    moves = []
+    for rot in range(AXES):
+        conj = sy.conj_move[N_MOVE * 16 * rot:N_MOVE * (16 * rot + 1)]  # maps the moves of the rotated cube
+        moves.append([conj.index(m) for m in Move])
+    return moves
+
+
+class OptimalSearch:
+    """The IDA* search for a shortest maneuver of one cube."""
+
+    def __init__(self, cc, timeout=None, start_time=None, terminated=None):
+        """
+        :param cc: The cube to be solved in CubieCube representation
+        :param timeout: The search stops after timeout seconds, None for no timeout
+        :param start_time: The time the search started
+        :param terminated: If not None, an event which stops the search when set, see parallel.SharedEvent
+        """
+        self.timeout = timeout
+        self.start_time = start_time if start_time is not None else time.monotonic()
+        self.terminated = terminated
+        self.axis_moves = axis_moves()
+        self.use_huge = tables.enabled('flipslice_twist_tetrad_depth3')
+        self.exact_phase2_depth = tables.enabled('corners_ud_edges_depth')
+        self.depth10 = tables.options['phase2_prun'] == 'depth10'
+
+        self.maneuver = []
+        self.solution = None  # the solution found
+        self.stopped = False  # set if the search stopped because of the timeout or the terminated event
+        self.split_depth = None  # if not None, search collects the maneuvers of this length in prefixes
+        self.prefixes = []
+        self.nodes = 0
+        self.phase2_searches = 0
+        self.phase2_nodes = 0
+
+        # the state of a node is the tuple (axes, corners, u_edges, d_edges), axes[rot] holds the phase 1 coordinates
+        # of the rotated cube and their distances
+        axes = []
+        for rot in range(AXES):
+            co = coord.CoordCube(solver.rotate_cube(cc, rot))
+            dist_huge = co.get_depth_phase1_huge() if self.use_huge else 0
+            axes.append((co.flip, co.twist, co.slice_sorted, co.get_depth_phase1(), co.corner_tetrad, dist_huge))
+        co = coord.CoordCube(cc)
+        self.root = (tuple(axes), co.corners, co.u_edges, co.d_edges)
+
+    def lower_bound(self, state):
+        """Return the lower bound for the length of a maneuver which solves the cube in the given state."""
+        return max(max(a[3], a[5]) for a in state[0])
+
+    def move_state(self, state, m, limit=99):
+        """
+        Apply a move to a state.
+        :param limit: The maximal lower bound for the length of a solution of the new state
+        :return: The new state or None if the lower bound of the new state exceeds limit
+        """
+        axes = []
+        for moves, (flip, twist, slice_sorted, dist, tetrad, dist_huge) in zip(self.axis_moves, state[0]):
+            m_ax = moves[m]
+            flip = mv.flip_move[18 * flip + m_ax]  # N_MOVE = 18
+            twist = mv.twist_move[18 * twist + m_ax]
+            slice_sorted = mv.slice_sorted_move[18 * slice_sorted + m_ax]
+            flipslice = 2048 * (slice_sorted // 24) + flip  # N_FLIP * (slice_sorted // N_PERM_4) + flip
+            classidx = sy.flipslice_classidx[flipslice]
+            sym = sy.flipslice_sym[flipslice]
+            twist_conj = sy.twist_conj[(twist << 4) + sym]
+            dist = pr.distance[3 * dist + pr.get_flipslice_twist_depth3(2187 * classidx + twist_conj)]
+            if dist > limit:
+                return None
+            if self.use_huge:
+                tetrad = mv.corner_tetrad_move[18 * tetrad + m_ax]
+                ix = 70 * (2187 * classidx + twist_conj) + sy.corner_tetrad_conj[(tetrad << 4) + sym]
+                dist_huge = pr.distance[3 * dist_huge + pr.get_flipslice_twist_tetrad_depth3(ix)]
+                if dist_huge > limit:
+                    return None
+            axes.append((flip, twist, slice_sorted, dist, tetrad, dist_huge))
+        _, corners, u_edges, d_edges = state
+        return (tuple(axes), mv.corners_move[18 * corners + m], mv.u_edges_move[18 * u_edges + m],
+                mv.d_edges_move[18 * d_edges + m])
+
+    def expired(self):
+        """Check the timeout and the terminated event, return True if the search has to stop."""
+        if self.terminated is not None and self.terminated.is_set():
+            self.stopped = True
+        elif self.timeout is not None and time.monotonic() > self.start_time + self.timeout:
+            self.stopped = True
+        return self.stopped
+
+    def search(self, state, togo):
+        """
+        Search the maneuvers with at most togo moves which solve the cube in the given state reached by self.maneuver.
+        :return: True if a solution has been found or the search has to stop
+        """
+        self.nodes += 1
+        if self.nodes % solver.SYNC_NODES == 0 and self.expired():
+            return True
+        if self.split_depth == len(self.maneuver):
+            self.prefixes.append(list(self.maneuver))
+            return False
+        if state[0][0][3] == 0 and (len(self.maneuver) == 0 or self.maneuver[-1] not in PHASE2_MOVES):
+            if self.phase2(state, togo):  # in H, the rest of the solution may consist of phase 2 moves
+                return True
+        if togo == 0:
+            return False
+        for m in Move:
+            if len(self.maneuver) > 0:
+                diff = self.maneuver[-1] // 3 - m // 3
+                if diff in [0, 3]:  # successive moves: on same face or on same axis with wrong order
+                    continue
+            state_new = self.move_state(state, m, togo - 1)
+            if state_new is None:  # impossible to solve the cube in togo - 1 moves
+                continue
+            self.maneuver.append(m)
+            done = self.search(state_new, togo - 1)
+            self.maneuver.pop(-1)
+            if done:
+                return True
+        return False
+
+    def phase2(self, state, togo):
+        """Search phase 2 maneuvers with at most togo moves for a state in H. Return True if the search has found a
+        solution or has to stop."""
+        _, corners, u_edges, d_edges = state
+        slice_sorted = state[0][0][2]
+        if pr.cornslice_depth[24 * corners + slice_sorted] > togo:
+            return False
+        ud_edges = coord.u_edges_plus_d_edges_to_ud_edges[24 * u_edges + d_edges % 24]
+        dist = coord.CoordCube.get_depth_phase2(corners, ud_edges)  # 11 if unknown in the default table
+        if dist > togo:
+            return False
+        self.phase2_searches += 1
+        return self.search_phase2(corners, ud_edges, slice_sorted, dist, togo)
+
+    def search_phase2(self, corners, ud_edges, slice_sorted, dist, togo):
+        """Like search, with phase 2 moves only."""
+        self.phase2_nodes += 1
+        if self.phase2_nodes % solver.SYNC_NODES == 0 and self.expired():
+            return True
+        if dist == 0 and slice_sorted == 0:
+            self.solution = list(self.maneuver)
+            return True
+        if togo == 0:
+            return False
+        for m in pr.PHASE2_MOVES:
+            if len(self.maneuver) > 0:
+                diff = self.maneuver[-1] // 3 - m // 3
+                if diff in [0, 3]:  # successive moves: on same face or on same axis with wrong order
+                    continue
+            corners_new = mv.corners_move[18 * corners + m]
+            ud_edges_new = mv.ud_edges_move[18 * ud_edges + m]
+            slice_sorted_new = mv.slice_sorted_move[18 * slice_sorted + m]
+            classidx = sy.corner_classidx[corners_new]
+            sym = sy.corner_sym[corners_new]
+            ix = 40320 * classidx + sy.ud_edges_conj[(ud_edges_new << 4) + sym]
+            if self.exact_phase2_depth:
+                dist_new = pr.get_corners_ud_edges_depth(ix)
+            else:
+                depth3 = pr.get_corners_ud_edges_depth3(ix)
+                if depth3 == 3:  # unfilled entry of the default table, the depth is at least 11
+                    dist_new = 11
+                elif self.depth10 and dist == 11:  # the depth of the unfilled entry was at least 11, so this is 10
+                    dist_new = 10
+                else:
+                    dist_new = pr.distance[3 * dist + depth3]
+            if max(dist_new, pr.cornslice_depth[24 * corners_new + slice_sorted_new]) >= togo:
+                continue  # impossible to reach solved cube in togo - 1 moves
+
+            self.maneuver.append(m)
+            done = self.search_phase2(corners_new, ud_edges_new, slice_sorted_new, dist_new, togo - 1)
+            self.maneuver.pop(-1)
+            if done:
+                return True
+        return False
+
+    def follow(self, prefix):
+        """Apply the moves of prefix to the cube and return the state, search then continues after prefix."""
+        state = self.root
+        for m in prefix:
+            state = self.move_state(state, m)
+        self.maneuver = list(prefix)
+        return state
+
+
+def search_prefix(cubie_cube, prefix, togo, timeout, start_time):
+    """
+    Search the solutions which start with the moves of prefix in a worker process, see parallel.init_worker.
+    :param cubie_cube: The tuple (cp, co, ep, eo) of the cube to be solved
+    :param togo: The maximal number of moves after prefix
+    :return: (solution or None, nodes, phase 2 searches, phase 2 nodes, stopped)
+    """
+    s = OptimalSearch(cubie.CubieCube(*cubie_cube), timeout, start_time, parallel.terminated)
+    if not s.expired():  # the tasks queued after the timeout return at once
+        s.search(s.follow(prefix), togo)
+    if s.solution is not None:
+        parallel.terminated.set()  # stops the other worker processes
+        return [int(m) for m in s.solution], s.nodes, s.phase2_searches, s.phase2_nodes, False
+    return None, s.nodes, s.phase2_searches, s.phase2_nodes, s.stopped
+
+
+def solve_optimal(cubestring, timeout=None, processes=1, progress=False):
+    """
+    Find a shortest maneuver which solves a cube. Depending on the cube this may take hours, see the comment above.
+    :param cubestring: The format of the string is given in the Facelet class defined in the file enums.py
+    :param timeout: If not None, the search stops after timeout seconds and returns NO_SOLUTION
+    :param processes: The number of processes, with more than one process the searches below the maneuvers of length
+     SPLIT_DEPTH run in a pool of worker processes which load the tables like parallel.ProcessPoolSolver
+    :param progress: If True, print the node counts and the time after each search depth
+    :return: The solution in the format of solver.solve or an error message
+    """
+    cc, error = solver.SolveHandle.parse(cubestring, '')
+    if error is not None:
+        return error
+    tables.load()  # does nothing if the tables already have been initialized
+    s_time = time.monotonic()
+    s = OptimalSearch(cc, timeout, s_time)
+    pool = None
+    if processes > 1:
+        ctx = mp.get_context()
+        terminated = parallel.SharedEvent(ctx)
+        args = (terminated, ctx.RawArray('i', [999]), ctx.Lock(), tables.table_folder, tables.load_mode,
+                tables.store_name, dict(tables.options))
+        pool = ctx.Pool(processes, parallel.init_worker, args)
+        s.split_depth = SPLIT_DEPTH
+        s.terminated = terminated
+    cubie_cube = (bytes(cc.cp), bytes(cc.co), bytes(cc.ep), bytes(cc.eo))  # memoryviews cannot be pickled
+    try:
+        for togo in range(s.lower_bound(s.root), 21):  # every cube can be solved in 20 moves
+            s.prefixes = []
+            s.search(s.root, togo)
+            if pool is not None and s.solution is None and not s.stopped:
+                results = [pool.apply_async(search_prefix, (cubie_cube, p, togo - len(p), timeout, s_time))
+                           for p in s.prefixes]
+                for r in results:
+                    solution, nodes, phase2_searches, phase2_nodes, stopped = r.get()
+                    if solution is not None and s.solution is None:
+                        s.solution = solution
+                    s.nodes += nodes
+                    s.phase2_searches += phase2_searches
+                    s.phase2_nodes += phase2_nodes
+                    if stopped:
+                        s.terminated.set()  # stops the other worker processes
+                        s.stopped = True
+            if progress:
+                print('depth ' + str(togo) + ': ' + str(s.nodes) + ' nodes, ' + str(s.phase2_searches) +
+                      ' phase 2 searches, ' + str(s.phase2_nodes) + ' phase 2 nodes, ' +
+                      str(round(time.monotonic() - s_time, 2)) + ' s', flush=True)
+            if s.solution is not None:
+                return solver.maneuver_string(s.solution)
+            if s.stopped:
+                return NO_SOLUTION
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return NO_SOLUTION
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find a shortest maneuver which solves a cube.')
+    parser.add_argument('cubestring', help='the cube definition string, see enums.Facelet')
+    parser.add_argument('--timeout', type=float, default=None, help='stop after this many seconds, default: no limit')
+    parser.add_argument('--processes', type=int, default=1, help='number of processes, default: 1')
+    parser.add_argument('--folder', default=None, help='folder of the table files, default: ' + tables.table_folder)
+    for option in tables.OPTIONS:
+        parser.add_argument('--' + option.replace('_', '-'), choices=tables.OPTIONS[option], default=None,
+                            help='table option, see tables.OPTIONS')
+    args = parser.parse_args()
+    tables.configure(args.folder, **{option: getattr(args, option) for option in tables.OPTIONS})
+    print(solve_optimal(args.cubestring, args.timeout, args.processes, progress=True))
@@ -0,0 +1,191 @@
+# ################### Run the searches of the two-phase algorithm in separate processes ################################
+
+# solver.solve runs up to six searches in threads which share a single core because of Pythons GlobalInterpreterLock.
+# ProcessPoolSolver runs these searches in separate processes instead. The processes share the tables because the
+# table files are mapped into memory (see tables.py) and coordinate the termination and the length of the shortest
+# solution found so far via shared memory.
+# For the offline solution of many cubes, ProcessPoolSolver.solve_many solves whole cubes in the worker processes
+# instead, one cube per process, which scales with the number of cores.
+
+import multiprocessing as mp
+import os
+import queue
+import threading as thr
+import time
+from collections import deque, namedtuple
+import twophase.cubie as cubie
+import twophase.face as face
+import twophase.solver as solver
+import twophase.tables as tables
+
+
+class SharedEvent:
+    """The part of the threading.Event interface used by SolverThread, shared by several processes."""
+
+    def __init__(self, ctx):
+        self.flag = ctx.RawValue('b', 0)
+
+    def is_set(self):
+        return self.flag.value == 1
+
+    def set(self):
+        self.flag.value = 1
+
+    def clear(self):
+        self.flag.value = 0
+
+
+# these variables are set in each worker process by init_worker
+terminated = None
+shortest_length = None
+lock = None
+
+
+def init_worker(terminated_, shortest_length_, lock_, folder, mode, store, options):
+    """Initialize a worker process. The tables are loaded once for all cubes the worker will search."""
+    global terminated, shortest_length, lock
+    terminated, shortest_length, lock = terminated_, shortest_length_, lock_
+    tables.load(folder, mode, store, **options)
+
+
+def search(cubie_cube, rot, inv, ret_length, timeout, start_time):
+    """
+    Run one search of the two-phase algorithm in a worker process.
+    :param cubie_cube: The tuple (cp, co, ep, eo) of the cube to be solved
+    :param rot, inv, ret_length, timeout, start_time: See SolverThread
+    :return: The shortest solution this search found as list of moves, or None
+    """
+    solutions = []
+    th = solver.SolverThread(cubie.CubieCube(*cubie_cube), rot, inv, ret_length, timeout, start_time, solutions,
+                             terminated, shortest_length, lock)
+    th.run()  # no new thread, the search runs in the main thread of the worker process
+    if len(solutions) > 0:
+        return [int(m) for m in solutions[-1]]
+    return None
+
+
+# The result of one cube solved by solve_many. solution is the result of solver.solve, length is None if solve
+# returned an error message, time is the computation time in seconds and worker the process id of the worker.
+SolveResult = namedtuple('SolveResult', ['index', 'cubestring', 'solution', 'length', 'time', 'worker'])
+
+
+def solve_cube(index, cubestring, max_length, timeout):
+    """Solve the cube with the given index of a batch completely in a worker process."""
+    s_time = time.monotonic()
+    solution = solver.solve(cubestring, max_length, timeout)
+    t = time.monotonic() - s_time
+    length = int(solution[solution.rfind('(') + 1:-2]) if solution.endswith('f)') else None
+    return SolveResult(index, cubestring, solution, length, t, os.getpid())
+
+
+class ProcessPoolSolver:
+    """Solve cubes with the searches of the two-phase algorithm running in a pool of worker processes."""
+
+    def __init__(self, processes=6, folder=None, mode=None):
+        """
+        :param processes: The number of worker processes. solve needs at most six searches per cube, solve_many
+         solves as many cubes at a time as there are processes.
+        :param folder: The folder with the table files, see tables.configure
+        :param mode: The table load mode, 'mmap' is recommended because all workers then share one copy of the tables
+        """
+        ctx = mp.get_context()
+        self.processes = processes
+        self.terminated = SharedEvent(ctx)
+        self.shortest_length = ctx.RawArray('i', [999])
+        self.lock = ctx.Lock()
+        self.solve_lock = thr.Lock()  # the shared variables allow only one solve at a time
+        tables.load(folder, mode)  # creates missing tables once, before the workers start
+        args = (self.terminated, self.shortest_length, self.lock, tables.table_folder, tables.load_mode,
+                tables.store_name, dict(tables.options))
+        self.pool = ctx.Pool(processes, init_worker, args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes."""
+        self.pool.terminate()
+        self.pool.join()
+
+    def solve(self, cubestring, max_length=20, timeout=3):
+        """Solve a cube defined by its cube definition string. Parameters and result are the same as for solver.solve.
+         :param cubestring: The format of the string is given in the Facelet class defined in the file enums.py
+         :param max_length: The function will return if a maneuver of length <= max_length has been found
+         :param timeout: If the function times out, the best solution found so far is returned. If there has not been
+         found any solution yet the computation continues until a first solution appears.
+        """
+        fc = face.FaceCube()
+        s = fc.from_string(cubestring)
+        if s != cubie.CUBE_OK:
+            return s  # Error in facelet cube
+        cc = fc.to_cubie_cube()
+        s = cc.verify()
+        if s != cubie.CUBE_OK:
+            return s  # Error in cubie cube
+
+        cubie_cube = (bytes(cc.cp), bytes(cc.co), bytes(cc.ep), bytes(cc.eo))  # memoryviews cannot be pickled
+        with self.solve_lock:
+            self.terminated.clear()
+            self.shortest_length[0] = 999
+            s_time = time.monotonic()
+            results = [self.pool.apply_async(search, (cubie_cube, i % 3, i // 3, max_length, timeout, s_time))
+                       for i in solver.search_directions(cc)]
+            solutions = [r.get() for r in results]
+        solutions = [man for man in solutions if man is not None]
+        if len(solutions) > 0:
+            return solver.maneuver_string(min(solutions, key=len))
+        return solver.maneuver_string([])
+
+    def solve_many(self, cubestrings, max_length=20, timeout=3, ordered=True):
+        """
+        Solve many cubes with one cube per worker process. The results are generated while the cubes are solved, only
+        about twice as many cubes as there are workers are taken from cubestrings in advance.
+        :param cubestrings: An iterable of cube definition strings, for example a file with one cube per line
+        :param max_length: See solver.solve, used for each cube
+        :param timeout: See solver.solve, used for each cube
+        :param ordered: True: generate the results in the order of cubestrings. False: generate the results as soon as
+         they are available.
+        :return: A generator of SolveResult tuples
+        """
+        cubes = enumerate(cube.strip() for cube in cubestrings)
+        window = 2 * self.processes
+        pending = deque()  # the AsyncResults in the order of the cubes
+        done = queue.Queue()  # the results and exceptions in order of completion
+
+        def submit():
+            for index, cubestring in cubes:
+                if ordered:
+                    pending.append(self.pool.apply_async(solve_cube, (index, cubestring, max_length, timeout)))
+                else:
+                    pending.append(self.pool.apply_async(solve_cube, (index, cubestring, max_length, timeout),
+                                                         callback=done.put, error_callback=done.put))
+                return True
+            return False
+
+        while len(pending) < window and submit():
+            pass
+        while len(pending) > 0:
+            if ordered:
+                result = pending.popleft().get()
+            else:
+                result = done.get()
+                pending.pop()  # only the number of pending cubes matters
+                if isinstance(result, BaseException):
+                    raise result
+            submit()
+            yield result
+
+
+def solve_many(cubestrings, max_length=20, timeout=3, workers=None, ordered=True, folder=None, mode=None):
+    """
+    Solve many cubes with a pool of worker processes which load the tables once. See ProcessPoolSolver.solve_many.
+    :param workers: The number of worker processes, by default the number of cores
+    :param folder: The folder with the table files, see tables.configure
+    :param mode: The table load mode, see tables.configure
+    :return: A generator of SolveResult tuples
+    """
+    with ProcessPoolSolver(workers or os.cpu_count(), folder, mode) as ps:
+        yield from ps.solve_many(cubestrings, max_length, timeout, ordered)
@@ -6,33 +6,64 @@ import twophase.enums as enums
 import twophase.moves as mv
 import twophase.symmetries as sy
 import twophase.cubie as cb
-from os import path
+import twophase.tables as tables
 import array as ar
+try:
+    import twophase.numpy_tables as np_tables  # vectorized table generators, much faster
+except ImportError:  # NumPy is not installed
+    np_tables = None
 
 uint32 = 'I' if ar.array('I').itemsize >= 4 else 'L'  # type codes differ between architectures
+PHASE2_MOVES = (enums.Move.U1, enums.Move.U2, enums.Move.U3, enums.Move.R2, enums.Move.F2, enums.Move.D1,
+                enums.Move.D2, enums.Move.D3, enums.Move.L2, enums.Move.B2)
 
-flipslice_twist_depth3 = ar.array(uint32)  # global variables, initialized during pruning table cration
-corners_ud_edges_depth3 = ar.array(uint32)
-cornslice_depth = None
-edgeslice_depth = None
+# The pruning tables flipslice_twist_depth3, corners_ud_edges_depth3 and cornslice_depth are global variables which are
+# created or loaded on their first access, see tables.py and function table. The same holds for the optional tables.
 
 # ####################### functions to extract or set values in the pruning tables #####################################
 
 
 def get_flipslice_twist_depth3(ix):
     """get_fst_depth3(ix) is *exactly* the number of moves % 3 to solve phase 1 of a cube with index ix"""
-    y = flipslice_twist_depth3[ix // 16]
+    try:
+        y = flipslice_twist_depth3[ix // 16]
+    except NameError:  # first access, see table
+        y = table('flipslice_twist_depth3')[ix // 16]
+    y >>= (ix % 16) * 2
+    return y & 3
+
+
+def get_flipslice_twist_tetrad_depth3(ix):
+    """get_flipslice_twist_tetrad_depth3(ix) is *exactly* the number of moves % 3 to solve phase 1 and the corner tetrad
+    of a cube with index ix of the huge phase 1 pruning table"""
+    try:
+        y = flipslice_twist_tetrad_depth3[ix // 16]
+    except NameError:  # first access, see table
+        y = table('flipslice_twist_tetrad_depth3')[ix // 16]
     y >>= (ix % 16) * 2
     return y & 3
 
 
 def get_corners_ud_edges_depth3(ix):
     """corners_ud_edges_depth3(ix) is *at least* the number of moves % 3 to solve phase 2 of a cube with index ix"""
-    y = corners_ud_edges_depth3[ix // 16]
+    try:
+        y = corners_ud_edges_depth3[ix // 16]
+    except NameError:  # first access, see table
+        y = table('corners_ud_edges_depth3')[ix // 16]
     y >>= (ix % 16) * 2
     return y & 3
 
 
+def get_corners_ud_edges_depth(ix):
+    """corners_ud_edges_depth(ix) is the number of moves to solve phase 2 of a cube with index ix, at most 15"""
+    try:
+        y = corners_ud_edges_depth[ix // 8]
+    except NameError:  # first access, see table
+        y = table('corners_ud_edges_depth')[ix // 8]
+    y >>= (ix % 8) * 4
+    return y & 15
+
+
 def set_flipslice_twist_depth3(ix, value):
     shift = (ix % 16) * 2
     base = ix >> 4
@@ -49,230 +80,299 @@ def set_corners_ud_edges_depth3(ix, value):
 ########################################################################################################################
 
 
-def create_phase1_prun_table():
-    """Create/load the flipslice_twist_depth3 pruning table for phase 1."""
+def create_phase1_prun_table(jobs=1):
+    """Create/load the flipslice_twist_depth3 pruning table for phase 1.
+    :param jobs: The number of processes used to create the table, needs NumPy
+    """
     global flipslice_twist_depth3
     total = defs.N_FLIPSLICE_CLASS * defs.N_TWIST
     fname = "phase1_prun"
-    if not path.isfile(path.join(defs.FOLDER, fname)):
+    if tables.must_create(fname):
         print("creating " + fname + " table...")
-        print('This may take half an hour or even longer, depending on the hardware.')
-
-        flipslice_twist_depth3 = ar.array(uint32, [0xffffffff] * (total // 16 + 1))
-        # #################### create table with the symmetries of the flipslice classes ###############################
-        cc = cb.CubieCube()
-        fs_sym = ar.array('H', [0] * defs.N_FLIPSLICE_CLASS)
-        for i in range(defs.N_FLIPSLICE_CLASS):
-            if (i + 1) % 1000 == 0:
-                print('.', end='', flush=True)
-            rep = sy.flipslice_rep[i]
-            cc.set_slice(rep // defs.N_FLIP)
-            cc.set_flip(rep % defs.N_FLIP)
-
-            for s in range(defs.N_SYM_D4h):
-                ss = cb.CubieCube(sy.symCube[s].cp, sy.symCube[s].co, sy.symCube[s].ep,
-                                  sy.symCube[s].eo)  # copy cube
-                ss.edge_multiply(cc)  # s*cc
-                ss.edge_multiply(sy.symCube[sy.inv_idx[s]])  # s*cc*s^-1
-                if ss.get_slice() == rep // defs.N_FLIP and ss.get_flip() == rep % defs.N_FLIP:
-                    fs_sym[i] |= 1 << s
-        print()
-        # ##################################################################################################################
-
-        fs_classidx = 0  # value for solved phase 1
-        twist = 0
-        set_flipslice_twist_depth3(defs.N_TWIST * fs_classidx + twist, 0)
-        done = 1
-        depth = 0
-        backsearch = False
-        print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
-        while done != total:
-            depth3 = depth % 3
-            if depth == 9:
-                # backwards search is faster for depth >= 9
-                print('flipping to backwards search...')
-                backsearch = True
-            if depth < 8:
-                mult = 5  # controls the output a few lines below
-            else:
-                mult = 1
-            idx = 0
-            for fs_classidx in range(defs.N_FLIPSLICE_CLASS):
-                if (fs_classidx + 1) % (200 * mult) == 0:
-                    print('.', end='', flush=True)
-                if (fs_classidx + 1) % (16000 * mult) == 0:
-                    print('')
-
-                twist = 0
-                while twist < defs.N_TWIST:
-
-                    # ########## if table entries are not populated, this is very fast: ################################
-                    if not backsearch and idx % 16 == 0 and flipslice_twist_depth3[idx // 16] == 0xffffffff \
-                            and twist < defs.N_TWIST - 16:
-                        twist += 16
-                        idx += 16
-                        continue
-                    ####################################################################################################
-
-                    if backsearch:
-                        match = (get_flipslice_twist_depth3(idx) == 3)
-                    else:
-                        match = (get_flipslice_twist_depth3(idx) == depth3)
-
-                    if match:
-                        flipslice = sy.flipslice_rep[fs_classidx]
-                        flip = flipslice % 2048  # defs.N_FLIP = 2048
-                        slice_ = flipslice >> 11  # // defs.N_FLIP
-                        for m in enums.Move:
-                            twist1 = mv.twist_move[18 * twist + m]  # defs.N_MOVE = 18
-                            flip1 = mv.flip_move[18 * flip + m]
-                            slice1 = mv.slice_sorted_move[432 * slice_ + m] // 24  # defs.N_PERM_4 = 24, 18*24 = 432
-                            flipslice1 = (slice1 << 11) + flip1
-                            fs1_classidx = sy.flipslice_classidx[flipslice1]
-                            fs1_sym = sy.flipslice_sym[flipslice1]
-                            twist1 = sy.twist_conj[(twist1 << 4) + fs1_sym]
-                            idx1 = 2187 * fs1_classidx + twist1  # defs.N_TWIST = 2187
-                            if not backsearch:
-                                if get_flipslice_twist_depth3(idx1) == 3:  # entry not yet filled
-                                    set_flipslice_twist_depth3(idx1, (depth + 1) % 3)
-                                    done += 1
-                                    # ####symmetric position has eventually more than one representation ###############
-                                    sym = fs_sym[fs1_classidx]
-                                    if sym != 1:
-                                        for k in range(1, 16):
-                                            sym >>= 1
-                                            if sym % 2 == 1:
-                                                twist2 = sy.twist_conj[(twist1 << 4) + k]
-                                                # fs2_classidx = fs1_classidx due to symmetry
-                                                idx2 = 2187 * fs1_classidx + twist2
-                                                if get_flipslice_twist_depth3(idx2) == 3:
-                                                    set_flipslice_twist_depth3(idx2, (depth + 1) % 3)
-                                                    done += 1
-                                    ####################################################################################
-
-                            else:  # backwards search
-                                if get_flipslice_twist_depth3(idx1) == depth3:
-                                    set_flipslice_twist_depth3(idx, (depth + 1) % 3)
-                                    done += 1
-                                    break
-                    twist += 1
-                    idx += 1  # idx = defs.N_TWIST * fs_class + twist
-
-            depth += 1
-            print()
-            print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
-
-        fh = open(path.join(defs.FOLDER, fname), "wb")
-        flipslice_twist_depth3.tofile(fh)
+        fs_sym = create_flipslice_symmetries()
+        if np_tables is not None:
+            flipslice_twist_depth3 = np_tables.phase1_prun_table(fs_sym, jobs)
+        else:
+            print('This may take half an hour or even longer, depending on the hardware. Installing NumPy speeds '
+                  'this up considerably.')
+            fill_phase1_prun_table(fs_sym)
+        tables.save_table(fname, flipslice_twist_depth3)
     else:
         print("loading " + fname + " table...")
-        fh = open(path.join(defs.FOLDER, fname), "rb")
-        flipslice_twist_depth3 = ar.array(uint32)
-        flipslice_twist_depth3.fromfile(fh, total // 16 + 1)
-    fh.close()
-
-
-def create_phase2_prun_table():
-    """Create/load the corners_ud_edges_depth3 pruning table for phase 2."""
-    total = defs.N_CORNERS_CLASS * defs.N_UD_EDGES
-    fname = "phase2_prun"
-    global corners_ud_edges_depth3
-    if not path.isfile(path.join(defs.FOLDER, fname)):
+        flipslice_twist_depth3 = tables.load_table(fname, uint32, total // 16 + 1)
+
+
+def create_phase1_huge_prun_table(jobs=1):
+    """Create/load the optional huge pruning table flipslice_twist_tetrad_depth3, enabled with
+    tables.configure(phase1_prun='huge'). It extends the phase 1 pruning table by the corner_tetrad coordinate and
+    holds the number of moves % 3 to solve phase 1 and to bring the corners URF, ULB, DLF and DRB to their positions.
+    This is a lower bound for the length of the complete maneuver, so phase 1 nodes which cannot lead to a shorter
+    solution than the shortest one found so far are cut off. The table has 64430 * 2187 * 70 entries and needs 2.5 GB,
+    creating it needs NumPy, about 13 GB of memory and takes several hours.
+    :param jobs: The number of processes used to create the table
+    """
+    global flipslice_twist_tetrad_depth3
+    if not tables.enabled('flipslice_twist_tetrad_depth3'):
+        raise ValueError("the flipslice_twist_tetrad_depth3 table is not enabled, see tables.configure")
+    fname = "phase1_prun_huge"
+    if tables.must_create(fname):
         print("creating " + fname + " table...")
-
-        corners_ud_edges_depth3 = ar.array(uint32, [0xffffffff] * (total // 16))
-        # ##################### create table with the symmetries of the corners classes ################################
-        cc = cb.CubieCube()
-        c_sym = ar.array('H', [0] * defs.N_CORNERS_CLASS)
-        for i in range(defs.N_CORNERS_CLASS):
-            if (i + 1) % 1000 == 0:
+        if np_tables is None:
+            raise ImportError('creating the ' + fname + ' table needs NumPy')
+        flipslice_twist_tetrad_depth3 = np_tables.phase1_huge_prun_table(create_flipslice_symmetries(), jobs)
+        tables.save_table(fname, flipslice_twist_tetrad_depth3)
+    else:
+        print("loading " + fname + " table...")
+        flipslice_twist_tetrad_depth3 = tables.load_table(fname, *tables.FORMATS[fname])
+
+
+def create_flipslice_symmetries():
+    """Return for each flipslice class the bitmask of the symmetries which leave the class representant unchanged."""
+    cc = cb.CubieCube()
+    fs_sym = ar.array('H', [0] * defs.N_FLIPSLICE_CLASS)
+    for i in range(defs.N_FLIPSLICE_CLASS):
+        if (i + 1) % 1000 == 0:
+            print('.', end='', flush=True)
+        rep = sy.flipslice_rep[i]
+        cc.set_slice(rep // defs.N_FLIP)
+        cc.set_flip(rep % defs.N_FLIP)
+
+        for s in range(defs.N_SYM_D4h):
+            ss = cb.CubieCube(sy.symCube[s].cp, sy.symCube[s].co, sy.symCube[s].ep,
+                              sy.symCube[s].eo)  # copy cube
+            ss.edge_multiply(cc)  # s*cc
+            ss.edge_multiply(sy.symCube[sy.inv_idx[s]])  # s*cc*s^-1
+            if ss.get_slice() == rep // defs.N_FLIP and ss.get_flip() == rep % defs.N_FLIP:
+                fs_sym[i] |= 1 << s
+    print()
+    return fs_sym
+
+
+def fill_phase1_prun_table(fs_sym):
+    """Create the flipslice_twist_depth3 pruning table entry by entry, used if NumPy is not available."""
+    global flipslice_twist_depth3
+    total = defs.N_FLIPSLICE_CLASS * defs.N_TWIST
+    flipslice_twist_depth3 = ar.array(uint32, [0xffffffff] * (total // 16 + 1))
+    fs_classidx = 0  # value for solved phase 1
+    twist = 0
+    set_flipslice_twist_depth3(defs.N_TWIST * fs_classidx + twist, 0)
+    done = 1
+    depth = 0
+    backsearch = False
+    print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
+    while done != total:
+        depth3 = depth % 3
+        if depth == 9:
+            # backwards search is faster for depth >= 9
+            print('flipping to backwards search...')
+            backsearch = True
+        if depth < 8:
+            mult = 5  # controls the output a few lines below
+        else:
+            mult = 1
+        idx = 0
+        for fs_classidx in range(defs.N_FLIPSLICE_CLASS):
+            if (fs_classidx + 1) % (200 * mult) == 0:
                 print('.', end='', flush=True)
-            rep = sy.corner_rep[i]
-            cc.set_corners(rep)
-            for s in range(defs.N_SYM_D4h):
-                ss = cb.CubieCube(sy.symCube[s].cp, sy.symCube[s].co, sy.symCube[s].ep,
-                                  sy.symCube[s].eo)  # copy cube
-                ss.corner_multiply(cc)  # s*cc
-                ss.corner_multiply(sy.symCube[sy.inv_idx[s]])  # s*cc*s^-1
-                if ss.get_corners() == rep:
-                    c_sym[i] |= 1 << s
-        print()
-        ################################################################################################################
-
-        c_classidx = 0  # value for solved phase 2
-        ud_edge = 0
-        set_corners_ud_edges_depth3(defs.N_UD_EDGES * c_classidx + ud_edge, 0)
-        done = 1
-        depth = 0
-        print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
-        while depth < 10:  # we fill the table only do depth 9 + 1
-            depth3 = depth % 3
-            idx = 0
-            mult = 2
-            if depth > 9:
-                mult = 1
-            for c_classidx in range(defs.N_CORNERS_CLASS):
-                if (c_classidx + 1) % (20 * mult) == 0:
-                    print('.', end='', flush=True)
-                if (c_classidx + 1) % (1600 * mult) == 0:
-                    print('')
-
-                ud_edge = 0
-                while ud_edge < defs.N_UD_EDGES:
-
-                    # ################ if table entries are not populated, this is very fast: ##########################
-                    if idx % 16 == 0 and corners_ud_edges_depth3[idx // 16] == 0xffffffff \
-                            and ud_edge < defs.N_UD_EDGES - 16:
-                        ud_edge += 16
-                        idx += 16
-                        continue
-                    ####################################################################################################
-
-                    if get_corners_ud_edges_depth3(idx) == depth3:
-                        corner = sy.corner_rep[c_classidx]
-                        # only iterate phase 2 moves
-                        for m in (enums.Move.U1, enums.Move.U2, enums.Move.U3, enums.Move.R2, enums.Move.F2,
-                                  enums.Move.D1, enums.Move.D2, enums.Move.D3, enums.Move.L2, enums.Move.B2):
-                            ud_edge1 = mv.ud_edges_move[18 * ud_edge + m]
-                            corner1 = mv.corners_move[18 * corner + m]
-                            c1_classidx = sy.corner_classidx[corner1]
-                            c1_sym = sy.corner_sym[corner1]
-                            ud_edge1 = sy.ud_edges_conj[(ud_edge1 << 4) + c1_sym]
-                            idx1 = 40320 * c1_classidx + ud_edge1  # N_UD_EDGES = 40320
-                            if get_corners_ud_edges_depth3(idx1) == 3:  # entry not yet filled
-                                set_corners_ud_edges_depth3(idx1, (depth + 1) % 3)  # depth + 1 <= 10
+            if (fs_classidx + 1) % (16000 * mult) == 0:
+                print('')
+
+            twist = 0
+            while twist < defs.N_TWIST:
+
+                # ########## if table entries are not populated, this is very fast: ################################
+                if not backsearch and idx % 16 == 0 and flipslice_twist_depth3[idx // 16] == 0xffffffff \
+                        and twist < defs.N_TWIST - 16:
+                    twist += 16
+                    idx += 16
+                    continue
+                ####################################################################################################
+
+                if backsearch:
+                    match = (get_flipslice_twist_depth3(idx) == 3)
+                else:
+                    match = (get_flipslice_twist_depth3(idx) == depth3)
+
+                if match:
+                    flipslice = sy.flipslice_rep[fs_classidx]
+                    flip = flipslice % 2048  # defs.N_FLIP = 2048
+                    slice_ = flipslice >> 11  # // defs.N_FLIP
+                    for m in enums.Move:
+                        twist1 = mv.twist_move[18 * twist + m]  # defs.N_MOVE = 18
+                        flip1 = mv.flip_move[18 * flip + m]
+                        slice1 = mv.slice_sorted_move[432 * slice_ + m] // 24  # defs.N_PERM_4 = 24, 18*24 = 432
+                        flipslice1 = (slice1 << 11) + flip1
+                        fs1_classidx = sy.flipslice_classidx[flipslice1]
+                        fs1_sym = sy.flipslice_sym[flipslice1]
+                        twist1 = sy.twist_conj[(twist1 << 4) + fs1_sym]
+                        idx1 = 2187 * fs1_classidx + twist1  # defs.N_TWIST = 2187
+                        if not backsearch:
+                            if get_flipslice_twist_depth3(idx1) == 3:  # entry not yet filled
+                                set_flipslice_twist_depth3(idx1, (depth + 1) % 3)
                                 done += 1
-                                # ######symmetric position has eventually more than one representation #############
-                                sym = c_sym[c1_classidx]
+                                # ####symmetric position has eventually more than one representation ###############
+                                sym = fs_sym[fs1_classidx]
                                 if sym != 1:
                                     for k in range(1, 16):
                                         sym >>= 1
                                         if sym % 2 == 1:
-                                            ud_edge2 = sy.ud_edges_conj[(ud_edge1 << 4) + k]
-                                            # c1_classidx does not change
-                                            idx2 = 40320 * c1_classidx + ud_edge2
-                                            if get_corners_ud_edges_depth3(idx2) == 3:
-                                                set_corners_ud_edges_depth3(idx2, (depth + 1) % 3)
+                                            twist2 = sy.twist_conj[(twist1 << 4) + k]
+                                            # fs2_classidx = fs1_classidx due to symmetry
+                                            idx2 = 2187 * fs1_classidx + twist2
+                                            if get_flipslice_twist_depth3(idx2) == 3:
+                                                set_flipslice_twist_depth3(idx2, (depth + 1) % 3)
                                                 done += 1
                                 ####################################################################################
 
-                    ud_edge += 1
-                    idx += 1  # idx = defs.N_UD_EDGEPERM * corner_classidx + ud_edge
+                        else:  # backwards search
+                            if get_flipslice_twist_depth3(idx1) == depth3:
+                                set_flipslice_twist_depth3(idx, (depth + 1) % 3)
+                                done += 1
+                                break
+                twist += 1
+                idx += 1  # idx = defs.N_TWIST * fs_class + twist
 
-            depth += 1
-            print()
-            print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
+        depth += 1
+        print()
+        print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
 
-        print('remaining unfilled entries have depth >=11')
-        fh = open(path.join(defs.FOLDER, fname), "wb")
-        corners_ud_edges_depth3.tofile(fh)
+
+def create_phase2_prun_table(jobs=1):
+    """Create/load the corners_ud_edges_depth3 pruning table for phase 2. By default the table is only filled up to
+    depth 10. With tables.configure(phase2_prun='full') the complete table phase2_prun_full is used, creating it needs
+    NumPy.
+    :param jobs: The number of processes used to create the table, needs NumPy
+    """
+    total = defs.N_CORNERS_CLASS * defs.N_UD_EDGES
+    full = tables.options['phase2_prun'] == 'full'
+    fname = "phase2_prun_full" if full else "phase2_prun"
+    global corners_ud_edges_depth3
+    if tables.must_create(fname):
+        print("creating " + fname + " table...")
+        c_sym = create_corner_symmetries()
+        if np_tables is not None:
+            corners_ud_edges_depth3 = np_tables.phase2_prun_table(c_sym, jobs, full)
+        elif full:
+            raise ImportError('creating the ' + fname + ' table needs NumPy')
+        else:
+            fill_phase2_prun_table(c_sym)
+        tables.save_table(fname, corners_ud_edges_depth3)
+    else:
+        print("loading " + fname + " table...")
+        corners_ud_edges_depth3 = tables.load_table(fname, uint32, total // 16)
+
+
+def create_phase2_exact_prun_table(jobs=1):
+    """Create/load the optional corners_ud_edges_depth pruning table for phase 2, enabled with
+    tables.configure(phase2_prun='exact'). It holds the complete phase 2 depths with 4 bits per entry, so the search
+    needs no distance computation modulo 3. The few entries with depth 16 to 18 hold 15. Creating it needs NumPy.
+    :param jobs: The number of processes used to create the table
+    """
+    global corners_ud_edges_depth
+    if not tables.enabled('corners_ud_edges_depth'):
+        raise ValueError("the corners_ud_edges_depth table is not enabled, see tables.configure")
+    fname = "phase2_prun_exact"
+    if tables.must_create(fname):
+        print("creating " + fname + " table...")
+        if np_tables is None:
+            raise ImportError('creating the ' + fname + ' table needs NumPy')
+        corners_ud_edges_depth = np_tables.phase2_exact_prun_table(create_corner_symmetries(), jobs)
+        tables.save_table(fname, corners_ud_edges_depth)
     else:
         print("loading " + fname + " table...")
-        fh = open(path.join(defs.FOLDER, fname), "rb")
-        corners_ud_edges_depth3 = ar.array(uint32)
-        corners_ud_edges_depth3.fromfile(fh, total // 16)
+        corners_ud_edges_depth = tables.load_table(fname, *tables.FORMATS[fname])
+
+
+def create_corner_symmetries():
+    """Return for each corner class the bitmask of the symmetries which leave the class representant unchanged."""
+    cc = cb.CubieCube()
+    c_sym = ar.array('H', [0] * defs.N_CORNERS_CLASS)
+    for i in range(defs.N_CORNERS_CLASS):
+        if (i + 1) % 1000 == 0:
+            print('.', end='', flush=True)
+        rep = sy.corner_rep[i]
+        cc.set_corners(rep)
+        for s in range(defs.N_SYM_D4h):
+            ss = cb.CubieCube(sy.symCube[s].cp, sy.symCube[s].co, sy.symCube[s].ep,
+                              sy.symCube[s].eo)  # copy cube
+            ss.corner_multiply(cc)  # s*cc
+            ss.corner_multiply(sy.symCube[sy.inv_idx[s]])  # s*cc*s^-1
+            if ss.get_corners() == rep:
+                c_sym[i] |= 1 << s
+    print()
+    return c_sym
+
+
+def fill_phase2_prun_table(c_sym):
+    """Create the corners_ud_edges_depth3 pruning table entry by entry, used if NumPy is not available."""
+    global corners_ud_edges_depth3
+    total = defs.N_CORNERS_CLASS * defs.N_UD_EDGES
+    corners_ud_edges_depth3 = ar.array(uint32, [0xffffffff] * (total // 16))
+    c_classidx = 0  # value for solved phase 2
+    ud_edge = 0
+    set_corners_ud_edges_depth3(defs.N_UD_EDGES * c_classidx + ud_edge, 0)
+    done = 1
+    depth = 0
+    print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
+    while depth < 10:  # we fill the table only do depth 9 + 1
+        depth3 = depth % 3
+        idx = 0
+        mult = 2
+        if depth > 9:
+            mult = 1
+        for c_classidx in range(defs.N_CORNERS_CLASS):
+            if (c_classidx + 1) % (20 * mult) == 0:
+                print('.', end='', flush=True)
+            if (c_classidx + 1) % (1600 * mult) == 0:
+                print('')
+
+            ud_edge = 0
+            while ud_edge < defs.N_UD_EDGES:
+
+                # ################ if table entries are not populated, this is very fast: ##########################
+                if idx % 16 == 0 and corners_ud_edges_depth3[idx // 16] == 0xffffffff \
+                        and ud_edge < defs.N_UD_EDGES - 16:
+                    ud_edge += 16
+                    idx += 16
+                    continue
+                ####################################################################################################
+
+                if get_corners_ud_edges_depth3(idx) == depth3:
+                    corner = sy.corner_rep[c_classidx]
+                    # only iterate phase 2 moves
+                    for m in (enums.Move.U1, enums.Move.U2, enums.Move.U3, enums.Move.R2, enums.Move.F2,
+                              enums.Move.D1, enums.Move.D2, enums.Move.D3, enums.Move.L2, enums.Move.B2):
+                        ud_edge1 = mv.ud_edges_move[18 * ud_edge + m]
+                        corner1 = mv.corners_move[18 * corner + m]
+                        c1_classidx = sy.corner_classidx[corner1]
+                        c1_sym = sy.corner_sym[corner1]
+                        ud_edge1 = sy.ud_edges_conj[(ud_edge1 << 4) + c1_sym]
+                        idx1 = 40320 * c1_classidx + ud_edge1  # N_UD_EDGES = 40320
+                        if get_corners_ud_edges_depth3(idx1) == 3:  # entry not yet filled
+                            set_corners_ud_edges_depth3(idx1, (depth + 1) % 3)  # depth + 1 <= 10
+                            done += 1
+                            # ######symmetric position has eventually more than one representation #############
+                            sym = c_sym[c1_classidx]
+                            if sym != 1:
+                                for k in range(1, 16):
+                                    sym >>= 1
+                                    if sym % 2 == 1:
+                                        ud_edge2 = sy.ud_edges_conj[(ud_edge1 << 4) + k]
+                                        # c1_classidx does not change
+                                        idx2 = 40320 * c1_classidx + ud_edge2
+                                        if get_corners_ud_edges_depth3(idx2) == 3:
+                                            set_corners_ud_edges_depth3(idx2, (depth + 1) % 3)
+                                            done += 1
+                            ####################################################################################
+
+                ud_edge += 1
+                idx += 1  # idx = defs.N_UD_EDGEPERM * corner_classidx + ud_edge
+
+        depth += 1
+        print()
+        print('depth:', depth, 'done: ' + str(done) + '/' + str(total))
 
-    fh.close()
+    print('remaining unfilled entries have depth >=11')
 
 
 def create_phase2_cornsliceprun_table():
@@ -280,7 +380,7 @@ def create_phase2_cornsliceprun_table():
     at the beginning of phase 2."""
     fname = "phase2_cornsliceprun"
     global cornslice_depth
-    if not path.isfile(path.join(defs.FOLDER, fname)):
+    if tables.must_create(fname):
         print("creating " + fname + " table...")
         cornslice_depth = ar.array('b', [-1] * (defs.N_CORNERS * defs.N_PERM_4))
         corners = 0  # values for solved phase 2
@@ -305,14 +405,60 @@ def create_phase2_cornsliceprun_table():
 
             depth += 1
         print()
-        fh = open(path.join(defs.FOLDER, fname), "wb")
-        cornslice_depth.tofile(fh)
+        tables.save_table(fname, cornslice_depth)
     else:
         print("loading " + fname + " table...")
-        fh = open(path.join(defs.FOLDER, fname), "rb")
-        cornslice_depth = ar.array('b')
-        cornslice_depth.fromfile(fh, defs.N_CORNERS * defs.N_PERM_4)
-    fh.close()
+        cornslice_depth = tables.load_table(fname, 'b', defs.N_CORNERS * defs.N_PERM_4)
+
+
+def create_phase2_successor_table(jobs=1):
+    """Create/load the optional phase2_successors table, enabled with tables.configure(successors='mask' or 'full').
+    For each entry N_UD_EDGES * corner_classidx + ud_edges of the phase 2 pruning table it tells how the phase 2 depth
+    changes with the 10 phase 2 moves, so the search can expand a node without looking up the depth of each
+    successor. With successors='full' the entry holds for each move 2 bits, the depth change + 1. With
+    successors='mask' it only holds a bit for each move which decreases the depth, half the memory, and the search
+    uses it only for nodes which have to decrease the depth with each move.
+    The moves are the moves of the class representant, see get_phase2_successors. Creating the table needs NumPy.
+    :param jobs: The number of processes used to create the table
+    """
+    global phase2_successors, phase2_successor_slot
+    if not tables.enabled('phase2_successors'):
+        raise ValueError("the phase2_successors table is not enabled, see tables.configure")
+    mask = tables.options['successors'] == 'mask'
+    fname = 'phase2_succ_mask' if mask else 'phase2_succ'
+    # phase2_successor_slot[10 * sym + i] is the position in a table entry of the i-th phase 2 move conjugated by sym
+    slots = [PHASE2_MOVES.index(sy.conj_move[defs.N_MOVE * s + m])
+             for s in range(defs.N_SYM_D4h) for m in PHASE2_MOVES]
+    if tables.must_create(fname):
+        print("creating " + fname + " table...")
+        if np_tables is None:
+            raise ImportError('creating the ' + fname + ' table needs NumPy')
+        phase2_successors = np_tables.phase2_successor_table(create_corner_symmetries(), mask, jobs)
+        tables.save_table(fname, phase2_successors)
+    else:
+        print("loading " + fname + " table...")
+        phase2_successors = tables.load_table(fname, *tables.FORMATS[fname])
+    phase2_successor_slot = ar.array('B', slots)
+
+
+def get_phase2_successors(corners, ud_edges, slack):
+    """
+    Return the phase 2 moves from the position (corners, ud_edges) which increase the phase 2 depth by at most
+    slack - 1, as list of (move index in PHASE2_MOVES, depth change) ordered by the depth change. With the mask table
+    only slack = 0 can be answered, else None is returned.
+    """
+    try:
+        succ, slot = phase2_successors, phase2_successor_slot
+    except NameError:  # first access, see table
+        succ, slot = table('phase2_successors'), table('phase2_successor_slot')
+    sym = sy.corner_sym[corners]
+    entry = succ[defs.N_UD_EDGES * sy.corner_classidx[corners] + sy.ud_edges_conj[(ud_edges << 4) + sym]]
+    if succ.itemsize == 2:  # the mask table
+        if slack > 0:
+            return None
+        return [(i, -1) for i in range(10) if (entry >> slot[10 * sym + i]) & 1]
+    changes = [((entry >> 2 * slot[10 * sym + i]) & 3) - 1 for i in range(10)]
+    return [(i, change) for change in range(-1, min(slack, 2)) for i in range(10) if changes[i] == change]
 
 # array distance computes the new distance from the old_distance i and the new_distance_mod3 j. ########################
 # We need this array because the pruning tables only store the distances mod 3. ########################################
@@ -327,6 +473,22 @@ for i in range(20):
         elif i % 3 == 0 and j == 2:
             distance[3 * i + j] -= 3
 
-create_phase1_prun_table()
-create_phase2_prun_table()
-create_phase2_cornsliceprun_table()
+
+# The pruning tables are created or loaded on the first access of their global variables, see tables.py.
+table_creators = {'flipslice_twist_depth3': create_phase1_prun_table,
+                  'corners_ud_edges_depth3': create_phase2_prun_table,
+                  'cornslice_depth': create_phase2_cornsliceprun_table,
+                  'phase2_successors': create_phase2_successor_table,
+                  'phase2_successor_slot': create_phase2_successor_table,
+                  'corners_ud_edges_depth': create_phase2_exact_prun_table,
+                  'flipslice_twist_tetrad_depth3': create_phase1_huge_prun_table}
+
+
+def table(name):
+    """Return the table with variable name, created or loaded on the first access. The module level __getattr__ only
+    handles the accesses from other modules, so the functions of this module which may run first use table."""
+    return tables.init_table(globals(), table_creators, name)
+
+
+def __getattr__(name):
+    return table(name)
@@ -1,66 +1,176 @@
 # ################## The code of the server socket which communicates with the client ##################################
 
+# The server runs in an asyncio event loop, so thousands of idle connections cost no threads. The solves run in a
+# process pool. At most max_pending solves are queued or running, connections with further requests wait and do not
+# read from their sockets meanwhile, which throttles the clients. A connection is not read while its cube is solved
+# either. If the connection is reset meanwhile, the solve is cancelled by a flag in shared memory.
+
+import asyncio
+import multiprocessing as mp
+import os
 import socket
-import sys
-import threading
-import twophase.solver as solver
 import time
+from concurrent.futures import ProcessPoolExecutor
+import twophase.solver as solver
+import twophase.tables as tables
+
+ALLOWED = b'\n\rGETURFDLB'  # the only characters of a request the server evaluates
+IGNORED = bytes(c for c in range(256) if c not in ALLOWED)
+MAX_REQUEST = 4096  # a connection sending more characters without line end is closed
+
+cancel_flags = None  # the shared cancel flags, set in each worker process by init_worker
+
+
+def init_worker(flags, folder, mode, store, options):
+    """Initialize a worker process: keep the shared cancel flags and load the tables."""
+    global cancel_flags
+    cancel_flags = flags
+    tables.load(folder, mode, store, **options)
+
+
+def solve_cancellable(slot, defstr, maxlen, timeout, deadline):
+    """Solve a cube in a worker process. The solve is cancelled when cancel_flags[slot] is set."""
+    handle = solver.SolveHandle(defstr, maxlen, timeout, deadline).start()
+    while not handle.wait(0.05):
+        if cancel_flags[slot]:
+            handle.cancel()
+    return handle.result().solution
+
 
+class SolverServer:
+    """Serve solve requests of web browsers, the GUI client or telnet."""
 
-def client_thread(conn, maxlen, timeout):
-    while True:  # infinite loop only necessary for telnet client
-        # Receiving from client
-        data = []
-        while not (ord('\n') in data or ord('\r') in data):
+    def __init__(self, maxlen, timeout, workers=None, max_pending=None, deadline=None):
+        """
+        :param maxlen: The maximal length of the returned maneuvers, see solver.solve
+        :param timeout: The timeout of the solves, see solver.solve
+        :param workers: The number of worker processes, by default the number of cores
+        :param max_pending: The maximal number of queued or running solves, by default twice the number of workers
+        :param deadline: The hard deadline of the solves, see solver.solve, None for no deadline
+        """
+        self.maxlen = maxlen
+        self.timeout = timeout
+        self.deadline = deadline
+        self.workers = workers or os.cpu_count()
+        self.max_pending = max_pending or 2 * self.workers
+        self.executor = None
+        self.pending = None
+        self.cancel_flags = mp.RawArray('b', self.max_pending)  # one flag for each queued or running solve
+        self.free_slots = list(range(self.max_pending))
+
+    async def solve(self, defstr, writer):
+        """
+        Solve a cube in a worker process. Waits while max_pending solves are queued or running. Meanwhile no further
+        requests are read, the StreamReader stops reading from the socket when its buffer is full. The solve is
+        cancelled if the connection is reset or closed by an error, which the pending error of the socket shows even if
+        the socket is not read. A client which only closes its sending side after the request (end of file) still gets
+        the answer.
+        :return: The maneuver or None if the connection is lost
+        """
+        async with self.pending:
+            slot = self.free_slots.pop()
+            solve = asyncio.get_running_loop().run_in_executor(self.executor, solve_cancellable, slot, defstr,
+                                                               self.maxlen, self.timeout, self.deadline)
+            sock = writer.get_extra_info('socket')
             try:
-                a = conn.recv(1024).upper()
-                if len(a) == 0:
-                    conn.close()
-                    print('Connection closed', flush=True)
-                    return
-            except:
-                print('Connection closed', flush=True)
-                conn.close()
-                return
-            for i in range(len(a)):
-                if a[i] in [ord('\n'), ord('\r'), ord('G'), ord('E'), ord('T'),  ord('U'), ord('R'), ord('F'), ord('D'),
-                            ord('L'), ord('B')]:
-                    data.append(a[i])
-        if data[0] == ord('X'):
-            break
-        defstr = ''.join(chr(i) for i in data if chr(i) > chr(32))
-        qpos = defstr.find('GET')
-        if qpos >= 0:  # in this case we suppose the client is a webbrowser
-            defstr = defstr[qpos+3:qpos+57]
-            reply = 'HTTP/1.1 200 OK' + '\n\n' + '<html><head><title>Answer from Cubesolver</title></head><body>' + '\n'
-            reply += solver.solve(defstr, maxlen, timeout) + '\n' + '</body></html>' + '\n'
-            conn.sendall(reply.encode())
-            conn.close()
-        else:  # other client, for example the GUI client or telnet
-            reply = (solver.solve(defstr, maxlen, timeout)+'\n').encode()
-            print(defstr)
+                while not solve.done():
+                    if writer.is_closing() or sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR):
+                        self.cancel_flags[slot] = 1
+                        await solve
+                        return None
+                    await asyncio.wait((solve,), timeout=0.05)
+                return solve.result()
+            finally:
+                self.cancel_flags[slot] = 0  # the solve has finished, so the slot can be reused
+                self.free_slots.append(slot)
+
+    @staticmethod
+    async def read_request(reader, data):
+        """
+        Read the next request. Only the characters in ALLOWED are kept.
+        :param data: The bytearray with the characters received but not yet evaluated
+        :return: The request without line end or None if the connection is closed
+        """
+        while True:
+            ends = [i for i in (data.find(b'\n'), data.find(b'\r')) if i >= 0]
+            if ends:
+                request = bytes(data[:min(ends)])
+                del data[:min(ends) + 1]
+                if request:
+                    return request
+                continue  # empty line, for example the second character of \r\n
+            if len(data) > MAX_REQUEST:
+                return None
             try:
-                conn.sendall(reply)
-            except:
-                print('Error while sending data. Connection closed', flush=True)
-                conn.close()
-                return
-    conn.close()
-
-
-def server_start(args):
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    print('Server socket created')
-    try:
-        s.bind(('', int(args[1])))  # bind socket to local host and port
-    except socket.error as e:
-        print('Server socket bind failed. Error Code : ' + str(e.errno))
-        sys.exit()
-    s.listen(10)
-    print('Server now listening...')
-
-    while 1:
-        conn, addr = s.accept()
+                a = await reader.read(1024)
+            except ConnectionError:
+                return None
+            if len(a) == 0:
+                return None
+            data += a.upper().translate(None, IGNORED)
+
+    async def handle_client(self, reader, writer):
+        addr = writer.get_extra_info('peername')
         print('Connected with ' + addr[0] + ':' + str(addr[1]) + ', ' + time.strftime("%Y.%m.%d  %H:%M:%S"))
-        threading.Thread(target=client_thread, args=(conn, int(args[2]), int(args[3]))).start()
-    s.close()
+        data = bytearray()
+        try:
+            while True:  # loop only necessary for telnet client
+                request = await self.read_request(reader, data)
+                if request is None:
+                    break
+                defstr = request.decode()
+                qpos = defstr.find('GET')
+                if qpos >= 0:  # in this case we suppose the client is a webbrowser
+                    defstr = defstr[qpos + 3:qpos + 57]
+                    reply = 'HTTP/1.1 200 OK' + '\n\n'
+                    reply += '<html><head><title>Answer from Cubesolver</title></head><body>' + '\n'
+                    maneuver = await self.solve(defstr, writer)
+                    if maneuver is None:
+                        break
+                    reply += maneuver + '\n' + '</body></html>' + '\n'
+                    writer.write(reply.encode())
+                    await writer.drain()
+                    break
+                else:  # other client, for example the GUI client or telnet
+                    print(defstr)
+                    maneuver = await self.solve(defstr, writer)
+                    if maneuver is None:
+                        break
+                    writer.write((maneuver + '\n').encode())
+                    await writer.drain()
+        except ConnectionError:
+            print('Error while sending data.', flush=True)
+        finally:
+            writer.close()
+            print('Connection closed', flush=True)
+
+    async def serve(self, port, backlog=1024):
+        """Accept connections on port until the task is cancelled."""
+        tables.load()  # creates missing tables once, before the workers start
+        with ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                 initargs=(self.cancel_flags, tables.table_folder, tables.load_mode,
+                                           tables.store_name, dict(tables.options))) as executor:
+            self.executor = executor
+            self.pending = asyncio.Semaphore(self.max_pending)
+            print('Server socket created')
+            try:
+                # the StreamReader stops reading from a socket with more than 2 * limit unread characters
+                server = await asyncio.start_server(self.handle_client, port=port, backlog=backlog,
+                                                    limit=MAX_REQUEST)
+            except OSError as e:
+                print('Server socket bind failed. Error Code : ' + str(e.errno))
+                return
+            print('Server now listening...')
+            async with server:
+                await server.serve_forever()
+
+
+def server_start(args, workers=None, max_pending=None):
+    """
+    Start the server and serve forever.
+    :param args: args[1] is the port, args[2] the maximal length of the maneuvers, args[3] the timeout of the solves
+    :param workers: The number of worker processes, by default the number of cores
+    :param max_pending: The maximal number of queued or running solves, by default twice the number of workers
+    """
+    server = SolverServer(int(args[2]), int(args[3]), workers, max_pending)
+    asyncio.run(server.serve(int(args[1])))
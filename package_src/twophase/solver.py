@@ -7,13 +7,88 @@ import twophase.coord as coord
 from twophase.enums import Move
 import twophase.moves as mv
 import twophase.pruning as pr
+import twophase.tables as tables
 import time
+import queue
+from collections import namedtuple
 from twophase.defs import N_MOVE
+try:
+    import twophase.csearch as csearch  # the optional compiled search kernel, built by setup.py if a compiler exists
+except ImportError:
+    csearch = None
+
+BACKENDS = ('c', 'python')
+backend = 'c' if csearch is not None else 'python'  # the implementation of the search used by SolverThread
+solution_cache = None  # a cache.SolutionCache consulted by solve, None for no cache
+solution_db = None  # a cache.SolutionDatabase consulted by solve, None for no database
+max_phase2_length = 10  # the maximal number of phase 2 moves, at most 10 unless the phase2_prun option is not 'depth10'
+SYNC_NODES = 4096  # the compiled search kernel calls SolverThread.sync every SYNC_NODES nodes, see csearch.c
+
+
+def set_backend(name):
+    """
+    Select the implementation of the search.
+    :param name: 'c' for the compiled kernel which runs the threads truly in parallel, 'python' for the pure Python
+     search
+    """
+    global backend
+    if name not in BACKENDS:
+        raise ValueError('backend must be one of ' + ', '.join(BACKENDS))
+    if name == 'c' and csearch is None:
+        raise ValueError('the compiled search kernel twophase.csearch is not available')
+    backend = name
+
+
+def kernel_tables():
+    """The tables used by the compiled search kernel, in the order expected by csearch.run. The optional tables are
+    None if they are not enabled."""
+    optional = [None] * 6
+    if tables.enabled('phase2_successors'):
+        optional[:2] = [pr.phase2_successors, pr.phase2_successor_slot]
+    if tables.enabled('corners_ud_edges_depth'):
+        optional[2] = pr.corners_ud_edges_depth
+    if tables.enabled('flipslice_twist_tetrad_depth3'):
+        optional[3:] = [mv.corner_tetrad_move, sy.corner_tetrad_conj, pr.flipslice_twist_tetrad_depth3]
+    return [mv.twist_move, mv.flip_move, mv.slice_sorted_move, mv.u_edges_move, mv.d_edges_move, mv.ud_edges_move,
+            mv.corners_move, sy.flipslice_classidx, sy.flipslice_sym, sy.twist_conj, sy.corner_classidx,
+            sy.corner_sym, sy.ud_edges_conj, pr.flipslice_twist_depth3, pr.corners_ud_edges_depth3,
+            pr.cornslice_depth, coord.u_edges_plus_d_edges_to_ud_edges, pr.distance] + optional
+
+
+def phase2_limit():
+    """Return max_phase2_length + 1. With the default phase 2 pruning table, which only knows the depths up to 10,
+    max_phase2_length is restricted to 10."""
+    if tables.options['phase2_prun'] == 'depth10':
+        return min(max_phase2_length, 10) + 1
+    return max_phase2_length + 1
+
+
+def rotate_cube(cc, rot):
+    """
+    Return a copy of the cube rotated along the long diagonal, which maps the UD axis to the RL axis for rot = 1 and
+    to the FB axis for rot = 2. A move m of the rotated cube corresponds to the move conj_move[N_MOVE * 16 * rot + m]
+    of the cube.
+    :param cc: The cube in CubieCube representation
+    :param rot: Rotate by 120° * rot
+    """
+    cb = None
+    if rot == 0:  # no rotation
+        cb = cubie.CubieCube(cc.cp, cc.co, cc.ep, cc.eo)
+    elif rot == 1:  # conjugation by 120° rotation
+        cb = cubie.CubieCube(sy.symCube[32].cp, sy.symCube[32].co, sy.symCube[32].ep, sy.symCube[32].eo)
+        cb.multiply(cc)
+        cb.multiply(sy.symCube[16])
+    elif rot == 2:  # conjugation by 240° rotation
+        cb = cubie.CubieCube(sy.symCube[16].cp, sy.symCube[16].co, sy.symCube[16].ep, sy.symCube[16].eo)
+        cb.multiply(cc)
+        cb.multiply(sy.symCube[32])
+    return cb
 
 
 class SolverThread(thr.Thread):
 
-    def __init__(self, cb_cube, rot, inv, ret_length, timeout, start_time, solutions, terminated, shortest_length):
+    def __init__(self, cb_cube, rot, inv, ret_length, timeout, start_time, solutions, terminated, shortest_length,
+                 lock=None, on_solution=None):
         """
         :param cb_cube: The cube to be solved in CubieCube representation
         :param rot: Rotates the  cube 120° * rot along the long diagonal before applying the two-phase-algorithm
@@ -29,6 +104,10 @@ class SolverThread(thr.Thread):
         :param solutions: An array with the found solutions found by the six parallel threads
         :param terminated: An event shared by the six threads to signal a termination request
         :param shortest_length: The length of the shortes solutions in the solution array
+        :param lock: A lock shared by the six threads to protect solutions and shortest_length. The threads may also
+         run in separate processes, in this case terminated, shortest_length and lock live in shared memory and each
+         process has its own solutions array.
+        :param on_solution: If not None, on_solution(man) is called for each solution appended to the solution array
         """
         thr.Thread.__init__(self)
         self.cb_cube = cb_cube  # CubieCube
@@ -38,27 +117,33 @@ class SolverThread(thr.Thread):
         self.sofar_phase1 = None
         self.sofar_phase2 = None
         self.phase2_done = False
-        self.lock = thr.Lock()
+        self.lock = lock if lock is not None else thr.Lock()
         self.ret_length = ret_length
         self.timeout = timeout
         self.start_time = start_time
 
         self.cornersave = 0
+        # the table options, set in function run
+        self.togo2_cap = 11
+        self.use_successors = False
+        self.exact_phase2_depth = False
+        self.use_huge = False
+        self.kernel_counts = None  # the counters returned by the compiled search kernel, see SearchStats
 
         # these variables are shared by the six threads, initialized in function solve
         self.solutions = solutions
         self.terminated = terminated
         self.shortest_length = shortest_length
+        self.on_solution = on_solution
 
-    def search_phase2(self, corners, ud_edges, slice_sorted, dist, togo_phase2):
-        # ##############################################################################################################
-        if self.terminated.is_set() or self.phase2_done:
-            return
-        ################################################################################################################
-        if togo_phase2 == 0 and slice_sorted == 0:
-            self.lock.acquire()  # phase 2 solved, store solution
-            man = self.sofar_phase1 + self.sofar_phase2
-            if len(self.solutions) == 0 or (len(self.solutions[-1]) > len(man)):
+    def store_solution(self, man):
+        """
+        Store a solution of the rotated/inverted cube if it is shorter than all solutions found so far.
+        :param man: The maneuver which solves the rotated/inverted cube
+        :return: The length of the shortest solution found so far or -1 if the search has to terminate
+        """
+        with self.lock:
+            if len(man) < self.shortest_length[0]:
 
                 if self.inv == 1:  # we solved the inverse cube
                     man = list(reversed(man))
@@ -66,17 +151,42 @@ class SolverThread(thr.Thread):
                 man[:] = [Move(sy.conj_move[N_MOVE * 16 * self.rot + m]) for m in man]
                 self.solutions.append(man)
                 self.shortest_length[0] = len(man)
+                if self.on_solution is not None:
+                    self.on_solution(man)
 
             if self.shortest_length[0] <= self.ret_length:  # we have reached the target length
                 self.terminated.set()
-            self.lock.release()
+        return self.sync()
+
+    def sync(self, nodes=None, phase2_calls=None):
+        """
+        Check for the timeout and a termination request. Called periodically by the compiled search kernel.
+        :param nodes: The number of nodes searched so far by this thread, None if the call is not periodic
+        :param phase2_calls: The number of phase 1 solutions searched so far by phase 2
+        :return: The length of the shortest solution found so far or -1 if the search has to terminate
+        """
+        if time.monotonic() > self.start_time + self.timeout and self.shortest_length[0] < 999:
+            self.terminated.set()
+        if self.terminated.is_set():
+            return -1
+        return self.shortest_length[0]
+
+    def search_phase2(self, corners, ud_edges, slice_sorted, dist, togo_phase2):
+        # ##############################################################################################################
+        if self.terminated.is_set() or self.phase2_done:
+            return
+        ################################################################################################################
+        if togo_phase2 == 0 and slice_sorted == 0:
+            self.store_solution(self.sofar_phase1 + self.sofar_phase2)  # phase 2 solved
             self.phase2_done = True
         else:
-            for m in Move:
-                if m in [Move.R1, Move.R3, Move.F1, Move.F3,
-                         Move.L1, Move.L3, Move.B1, Move.B3]:
-                    continue
-
+            moves = None
+            if self.use_successors:  # moves which cannot reach the solved cube are left out
+                moves = pr.get_phase2_successors(corners, ud_edges, togo_phase2 - dist)
+            if moves is None:
+                moves = [(i, None) for i in range(10)]
+            for i, change in moves:
+                m = pr.PHASE2_MOVES[i]
                 if len(self.sofar_phase2) > 0:
                     diff = self.sofar_phase2[-1] // 3 - m // 3
                     if diff in [0, 3]:  # successive moves: on same face or on same axis with wrong order
@@ -91,11 +201,16 @@ class SolverThread(thr.Thread):
                 ud_edges_new = mv.ud_edges_move[18 * ud_edges + m]
                 slice_sorted_new = mv.slice_sorted_move[18 * slice_sorted + m]
 
-                classidx = sy.corner_classidx[corners_new]
-                sym = sy.corner_sym[corners_new]
-                dist_new_mod3 = pr.get_corners_ud_edges_depth3(
-                    40320 * classidx + sy.ud_edges_conj[(ud_edges_new << 4) + sym])
-                dist_new = pr.distance[3 * dist + dist_new_mod3]
+                if change is not None:  # from the successor table
+                    dist_new = dist + change
+                else:
+                    classidx = sy.corner_classidx[corners_new]
+                    sym = sy.corner_sym[corners_new]
+                    ix = 40320 * classidx + sy.ud_edges_conj[(ud_edges_new << 4) + sym]
+                    if self.exact_phase2_depth:
+                        dist_new = pr.get_corners_ud_edges_depth(ix)
+                    else:
+                        dist_new = pr.distance[3 * dist + pr.get_corners_ud_edges_depth3(ix)]
                 if max(dist_new, pr.cornslice_depth[24 * corners_new + slice_sorted_new]) >= togo_phase2:
                     continue  # impossible to reach solved cube in togo_phase2 - 1 moves
 
@@ -103,50 +218,57 @@ class SolverThread(thr.Thread):
                 self.search_phase2(corners_new, ud_edges_new, slice_sorted_new, dist_new, togo_phase2 - 1)
                 self.sofar_phase2.pop(-1)
 
-    def search(self, flip, twist, slice_sorted, dist, togo_phase1):
+    def phase1_solved(self, slice_sorted):
+        """
+        Search phase 2 maneuvers for the phase 1 maneuver sofar_phase1.
+        :return: False if the precheck with the cornslice_depth table shows that there is no phase 2 maneuver short
+         enough, else True
+        """
+        if time.monotonic() > self.start_time + self.timeout and self.shortest_length[0] < 999:
+            self.terminated.set()
+
+        # compute initial phase 2 coordinates
+        if self.sofar_phase1:  # check if list is not empty
+            m = self.sofar_phase1[-1]
+        else:
+            m = Move.U1  # value is irrelevant here, no phase 1 moves
+
+        if m in [Move.R3, Move.F3, Move.L3, Move.B3]:  # phase 1 solution come in pairs
+            corners = mv.corners_move[18 * self.cornersave + m - 1]  # apply R2, F2, L2 ord B2 on last ph1 solution
+        else:
+            corners = self.co_cube.corners
+            for m in self.sofar_phase1:  # get current corner configuration
+                corners = mv.corners_move[18 * corners + m]
+            self.cornersave = corners
+
+        # new solution must be shorter and we do not use phase 2 maneuvers with length > max_phase2_length
+        togo2_limit = min(self.shortest_length[0] - len(self.sofar_phase1), self.togo2_cap)
+        if pr.cornslice_depth[24 * corners + slice_sorted] >= togo2_limit:  # precheck speeds up the computation
+            return False
+
+        u_edges = self.co_cube.u_edges
+        d_edges = self.co_cube.d_edges
+        for m in self.sofar_phase1:
+            u_edges = mv.u_edges_move[18 * u_edges + m]
+            d_edges = mv.d_edges_move[18 * d_edges + m]
+        ud_edges = coord.u_edges_plus_d_edges_to_ud_edges[24 * u_edges + d_edges % 24]
+
+        dist2 = self.co_cube.get_depth_phase2(corners, ud_edges)
+        for togo2 in range(dist2, togo2_limit):  # do not use more than togo2_limit - 1 moves in phase 2
+            self.sofar_phase2 = []
+            self.phase2_done = False
+            self.search_phase2(corners, ud_edges, slice_sorted, dist2, togo2)
+            if self.phase2_done:  # solution already found
+                break
+        return True
+
+    def search(self, flip, twist, slice_sorted, dist, togo_phase1, tetrad=0, dist_huge=0):
         # ##############################################################################################################
         if self.terminated.is_set():
             return
         ################################################################################################################
         if togo_phase1 == 0:  # phase 1 solved
-
-            if time.monotonic() > self.start_time + self.timeout and len(self.solutions) > 0:
-                self.terminated.set()
-
-            # compute initial phase 2 coordinates
-            if self.sofar_phase1:  # check if list is not empty
-                m = self.sofar_phase1[-1]
-            else:
-                m = Move.U1  # value is irrelevant here, no phase 1 moves
-
-            if m in [Move.R3, Move.F3, Move.L3, Move.B3]:  # phase 1 solution come in pairs
-                corners = mv.corners_move[18 * self.cornersave + m - 1]  # apply R2, F2, L2 ord B2 on last ph1 solution
-            else:
-                corners = self.co_cube.corners
-                for m in self.sofar_phase1:  # get current corner configuration
-                    corners = mv.corners_move[18 * corners + m]
-                self.cornersave = corners
-
-            # new solution must be shorter and we do not use phase 2 maneuvers with length > 11 - 1 = 10
-            togo2_limit = min(self.shortest_length[0] - len(self.sofar_phase1), 11)
-            if pr.cornslice_depth[24 * corners + slice_sorted] >= togo2_limit:  # precheck speeds up the computation
-                return
-
-            u_edges = self.co_cube.u_edges
-            d_edges = self.co_cube.d_edges
-            for m in self.sofar_phase1:
-                u_edges = mv.u_edges_move[18 * u_edges + m]
-                d_edges = mv.d_edges_move[18 * d_edges + m]
-            ud_edges = coord.u_edges_plus_d_edges_to_ud_edges[24 * u_edges + d_edges % 24]
-
-            dist2 = self.co_cube.get_depth_phase2(corners, ud_edges)
-            for togo2 in range(dist2, togo2_limit):  # do not use more than togo2_limit - 1 moves in phase 2
-                self.sofar_phase2 = []
-                self.phase2_done = False
-                self.search_phase2(corners, ud_edges, slice_sorted, dist2, togo2)
-                if self.phase2_done:  # solution already found
-                    break
-
+            self.phase1_solved(slice_sorted)
         else:
             for m in Move:
                 # dist = 0 means that we are already are in the subgroup H. If there are less than 5 moves left
@@ -174,62 +296,257 @@ class SolverThread(thr.Thread):
                 if dist_new >= togo_phase1:  # impossible to reach subgroup H in togo_phase1 - 1 moves
                     continue
 
+                tetrad_new = dist_huge_new = 0
+                if self.use_huge:  # dist_huge_new is a lower bound for the number of moves to solve the cube
+                    tetrad_new = mv.corner_tetrad_move[18 * tetrad + m]
+                    ix = 70 * (2187 * classidx + sy.twist_conj[(twist_new << 4) + sym]) + \
+                        sy.corner_tetrad_conj[(tetrad_new << 4) + sym]  # N_CORNER_TETRAD = 70
+                    dist_huge_new = pr.distance[3 * dist_huge + pr.get_flipslice_twist_tetrad_depth3(ix)]
+                    if len(self.sofar_phase1) + 1 + dist_huge_new >= self.shortest_length[0]:
+                        continue  # impossible to find a shorter solution
+
                 self.sofar_phase1.append(m)
-                self.search(flip_new, twist_new, slice_sorted_new, dist_new, togo_phase1 - 1)
+                self.search(flip_new, twist_new, slice_sorted_new, dist_new, togo_phase1 - 1, tetrad_new, dist_huge_new)
                 self.sofar_phase1.pop(-1)
 
     def run(self):
-        cb = None
-        if self.rot == 0:  # no rotation
-            cb = cubie.CubieCube(self.cb_cube.cp, self.cb_cube.co, self.cb_cube.ep, self.cb_cube.eo)
-        elif self.rot == 1:  # conjugation by 120° rotation
-            cb = cubie.CubieCube(sy.symCube[32].cp, sy.symCube[32].co, sy.symCube[32].ep, sy.symCube[32].eo)
-            cb.multiply(self.cb_cube)
-            cb.multiply(sy.symCube[16])
-        elif self.rot == 2:  # conjugation by 240° rotation
-            cb = cubie.CubieCube(sy.symCube[16].cp, sy.symCube[16].co, sy.symCube[16].ep, sy.symCube[16].eo)
-            cb.multiply(self.cb_cube)
-            cb.multiply(sy.symCube[32])
+        cb = rotate_cube(self.cb_cube, self.rot)
         if self.inv == 1:  # invert cube
             tmp = cubie.CubieCube()
             cb.inv_cubie_cube(tmp)
             cb = tmp
 
         self.co_cube = coord.CoordCube(cb)  # the rotated/inverted cube in coordinate representation
+        self.togo2_cap = phase2_limit()
+        self.use_successors = tables.enabled('phase2_successors')
+        self.exact_phase2_depth = tables.enabled('corners_ud_edges_depth')
+        self.use_huge = tables.enabled('flipslice_twist_tetrad_depth3')
 
         dist = self.co_cube.get_depth_phase1()
+        dist_huge = self.co_cube.get_depth_phase1_huge() if self.use_huge else 0
+        if backend == 'c':
+            self.kernel_counts = csearch.run(kernel_tables(), self, self.co_cube.flip, self.co_cube.twist,
+                                             self.co_cube.slice_sorted, self.co_cube.u_edges, self.co_cube.d_edges,
+                                             self.co_cube.corners, dist, self.shortest_length[0], self.togo2_cap,
+                                             self.co_cube.corner_tetrad, dist_huge)
+            return
         for togo1 in range(dist, 20):  # iterative deepening, solution has at least dist moves
             self.sofar_phase1 = []
-            self.search(self.co_cube.flip, self.co_cube.twist, self.co_cube.slice_sorted, dist, togo1)
+            self.search(self.co_cube.flip, self.co_cube.twist, self.co_cube.slice_sorted, dist, togo1,
+                        self.co_cube.corner_tetrad, dist_huge)
 
 
 # ################################End class SolverThread################################################################
 
 
-def solve(cubestring, max_length=20, timeout=3):
-    """Solve a cube defined by its cube definition string.
-     :param cubestring: The format of the string is given in the Facelet class defined in the file enums.py
-     :param max_length: The function will return if a maneuver of length <= max_length has been found
-     :param timeout: If the function times out, the best solution found so far is returned. If there has not been found
-     any solution yet the computation continues until a first solution appears.
+class SearchStats:
+    """
+    The node counters and search times of a solve, filled by the search threads if a SearchStats object is passed to
+    SolveHandle, solve or solveto. Without it the searches count nothing. directions[(rot, inv)] holds the counters of
+    the search of the rotated/inverted cube, see SolverThread:
+    phase1_nodes: the nodes expanded by SolverThread.search
+    phase1_solutions: the phase 1 maneuvers which reach the subgroup H
+    precheck_rejections: the phase 1 solutions rejected by the cornslice_depth precheck
+    phase2_searches: the phase 1 solutions which reach phase 2
+    phase2_nodes: the nodes expanded by SolverThread.search_phase2
+    time: the running time of the thread in seconds, without the time waiting for its turns in a deterministic solve
+    """
+    COUNTERS = ('phase1_nodes', 'phase1_solutions', 'precheck_rejections', 'phase2_searches', 'phase2_nodes')
+
+    def __init__(self):
+        self.directions = {}
+        self.lock = thr.Lock()
+
+    def add(self, rot, inv, phase1_nodes, phase1_solutions, precheck_rejections, phase2_nodes, s_time):
+        """Add the counters of a finished search of the rotated/inverted cube."""
+        counts = (phase1_nodes, phase1_solutions, precheck_rejections, phase1_solutions - precheck_rejections,
+                  phase2_nodes, s_time)
+        with self.lock:
+            d = self.directions.setdefault((rot, inv), dict.fromkeys(self.COUNTERS + ('time',), 0))
+            for key, n in zip(self.COUNTERS + ('time',), counts):
+                d[key] += n
+
+    def totals(self):
+        """Return the counters summed over all searches, time is the summed thread time and nodes_per_second the
+        phase 1 and phase 2 nodes per second of thread time."""
+        with self.lock:
+            t = {key: sum(d[key] for d in self.directions.values()) for key in self.COUNTERS + ('time',)}
+        nodes = t['phase1_nodes'] + t['phase2_nodes']
+        t['nodes_per_second'] = nodes / t['time'] if t['time'] > 0 else 0.0
+        return t
+
+    def as_dict(self):
+        """Return the counters as dictionary suitable for JSON, the searches with keys like 'rot1_inv0'."""
+        with self.lock:
+            dirs = {'rot%d_inv%d' % key: dict(d) for key, d in sorted(self.directions.items())}
+        return {'directions': dirs, 'total': self.totals()}
+
+    def __str__(self):
+        head = ['search'] + list(self.COUNTERS) + ['time']
+        rows = [head]
+        with self.lock:
+            items = sorted(self.directions.items())
+        for (rot, inv), d in items:
+            rows.append(['rot %d inv %d' % (rot, inv)] + [str(d[key]) for key in self.COUNTERS] +
+                        ['%.3f' % d['time']])
+        t = self.totals()
+        rows.append(['total'] + [str(t[key]) for key in self.COUNTERS] + ['%.3f' % t['time']])
+        width = [max(len(r[i]) for r in rows) for i in range(len(head))]
+        s = '\n'.join('  '.join(x.rjust(w) for x, w in zip(r, width)) for r in rows)
+        return s + '\n%.0f nodes/s' % t['nodes_per_second']
+
+
+class CountingSolverThread(SolverThread):
+    """
+    A SolverThread which counts its nodes. Used for SearchStats and deterministic solves. The compiled search kernel
+    counts by itself, the pure Python search counts in the overridden methods, so SolverThread itself has no counting
+    overhead. Like the kernel, the Python search calls sync every SYNC_NODES nodes, so both backends sync after the
+    same nodes.
+    """
+
+    def __init__(self, *args, stats=None, budget=None, slicer=None, **kwargs):
+        """
+        :param stats: If not None, the SearchStats object which receives the counters when the search has finished
+        :param budget: If not None, the SearchBudget shared by the threads of the solve
+        :param slicer: If not None, the TimeSlicer of a deterministic solve, set before the thread is started
+        The other parameters are those of SolverThread.
+        """
+        SolverThread.__init__(self, *args, **kwargs)
+        self.stats = stats
+        self.budget = budget
+        self.slicer = slicer
+        self.nodes = 0  # all nodes, as counted by the compiled search kernel
+        self.phase1_nodes = 0
+        self.phase1_solutions = 0
+        self.precheck_rejections = 0
+        self.phase2_nodes = 0
+        self.wait_time = 0  # the time spent waiting for the turns of a deterministic solve
+
+    def sync(self, nodes=None, phase2_calls=None):
+        if nodes is not None and self.budget is not None:
+            if self.budget.update(self, nodes, phase2_calls) and self.shortest_length[0] < 999:
+                self.terminated.set()
+        if nodes is not None and self.slicer is not None:
+            t = time.monotonic()
+            self.slicer.next_turn(self)
+            self.wait_time += time.monotonic() - t
+        return SolverThread.sync(self)
+
+    def search_phase2(self, corners, ud_edges, slice_sorted, dist, togo_phase2):
+        if self.terminated.is_set() or self.phase2_done:  # the compiled search kernel does not call it
+            return
+        self.nodes += 1
+        if self.nodes % SYNC_NODES == 0:
+            self.sync(self.nodes, self.phase1_solutions - self.precheck_rejections)
+        if not self.terminated.is_set():
+            self.phase2_nodes += 1
+        SolverThread.search_phase2(self, corners, ud_edges, slice_sorted, dist, togo_phase2)
+
+    def phase1_solved(self, slice_sorted):
+        self.phase1_solutions += 1
+        if not SolverThread.phase1_solved(self, slice_sorted):
+            self.precheck_rejections += 1
+            return False
+        return True
+
+    def search(self, flip, twist, slice_sorted, dist, togo_phase1, tetrad=0, dist_huge=0):
+        if self.terminated.is_set():
+            return
+        self.nodes += 1
+        if self.nodes % SYNC_NODES == 0:
+            self.sync(self.nodes, self.phase1_solutions - self.precheck_rejections)
+        if not self.terminated.is_set():
+            self.phase1_nodes += 1
+        SolverThread.search(self, flip, twist, slice_sorted, dist, togo_phase1, tetrad, dist_huge)
+
+    def run(self):
+        t = time.monotonic()
+        if self.slicer is not None:
+            self.slicer.wait_turn(self)
+        try:
+            if not self.terminated.is_set():  # the compiled search kernel learns about it only at its first sync
+                SolverThread.run(self)
+        finally:
+            if self.slicer is not None:
+                self.slicer.finish(self)
+        if self.kernel_counts is not None:  # (phase1_nodes, phase1_solutions, precheck_rejections, phase2_nodes)
+            self.phase1_nodes, self.phase1_solutions, self.precheck_rejections, self.phase2_nodes = self.kernel_counts
+        if self.stats is not None:
+            self.stats.add(self.rot, self.inv, self.phase1_nodes, self.phase1_solutions, self.precheck_rejections,
+                           self.phase2_nodes, time.monotonic() - t - self.wait_time)
+
+
+class TimeSlicer:
+    """
+    Run the searches of a deterministic solve one at a time in a fixed order. Each search runs until its next periodic
+    sync, that is for SYNC_NODES nodes, and then hands over to the next search. So the interleaving of the searches and
+    with it the solutions and the node counts only depend on the cube and not on the thread scheduling.
+    """
+
+    def __init__(self, threads):
+        """
+        :param threads: The CountingSolverThreads in the order of their turns
+        """
+        self.order = list(threads)
+        self.turn = 0
+        self.cond = thr.Condition()
+
+    def wait_turn(self, th):
+        """Wait until it is the turn of thread th."""
+        with self.cond:
+            while self.order[self.turn] is not th:
+                self.cond.wait()
+
+    def next_turn(self, th):
+        """Hand over from thread th to the next thread and wait for the next turn of th."""
+        with self.cond:
+            self.turn = (self.order.index(th) + 1) % len(self.order)
+            self.cond.notify_all()
+        self.wait_turn(th)
+
+    def finish(self, th):
+        """Hand over from thread th, which has finished its search, to the next thread."""
+        with self.cond:
+            i = self.order.index(th)
+            del self.order[i]
+            if self.order:
+                self.turn = i % len(self.order)
+            self.cond.notify_all()
+
+
+class SearchBudget:
+    """
+    The limits on the work of a solve, shared by its search threads. The threads report their counters at each
+    periodic sync, so a limit is noticed at most SYNC_NODES nodes per thread late. Unlike the timeout the limits do not
+    depend on the load of the machine.
+    """
+
+    def __init__(self, max_nodes=None, max_phase2_calls=None):
+        """
+        :param max_nodes: The maximal number of nodes of all threads, None for no limit
+        :param max_phase2_calls: The maximal number of phase 2 searches of all threads, None for no limit
+        """
+        self.max_nodes = max_nodes
+        self.max_phase2_calls = max_phase2_calls
+        self.nodes = {}  # thread -> nodes at its last periodic sync
+        self.phase2_calls = {}  # thread -> phase 2 searches at its last periodic sync
+        self.lock = thr.Lock()
+
+    def update(self, th, nodes, phase2_calls):
+        """Record the counters of thread th and return True if a limit has been reached."""
+        with self.lock:
+            self.nodes[th] = nodes
+            self.phase2_calls[th] = phase2_calls
+            return (self.max_nodes is not None and sum(self.nodes.values()) >= self.max_nodes or
+                    self.max_phase2_calls is not None and sum(self.phase2_calls.values()) >= self.max_phase2_calls)
+
+
+def search_directions(cc):
+    """
+    Return the searches needed to solve a cube. Search i solves the cube rotated by 120° * (i % 3) along the long
+    diagonal and inverted if i // 3 == 1.
+    :param cc: The cube to be solved in CubieCube representation
     """
-    fc = face.FaceCube()
-    s = fc.from_string(cubestring)
-    if s != cubie.CUBE_OK:
-        return s  # Error in facelet cube
-    cc = fc.to_cubie_cube()
-    s = cc.verify()
-    if s != cubie.CUBE_OK:
-        return s  # Error in cubie cube
-
-    my_threads = []
-    s_time = time.monotonic()
-
-    # these mutable variables are modidified by all six threads
-    shortest_length = [999]
-    solutions = []
-    terminated = thr.Event()
-    terminated.clear()
     syms = cc.symmetries()
     if len(list({16, 20, 24, 28} & set(syms))) > 0:  # we have some rotational symmetry along a long diagonal
         tr = [0, 3]  # so we search only one direction and the inverse
@@ -237,75 +554,260 @@ def solve(cubestring, max_length=20, timeout=3):
         tr = range(6)  # This means search in 3 directions + inverse cube
     if len(list(set(range(48, 96)) & set(syms))) > 0:  # we have some antisymmetry so we do not search the inverses
         tr = list(filter(lambda x: x < 3, tr))
-    for i in tr:
-        th = SolverThread(cc, i % 3, i // 3, max_length, timeout, s_time, solutions, terminated, shortest_length)
-        my_threads.append(th)
-        th.start()
-    for t in my_threads:
-        t.join()  # wait until all threads have finished
+    return tr
+
+
+def maneuver_string(man):
+    """Return the string representation of a maneuver, for example 'R1 U2 F3 (3f)'."""
     s = ''
-    if len(solutions) > 0:
-        for m in solutions[-1]:  # the last solution is the shortest
-            s += m.name + ' '
-    return s + '(' + str(len(s) // 3) + 'f)'
+    for m in man:
+        s += Move(m).name + ' '
+    return s + '(' + str(len(man)) + 'f)'
+
+
+SOLVED = 'solved'  # the status values of a SolveOutcome
+CANCELLED = 'cancelled'
+EXPIRED = 'expired'
+INVALID = 'invalid'
+NO_SOLUTION = 'Error: No solution found within the deadline.'
+
+SolveOutcome = namedtuple('SolveOutcome', ['status', 'solution', 'length', 'time', 'stats'], defaults=(None,))
+SolveOutcome.__doc__ = """The result of a SolveHandle. solution is the maneuver string, the error message of an invalid
+cube or NO_SOLUTION if the solve was cancelled or hit its deadline before a first solution was found. stats is the
+SearchStats object of the SolveHandle, None if the search was not instrumented."""
+
+
+class SolveHandle:
+    """
+    A solve running in background threads. Unlike the timeout and the limits max_nodes and max_phase2_calls, which
+    never stop a search before a first solution has been found, the deadline and cancel stop the search in any case.
+    """
+
+    def __init__(self, cubestring, max_length=20, timeout=3, deadline=None, goalstring=None, on_solution=None,
+                 stats=None, deterministic=False, max_nodes=None, max_phase2_calls=None):
+        """
+        :param cubestring: The format of the string is given in the Facelet class defined in the file enums.py
+        :param max_length: The search stops if a maneuver of length <= max_length has been found
+        :param timeout: The search stops after timeout seconds if at least one solution has been found, None for no
+         timeout
+        :param deadline: The search stops after deadline seconds in any case, None for no deadline
+        :param goalstring: The position to solve the cube to, None for the solved cube, see solveto
+        :param on_solution: If not None, on_solution(man) is called for each new shortest solution, see SolverThread
+        :param stats: If not None, a SearchStats object which receives the node counters and times of the searches
+        :param deterministic: If True, the searches run one at a time in a fixed order, see TimeSlicer, and the
+         timeout is not used. So the same cube always gives the same solution with the same node counts, unless the
+         deadline or cancel stops the search.
+        :param max_nodes: The search stops after max_nodes nodes of all searches if at least one solution has been
+         found, like after the timeout, see SearchBudget. None for no limit.
+        :param max_phase2_calls: The search stops after max_phase2_calls phase 2 searches if at least one solution has
+         been found. None for no limit.
+        """
+        self.max_length = max_length
+        self.timeout = timeout
+        self.deadline = deadline
+        self.on_solution = on_solution
+        self.stats = stats
+        self.deterministic = deterministic
+        self.budget = None
+        if max_nodes is not None or max_phase2_calls is not None:
+            self.budget = SearchBudget(max_nodes, max_phase2_calls)
+        self.cc = None  # the cube to be solved in CubieCube representation
+        self.error = None  # the error message if the cube is invalid
+        self.threads = []
+        self.timer = None
+        self.start_time = None
+        self.outcome = None
+        self.cancelled = False
+
+        # these mutable variables are modidified by all six threads
+        self.shortest_length = [999]
+        self.solutions = []
+        self.terminated = thr.Event()
+        self.lock = thr.Lock()
+
+        if goalstring is None:
+            self.cc, self.error = self.parse(cubestring, '')
+            return
+        cc0, self.error = self.parse(cubestring, 'first cube ')
+        if self.error is None:
+            ccg, self.error = self.parse(goalstring, 'second cube ')
+            if self.error is None:
+                # cc0 * S = ccg  <=> (ccg^-1 * cc0) * S = Id
+                self.cc = cubie.CubieCube()
+                ccg.inv_cubie_cube(self.cc)
+                self.cc.multiply(cc0)
+
+    @staticmethod
+    def parse(cubestring, prefix):
+        """Return (cube in CubieCube representation, None) or (None, error message starting with prefix)."""
+        fc = face.FaceCube()
+        s = fc.from_string(cubestring)
+        if s != cubie.CUBE_OK:
+            return None, prefix + s  # no valid cubestring, gives invalid facelet cube
+        cc = fc.to_cubie_cube()
+        s = cc.verify()
+        if s != cubie.CUBE_OK:
+            return None, prefix + s  # no valid facelet cube, gives invalid cubie cube
+        return cc, None
+
+    def start(self):
+        """Start the search threads. Does nothing if the cube is invalid or the search has already been started."""
+        if self.error is not None or self.start_time is not None:
+            return self
+        tables.load()  # does nothing if the tables already have been initialized
+        self.start_time = time.monotonic()
+        if self.deadline is not None:
+            self.timer = thr.Timer(self.deadline, self.terminated.set)
+            self.timer.daemon = True
+            self.timer.start()
+        timeout = float('inf') if self.deterministic or self.timeout is None else self.timeout
+        for i in search_directions(self.cc):
+            args = (self.cc, i % 3, i // 3, self.max_length, timeout, self.start_time, self.solutions,
+                    self.terminated, self.shortest_length, self.lock, self.on_solution)
+            if self.stats is None and self.budget is None and not self.deterministic:
+                self.threads.append(SolverThread(*args))
+            else:
+                self.threads.append(CountingSolverThread(*args, stats=self.stats, budget=self.budget))
+        if self.deterministic:
+            slicer = TimeSlicer(self.threads)
+            for th in self.threads:
+                th.slicer = slicer
+        for th in self.threads:
+            th.start()
+        return self
+
+    def cancel(self):
+        """Stop the search. The shortest solution found so far, if any, remains available."""
+        self.cancelled = True
+        self.terminated.set()
+
+    def done(self):
+        """Return True if the search has finished."""
+        return not any(t.is_alive() for t in self.threads)
+
+    def wait(self, timeout=None):
+        """
+        Wait until the search has finished.
+        :param timeout: The maximal waiting time in seconds, None to wait without limit
+        :return: True if the search has finished
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        for t in self.threads:
+            t.join(None if end is None else max(0, end - time.monotonic()))
+        return self.done()
+
+    def result(self):
+        """Start the search if necessary, wait until it has finished and return the SolveOutcome."""
+        if self.outcome is not None:
+            return self.outcome
+        if self.error is not None:
+            self.outcome = SolveOutcome(INVALID, self.error, None, 0, self.stats)
+            return self.outcome
+        self.start()
+        self.wait()
+        if self.timer is not None:
+            self.timer.cancel()
+        s_time = time.monotonic() - self.start_time
+        if len(self.solutions) > 0:  # the last solution is the shortest
+            self.outcome = SolveOutcome(CANCELLED if self.cancelled else SOLVED, maneuver_string(self.solutions[-1]),
+                                        len(self.solutions[-1]), s_time, self.stats)
+        else:
+            self.outcome = SolveOutcome(CANCELLED if self.cancelled else EXPIRED, NO_SOLUTION, None, s_time,
+                                        self.stats)
+        return self.outcome
+
+
+def solve(cubestring, max_length=20, timeout=3, deadline=None, stats=None, deterministic=False, max_nodes=None,
+          max_phase2_calls=None):
+    """Solve a cube defined by its cube definition string.
+     :param cubestring: The format of the string is given in the Facelet class defined in the file enums.py
+     :param max_length: The function will return if a maneuver of length <= max_length has been found
+     :param timeout: If the function times out, the best solution found so far is returned. If there has not been found
+     any solution yet the computation continues until a first solution appears.
+     :param deadline: If not None, the function returns after deadline seconds in any case, NO_SOLUTION if there has
+     not been found any solution yet. Use SolveHandle to cancel a solve.
+     :param stats: If not None, a SearchStats object which receives the node counters and times of the search. It stays
+     unchanged if the solution comes from the solution database or cache.
+     :param deterministic: If True, the same cube always gives the same solution, the timeout is replaced by
+     max_nodes, see SolveHandle. The solution database and cache are neither consulted nor updated, their solutions
+     come from other searches.
+     :param max_nodes: If not None, the search stops after max_nodes nodes if at least one solution has been found.
+     Unlike the timeout, this does not depend on the load of the machine. Pass timeout=None to use only this limit.
+     :param max_phase2_calls: If not None, the search stops after max_phase2_calls phase 2 searches if at least one
+     solution has been found
+    """
+    db = None if deterministic else solution_db
+    cache = None if deterministic else solution_cache
+    timed = timeout is not None  # else the database must not assume a search of timeout seconds
+    if db is not None:  # only valid cubes are stored
+        maneuver = db.get(cubestring, max_length, timeout if timed else float('inf'))
+        if maneuver is not None:
+            return maneuver
+    handle = SolveHandle(cubestring, max_length, timeout, deadline, stats=stats, deterministic=deterministic,
+                         max_nodes=max_nodes, max_phase2_calls=max_phase2_calls)
+    if handle.error is not None:
+        return handle.error
+    if cache is not None:
+        man = cache.get(handle.cc, max_length)
+        if man is not None:
+            return maneuver_string(man)
+
+    r = handle.result()
+    if r.status == SOLVED:
+        if cache is not None:
+            cache.put(handle.cc, handle.solutions[-1])
+        if db is not None:  # a search stopped by a limit is recorded with its actual search time
+            strength = timeout if timed and max_nodes is None and max_phase2_calls is None else r.time
+            db.put(cubestring, r.solution, r.length, r.time, max_length,
+                   strength if deadline is None else min(strength, deadline))
+    return r.solution
 
 
 ########################################################################################################################
 
 
-def solveto(cubestring, goalstring, max_length=20, timeout=3):
+def solveto(cubestring, goalstring, max_length=20, timeout=3, deadline=None, stats=None, deterministic=False,
+            max_nodes=None, max_phase2_calls=None):
     """Solve a cube defined by cubstring to a position defined by goalstring.
      :param cubestring: The format of the string is given in the Facelet class defined in the file enums.py
      :param goalstring: The format of the string is given in the Facelet class defined in the file enums.py
      :param max_length: The function will return if a maneuver of length <= max_length has been found
      :param timeout: If the function times out, the best solution found so far is returned. If there has not been found
      any solution yet the computation continues until a first solution appears.
+     :param deadline: If not None, the function returns after deadline seconds in any case, see solve
+     :param stats: If not None, a SearchStats object which receives the node counters and times of the search
+     :param deterministic: If True, the same cubes always give the same solution, see solve
+     :param max_nodes: If not None, the search stops after max_nodes nodes if at least one solution has been found
+     :param max_phase2_calls: If not None, the search stops after max_phase2_calls phase 2 searches if at least one
+     solution has been found
     """
-    fc0 = face.FaceCube()
-    fcg = face.FaceCube()
-    s = fc0.from_string(cubestring)
-    if s != cubie.CUBE_OK:
-        return 'first cube ' + s  # no valid cubestring, gives invalid facelet cube
-    s = fcg.from_string(goalstring)
-    if s != cubie.CUBE_OK:
-        return 'second cube ' + s  # no valid goalstring, gives invalid facelet cube
-    cc0 = fc0.to_cubie_cube()
-    s = cc0.verify()
-    if s != cubie.CUBE_OK:
-        return 'first cube ' + s  # no valid facelet cube, gives invalid cubie cube
-    ccg = fcg.to_cubie_cube()
-    s = ccg.verify()
-    if s != cubie.CUBE_OK:
-        return 'second cube ' + s  # no valid facelet cube, gives invalid cubie cube
-    # cc0 * S = ccg  <=> (ccg^-1 * cc0) * S = Id
-    cc = cubie.CubieCube()
-    ccg.inv_cubie_cube(cc)
-    cc.multiply(cc0)
-
-    my_threads = []
-    s_time = time.monotonic()
-
-    # these mutable variables are modidified by all six threads
-    s_length = [999]
-    solutions = []
-    terminated = thr.Event()
-    terminated.clear()
-    syms = cc.symmetries()
-    if len(list({16, 20, 24, 28} & set(syms))) > 0:  # we have some rotational symmetry along a long diagonal
-        tr = [0, 3]  # so we search only one direction and the inverse
-    else:
-        tr = range(6)  # This means search in 3 directions + inverse cube
-    if len(list(set(range(48, 96)) & set(syms))) > 0:  # we have some antisymmetry so we do not search the inverses
-        tr = list(filter(lambda x: x < 3, tr))
-    for i in tr:
-        th = SolverThread(cc, i % 3, i // 3, max_length, timeout, s_time, solutions, terminated, [999])
-        my_threads.append(th)
-        th.start()
-    for t in my_threads:
-        t.join()  # wait until all threads have finished
-    s = ''
-    if len(solutions) > 0:
-        for m in solutions[-1]:  # the last solution is the shortest
-            s += m.name + ' '
-    return s + '(' + str(len(s) // 3) + 'f)'
+    return SolveHandle(cubestring, max_length, timeout, deadline, goalstring, stats=stats, deterministic=deterministic,
+                       max_nodes=max_nodes, max_phase2_calls=max_phase2_calls).result().solution
+
+
+def solve_iter(cubestring, timeout=3, max_length=0, deadline=None):
+    """Generate the successively shorter solutions of a cube as soon as they are found.
+     :param cubestring: The format of the string is given in the Facelet class defined in the file enums.py
+     :param timeout: The search stops after timeout seconds, but not before a first solution has been found
+     :param max_length: The search stops when a maneuver of length <= max_length has been found
+     :param deadline: If not None, the search stops after deadline seconds in any case
+     The search stops too when the generator is closed, so the caller may stop early when satisfied. If the cube is
+     invalid the error message is the only generated string.
+    """
+    found = queue.Queue()  # the threads put each new shortest solution into this queue
+    handle = SolveHandle(cubestring, max_length, timeout, deadline, on_solution=found.put)
+    if handle.error is not None:
+        yield handle.error
+        return
+    handle.start()
+    try:
+        while not handle.done() or not found.empty():
+            try:
+                man = found.get(timeout=0.01)
+            except queue.Empty:
+                continue
+            yield maneuver_string(man)
+    finally:  # also executed if the generator is closed
+        handle.cancel()
+        handle.result()
 ########################################################################################################################
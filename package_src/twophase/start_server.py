@@ -1,6 +1,7 @@
 # ################# Start the server and listen for connections ########################################################
 
 import twophase.sockets as sockets
+import twophase.tables as tables
 import sys
 
 
@@ -11,8 +12,12 @@ if __name__ == '__main__':  # file is executed
         sys.argv.append(str(20))  # 20 moves default maximal return length of maneuver
     if len(sys.argv) < 4:
         sys.argv.append(str(3))  # 3 second default timeout for search
+    if len(sys.argv) > 4:  # use the tables in the shared memory block with this name, see tables.create_store
+        tables.load(mode='shm', store=sys.argv[4])
     print('startserver')
     sockets.server_start(sys.argv)
 else:
-    def start(port, maxmoves, timeout):
+    def start(port, maxmoves, timeout, store=None):
+        if store is not None:  # use the tables in the shared memory block with this name, see tables.create_store
+            tables.load(mode='shm', store=store)
         sockets.server_start((-1, port, maxmoves, timeout))
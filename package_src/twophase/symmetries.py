@@ -1,10 +1,11 @@
 # #################### Symmetry related functions. Symmetry considerations increase the performance of the solver.######
 
-from os import path, mkdir
+from os import path
 import array as ar
 import twophase.cubie as cb
-from twophase.defs import FOLDER, N_TWIST, N_SYM, N_SYM_D4h, N_FLIP, N_SLICE, N_CORNERS, N_UD_EDGES, N_MOVE, \
-    N_FLIPSLICE_CLASS, N_CORNERS_CLASS
+import twophase.tables as tables
+from twophase.defs import N_TWIST, N_SYM, N_SYM_D4h, N_FLIP, N_SLICE, N_CORNERS, N_UD_EDGES, N_MOVE, \
+    N_FLIPSLICE_CLASS, N_CORNERS_CLASS, N_CORNER_TETRAD
 from twophase.enums import Corner as Co, Edge as Ed, Move as Mv, BS
 
 INVALID = 65535
@@ -74,214 +75,221 @@ for j in range(N_SYM):
             break
 ########################################################################################################################
 
+
 # ################################# Generate the group table for the 48 cube symmetries ################################
-mult_sym = ar.array('B', [0] * (N_SYM * N_SYM))
-for i in range(N_SYM):
-    for j in range(N_SYM):
-        cc = cb.CubieCube(symCube[i].cp, symCube[i].co, symCube[i].ep, symCube[i].eo)
-        cc.multiply(symCube[j])
-        for k in range(N_SYM):
-            if cc == symCube[k]:  # SymCube[i]*SymCube[j] == SymCube[k]
-                mult_sym[N_SYM * i + j] = k
-                break
+def create_mult_sym_table():
+    """Create the group table mult_sym of the 48 cube symmetries."""
+    global mult_sym
+    mult_sym = ar.array('B', [0] * (N_SYM * N_SYM))
+    for i in range(N_SYM):
+        for j in range(N_SYM):
+            cc = cb.CubieCube(symCube[i].cp, symCube[i].co, symCube[i].ep, symCube[i].eo)
+            cc.multiply(symCube[j])
+            for k in range(N_SYM):
+                if cc == symCube[k]:  # SymCube[i]*SymCube[j] == SymCube[k]
+                    mult_sym[N_SYM * i + j] = k
+                    break
 ########################################################################################################################
 
+
 # #### Generate the table for the conjugation of a move m by a symmetry s. conj_move[N_MOVE*s + m] = s*m*s^-1 ##########
-conj_move = ar.array('H', [0] * (N_MOVE * N_SYM))
-for s in range(N_SYM):
-    for m in Mv:
-        ss = cb.CubieCube(symCube[s].cp, symCube[s].co, symCube[s].ep, symCube[s].eo)  # copy cube
-        ss.multiply(cb.moveCube[m])  # s*m
-        ss.multiply(symCube[inv_idx[s]])  # s*m*s^-1
-        for m2 in Mv:
-            if ss == cb.moveCube[m2]:
-                conj_move[N_MOVE * s + m] = m2
+def create_conj_move_table():
+    """Create the conj_move table."""
+    global conj_move
+    conj_move = ar.array('H', [0] * (N_MOVE * N_SYM))
+    for s in range(N_SYM):
+        for m in Mv:
+            ss = cb.CubieCube(symCube[s].cp, symCube[s].co, symCube[s].ep, symCube[s].eo)  # copy cube
+            ss.multiply(cb.moveCube[m])  # s*m
+            ss.multiply(symCube[inv_idx[s]])  # s*m*s^-1
+            for m2 in Mv:
+                if ss == cb.moveCube[m2]:
+                    conj_move[N_MOVE * s + m] = m2
 ########################################################################################################################
 
-if not path.exists(FOLDER):
-    mkdir(FOLDER)
 
 # ###### Generate the phase 1 table for the conjugation of the twist t by a symmetry s. twist_conj[t, s] = s*t*s^-1 ####
-fname = "conj_twist"
-if not path.isfile(path.join(FOLDER, fname)):
-    print('On the first run, several tables will be created. This takes about 1/2 hour or longer '
-          '(depending on the hardware).')
-    print('All tables are stored in ' + path.dirname(path.abspath(path.join(FOLDER, fname))))
-    print()
-    print("creating " + fname + " table...")
-    twist_conj = ar.array('H', [0] * (N_TWIST * N_SYM_D4h))
-    for t in range(N_TWIST):
-        cc = cb.CubieCube()
-        cc.set_twist(t)
-        for s in range(N_SYM_D4h):
-            ss = cb.CubieCube(symCube[s].cp, symCube[s].co, symCube[s].ep, symCube[s].eo)  # copy cube
-            ss.corner_multiply(cc)  # s*t
-            ss.corner_multiply(symCube[inv_idx[s]])  # s*t*s^-1
-            twist_conj[N_SYM_D4h * t + s] = ss.get_twist()
-    fh = open(path.join(FOLDER, fname), "wb")
-    twist_conj.tofile(fh)
-else:
-    print("loading " + fname + " table...")
-    fh = open(path.join(FOLDER, fname), 'rb')
-    twist_conj = ar.array('H')
-    twist_conj.fromfile(fh, N_TWIST * N_SYM_D4h)
-
-fh.close()
+def create_twist_conj_table():
+    """Create/load the twist_conj table."""
+    global twist_conj
+    fname = "conj_twist"
+    if tables.must_create(fname):
+        print('On the first run, several tables will be created. This takes about 1/2 hour or longer '
+              '(depending on the hardware).')
+        print('All tables are stored in ' + path.abspath(tables.table_folder))
+        print()
+        print("creating " + fname + " table...")
+        twist_conj = ar.array('H', [0] * (N_TWIST * N_SYM_D4h))
+        for t in range(N_TWIST):
+            cc = cb.CubieCube()
+            cc.set_twist(t)
+            for s in range(N_SYM_D4h):
+                ss = cb.CubieCube(symCube[s].cp, symCube[s].co, symCube[s].ep, symCube[s].eo)  # copy cube
+                ss.corner_multiply(cc)  # s*t
+                ss.corner_multiply(symCube[inv_idx[s]])  # s*t*s^-1
+                twist_conj[N_SYM_D4h * t + s] = ss.get_twist()
+        tables.save_table(fname, twist_conj)
+    else:
+        print("loading " + fname + " table...")
+        twist_conj = tables.load_table(fname, 'H', N_TWIST * N_SYM_D4h)
 # ######################################################################################################################
 
+
 # #################### Generate the phase 2 table for the conjugation of the URtoDB coordinate by a symmetrie ##########
-fname = "conj_ud_edges"
-if not path.isfile(path.join(FOLDER, fname)):
-    print("creating " + fname + " table...")
-    ud_edges_conj = ar.array('H', [0] * (N_UD_EDGES * N_SYM_D4h))
-    for t in range(N_UD_EDGES):
-        if (t + 1) % 400 == 0:
-            print('.', end='', flush=True)
-        if (t + 1) % 32000 == 0:
-            print('')
+def create_ud_edges_conj_table():
+    """Create/load the ud_edges_conj table."""
+    global ud_edges_conj
+    fname = "conj_ud_edges"
+    if tables.must_create(fname):
+        print("creating " + fname + " table...")
+        ud_edges_conj = ar.array('H', [0] * (N_UD_EDGES * N_SYM_D4h))
+        for t in range(N_UD_EDGES):
+            if (t + 1) % 400 == 0:
+                print('.', end='', flush=True)
+            if (t + 1) % 32000 == 0:
+                print('')
+            cc = cb.CubieCube()
+            cc.set_ud_edges(t)
+            for s in range(N_SYM_D4h):
+                ss = cb.CubieCube(symCube[s].cp, symCube[s].co, symCube[s].ep, symCube[s].eo)  # copy cube
+                ss.edge_multiply(cc)  # s*t
+                ss.edge_multiply(symCube[inv_idx[s]])  # s*t*s^-1
+                ud_edges_conj[N_SYM_D4h * t + s] = ss.get_ud_edges()
+        print('')
+        tables.save_table(fname, ud_edges_conj)
+    else:
+        print("loading " + fname + " table...")
+        ud_edges_conj = tables.load_table(fname, 'H', N_UD_EDGES * N_SYM_D4h)
+# ######################################################################################################################
+
+
+# ######## Generate the table for the conjugation of the corner tetrad coordinate, used by the huge phase 1 table ######
+# Conjugation may exchange the two tetrads. The coordinate stays well defined since the other tetrad takes the remaining
+# positions.
+def create_corner_tetrad_conj_table():
+    """Create the corner_tetrad_conj table. It is small and not stored in a file."""
+    global corner_tetrad_conj
+    corner_tetrad_conj = ar.array('B', [0] * (N_CORNER_TETRAD * N_SYM_D4h))
+    for t in range(N_CORNER_TETRAD):
         cc = cb.CubieCube()
-        cc.set_ud_edges(t)
+        cc.set_corner_tetrad(t)
         for s in range(N_SYM_D4h):
             ss = cb.CubieCube(symCube[s].cp, symCube[s].co, symCube[s].ep, symCube[s].eo)  # copy cube
-            ss.edge_multiply(cc)  # s*t
-            ss.edge_multiply(symCube[inv_idx[s]])  # s*t*s^-1
-            ud_edges_conj[N_SYM_D4h * t + s] = ss.get_ud_edges()
-    print('')
-    fh = open(path.join(FOLDER, fname), "wb")
-    ud_edges_conj.tofile(fh)
-else:
-    print("loading " + fname + " table...")
-    fh = open(path.join(FOLDER, fname), "rb")
-    ud_edges_conj = ar.array('H')
-    ud_edges_conj.fromfile(fh, N_UD_EDGES * N_SYM_D4h)
-fh.close()
+            ss.corner_multiply(cc)  # s*t
+            ss.corner_multiply(symCube[inv_idx[s]])  # s*t*s^-1
+            corner_tetrad_conj[N_SYM_D4h * t + s] = ss.get_corner_tetrad()
 # ######################################################################################################################
 
+
 # ############## Generate the tables to handle the symmetry reduced flip-slice coordinate in  phase 1 ##################
-fname1 = "fs_classidx"
-fname2 = "fs_sym"
-fname3 = "fs_rep"
-if not (path.isfile(path.join(FOLDER, fname1)) and path.isfile(path.join(FOLDER, fname2)) and path.isfile(
-        path.join(FOLDER, fname3))):
-    print("creating " + "flipslice sym-tables...")
-    flipslice_classidx = ar.array('H', [INVALID] * (N_FLIP * N_SLICE))  # idx -> classidx
-    flipslice_sym = ar.array('B', [0] * (N_FLIP * N_SLICE))  # idx -> symmetry
-    flipslice_rep = ar.array(uint32, [0] * N_FLIPSLICE_CLASS)  # classidx -> idx of representant
-
-    classidx = 0
-    cc = cb.CubieCube()
-    for slc in range(N_SLICE):
-        cc.set_slice(slc)
-        for flip in range(N_FLIP):
-            cc.set_flip(flip)
-            idx = N_FLIP * slc + flip
-            if (idx + 1) % 4000 == 0:
+def create_flipslice_sym_tables():
+    """Create/load the flipslice_classidx, flipslice_sym and flipslice_rep tables."""
+    global flipslice_classidx, flipslice_sym, flipslice_rep
+    fname1 = "fs_classidx"
+    fname2 = "fs_sym"
+    fname3 = "fs_rep"
+    if tables.must_create(fname1, fname2, fname3):
+        print("creating " + "flipslice sym-tables...")
+        flipslice_classidx = ar.array('H', [INVALID] * (N_FLIP * N_SLICE))  # idx -> classidx
+        flipslice_sym = ar.array('B', [0] * (N_FLIP * N_SLICE))  # idx -> symmetry
+        flipslice_rep = ar.array(uint32, [0] * N_FLIPSLICE_CLASS)  # classidx -> idx of representant
+
+        classidx = 0
+        cc = cb.CubieCube()
+        for slc in range(N_SLICE):
+            cc.set_slice(slc)
+            for flip in range(N_FLIP):
+                cc.set_flip(flip)
+                idx = N_FLIP * slc + flip
+                if (idx + 1) % 4000 == 0:
+                    print('.', end='', flush=True)
+                if (idx + 1) % 320000 == 0:
+                    print('')
+
+                if flipslice_classidx[idx] == INVALID:
+                    flipslice_classidx[idx] = classidx
+                    flipslice_sym[idx] = 0
+                    flipslice_rep[classidx] = idx
+                else:
+                    continue
+                for s in range(N_SYM_D4h):  # conjugate representant by all 16 symmetries
+                    ss = cb.CubieCube(symCube[inv_idx[s]].cp, symCube[inv_idx[s]].co, symCube[inv_idx[s]].ep,
+                                      symCube[inv_idx[s]].eo)  # copy cube
+                    ss.edge_multiply(cc)
+                    ss.edge_multiply(symCube[s])  # s^-1*cc*s
+                    idx_new = N_FLIP * ss.get_slice() + ss.get_flip()
+                    if flipslice_classidx[idx_new] == INVALID:
+                        flipslice_classidx[idx_new] = classidx
+                        flipslice_sym[idx_new] = s
+                classidx += 1
+        print('')
+        tables.save_table(fname1, flipslice_classidx)
+        tables.save_table(fname2, flipslice_sym)
+        tables.save_table(fname3, flipslice_rep)
+    else:
+        print("loading " + "flipslice sym-tables...")
+        flipslice_classidx = tables.load_table(fname1, 'H', N_FLIP * N_SLICE)
+        flipslice_sym = tables.load_table(fname2, 'B', N_FLIP * N_SLICE)
+        flipslice_rep = tables.load_table(fname3, uint32, N_FLIPSLICE_CLASS)
+########################################################################################################################
+
+
+# ############ Generate the tables to handle the symmetry reduced corner permutation coordinate in phase 2 #############
+def create_corner_sym_tables():
+    """Create/load the corner_classidx, corner_sym and corner_rep tables."""
+    global corner_classidx, corner_sym, corner_rep
+    fname1 = "co_classidx"
+    fname2 = "co_sym"
+    fname3 = "co_rep"
+    if tables.must_create(fname1, fname2, fname3):
+        print("creating " + "corner sym-tables...")
+        corner_classidx = ar.array('H', [INVALID] * N_CORNERS)  # idx -> classidx
+        corner_sym = ar.array('B', [0] * N_CORNERS)  # idx -> symmetry
+        corner_rep = ar.array('H', [0] * N_CORNERS_CLASS)  # classidx -> idx of representant
+
+        classidx = 0
+        cc = cb.CubieCube()
+        for cp in range(N_CORNERS):
+            cc.set_corners(cp)
+            if (cp + 1) % 8000 == 0:
                 print('.', end='', flush=True)
-            if (idx + 1) % 320000 == 0:
-                print('')
 
-            if flipslice_classidx[idx] == INVALID:
-                flipslice_classidx[idx] = classidx
-                flipslice_sym[idx] = 0
-                flipslice_rep[classidx] = idx
+            if corner_classidx[cp] == INVALID:
+                corner_classidx[cp] = classidx
+                corner_sym[cp] = 0
+                corner_rep[classidx] = cp
             else:
                 continue
             for s in range(N_SYM_D4h):  # conjugate representant by all 16 symmetries
                 ss = cb.CubieCube(symCube[inv_idx[s]].cp, symCube[inv_idx[s]].co, symCube[inv_idx[s]].ep,
                                   symCube[inv_idx[s]].eo)  # copy cube
-                ss.edge_multiply(cc)
-                ss.edge_multiply(symCube[s])  # s^-1*cc*s
-                idx_new = N_FLIP * ss.get_slice() + ss.get_flip()
-                if flipslice_classidx[idx_new] == INVALID:
-                    flipslice_classidx[idx_new] = classidx
-                    flipslice_sym[idx_new] = s
+                ss.corner_multiply(cc)
+                ss.corner_multiply(symCube[s])  # s^-1*cc*s
+                cp_new = ss.get_corners()
+                if corner_classidx[cp_new] == INVALID:
+                    corner_classidx[cp_new] = classidx
+                    corner_sym[cp_new] = s
             classidx += 1
-    print('')
-    fh = open(path.join(FOLDER, fname1), 'wb')
-    flipslice_classidx.tofile(fh)
-    fh.close()
-    fh = open(path.join(FOLDER, fname2), 'wb')
-    flipslice_sym.tofile(fh)
-    fh.close()
-    fh = open(path.join(FOLDER, fname3), 'wb')
-    flipslice_rep.tofile(fh)
-    fh.close()
-
-else:
-    print("loading " + "flipslice sym-tables...")
-
-    fh = open(path.join(FOLDER, fname1), 'rb')
-    flipslice_classidx = ar.array('H')
-    flipslice_classidx.fromfile(fh, N_FLIP * N_SLICE)
-    fh.close()
-    fh = open(path.join(FOLDER, fname2), 'rb')
-    flipslice_sym = ar.array('B')
-    flipslice_sym.fromfile(fh, N_FLIP * N_SLICE)
-    fh.close()
-    fh = open(path.join(FOLDER, fname3), 'rb')
-    flipslice_rep = ar.array(uint32)
-    flipslice_rep.fromfile(fh, N_FLIPSLICE_CLASS)
-    fh.close()
+        print('')
+        tables.save_table(fname1, corner_classidx)
+        tables.save_table(fname2, corner_sym)
+        tables.save_table(fname3, corner_rep)
+    else:
+        print("loading " + "corner sym-tables...")
+        corner_classidx = tables.load_table(fname1, 'H', N_CORNERS)
+        corner_sym = tables.load_table(fname2, 'B', N_CORNERS)
+        corner_rep = tables.load_table(fname3, 'H', N_CORNERS_CLASS)
 ########################################################################################################################
 
-# ############ Generate the tables to handle the symmetry reduced corner permutation coordinate in phase 2 #############
-fname1 = "co_classidx"
-fname2 = "co_sym"
-fname3 = "co_rep"
-if not (path.isfile(path.join(FOLDER, fname1)) and path.isfile(path.join(FOLDER, fname2)) and path.isfile(
-        path.join(FOLDER, fname3))):
-    print("creating " + "corner sym-tables...")
-    corner_classidx = ar.array('H', [INVALID] * N_CORNERS)  # idx -> classidx
-    corner_sym = ar.array('B', [0] * N_CORNERS)  # idx -> symmetry
-    corner_rep = ar.array('H', [0] * N_CORNERS_CLASS)  # classidx -> idx of representant
-
-    classidx = 0
-    cc = cb.CubieCube()
-    for cp in range(N_CORNERS):
-        cc.set_corners(cp)
-        if (cp + 1) % 8000 == 0:
-            print('.', end='', flush=True)
-
-        if corner_classidx[cp] == INVALID:
-            corner_classidx[cp] = classidx
-            corner_sym[cp] = 0
-            corner_rep[classidx] = cp
-        else:
-            continue
-        for s in range(N_SYM_D4h):  # conjugate representant by all 16 symmetries
-            ss = cb.CubieCube(symCube[inv_idx[s]].cp, symCube[inv_idx[s]].co, symCube[inv_idx[s]].ep,
-                              symCube[inv_idx[s]].eo)  # copy cube
-            ss.corner_multiply(cc)
-            ss.corner_multiply(symCube[s])  # s^-1*cc*s
-            cp_new = ss.get_corners()
-            if corner_classidx[cp_new] == INVALID:
-                corner_classidx[cp_new] = classidx
-                corner_sym[cp_new] = s
-        classidx += 1
-    print('')
-    fh = open(path.join(FOLDER, fname1), 'wb')
-    corner_classidx.tofile(fh)
-    fh.close()
-    fh = open(path.join(FOLDER, fname2), 'wb')
-    corner_sym.tofile(fh)
-    fh.close()
-    fh = open(path.join(FOLDER, fname3), 'wb')
-    corner_rep.tofile(fh)
-    fh.close()
-
-else:
-    print("loading " + "corner sym-tables...")
-
-    fh = open(path.join(FOLDER, fname1), 'rb')
-    corner_classidx = ar.array('H')
-    corner_classidx.fromfile(fh, N_CORNERS)
-    fh.close()
-    fh = open(path.join(FOLDER, fname2), 'rb')
-    corner_sym = ar.array('B')
-    corner_sym.fromfile(fh, N_CORNERS)
-    fh.close()
-    fh = open(path.join(FOLDER, fname3), 'rb')
-    corner_rep = ar.array('H')
-    corner_rep.fromfile(fh, N_CORNERS_CLASS)
-    fh.close()
-########################################################################################################################
+
+# The symmetry tables are created or loaded on the first access of their global variables, see tables.py.
+table_creators = {'mult_sym': create_mult_sym_table, 'conj_move': create_conj_move_table,
+                  'twist_conj': create_twist_conj_table, 'ud_edges_conj': create_ud_edges_conj_table,
+                  'flipslice_classidx': create_flipslice_sym_tables, 'flipslice_sym': create_flipslice_sym_tables,
+                  'flipslice_rep': create_flipslice_sym_tables, 'corner_classidx': create_corner_sym_tables,
+                  'corner_sym': create_corner_sym_tables, 'corner_rep': create_corner_sym_tables,
+                  'corner_tetrad_conj': create_corner_tetrad_conj_table}
+
+
+def __getattr__(name):
+    return tables.init_table(globals(), table_creators, name)
@@ -0,0 +1,469 @@
+# ################### Access to the table files which are created on the first run #####################################
+
+# Importing the solver modules does not touch any table. A table is created or loaded on the first access of its global
+# variable, for example mv.twist_move or pr.flipslice_twist_depth3. Call load() to initialize all tables at a time of
+# your choice, e.g. before a server accepts connections.
+# Several independent processes, for example server instances behind a load balancer, can share one copy of the tables
+# in a multiprocessing.shared_memory block. One process publishes the tables with create_store(), all solver processes
+# use load(mode='shm') and their table variables become read-only views into the block.
+# All tables can also be packed into a single bundle file with create_bundle(). If the file tables.bundle exists in the
+# table folder, the tables are taken from it instead of the single table files.
+# Some large tables are optional and trade memory for speed. They are only created or loaded if they are enabled with
+# an option of configure() or load(), see OPTIONS.
+
+import array as ar
+import json
+import mmap
+import os
+import sys
+import threading as thr
+import zlib
+from os import path, makedirs
+from twophase.defs import FOLDER, N_TWIST, N_SYM_D4h, N_UD_EDGES, N_FLIP, N_SLICE, N_FLIPSLICE_CLASS, N_CORNERS, \
+    N_CORNERS_CLASS, N_MOVE, N_SLICE_SORTED, N_PERM_4, N_U_EDGES_PHASE2, N_CORNER_TETRAD
+
+MODES = ('mmap', 'memory', 'build', 'shm')
+STORE_NAME = 'twophase_tables'  # default name of the shared memory block
+
+table_folder = FOLDER  # folder with the table files
+load_mode = 'mmap'  # 'mmap': map table files, 'memory': read table files into private arrays, 'build': create tables
+#                     'shm': use the tables in the shared memory block store_name
+store_name = STORE_NAME
+store = None  # the attached shared memory block in mode 'shm'
+created_stores = set()  # the names of the shared memory blocks created by this process
+store_index = None  # table file name -> (offset, number of bytes) of the table data in the shared memory block
+lock = thr.RLock()  # serializes the initialization of the tables, table creation may trigger loading of other tables
+
+uint32 = 'I' if ar.array('I').itemsize >= 4 else 'L'  # type codes differ between architectures
+
+# The table files in the folder with their array type codes and numbers of entries. Of the required tables phase1_prun
+# is by far the largest.
+FORMATS = {'conj_twist': ('H', N_TWIST * N_SYM_D4h),
+           'conj_ud_edges': ('H', N_UD_EDGES * N_SYM_D4h),
+           'fs_classidx': ('H', N_FLIP * N_SLICE),
+           'fs_sym': ('B', N_FLIP * N_SLICE),
+           'fs_rep': (uint32, N_FLIPSLICE_CLASS),
+           'co_classidx': ('H', N_CORNERS),
+           'co_sym': ('B', N_CORNERS),
+           'co_rep': ('H', N_CORNERS_CLASS),
+           'move_twist': ('H', N_TWIST * N_MOVE),
+           'move_flip': ('H', N_FLIP * N_MOVE),
+           'move_slice_sorted': ('H', N_SLICE_SORTED * N_MOVE),
+           'move_u_edges': ('H', N_SLICE_SORTED * N_MOVE),
+           'move_d_edges': ('H', N_SLICE_SORTED * N_MOVE),
+           'move_ud_edges': ('H', N_UD_EDGES * N_MOVE),
+           'move_corners': ('H', N_CORNERS * N_MOVE),
+           'phase1_prun': (uint32, N_FLIPSLICE_CLASS * N_TWIST // 16 + 1),
+           'phase2_prun': (uint32, N_CORNERS_CLASS * N_UD_EDGES // 16),
+           'phase2_cornsliceprun': ('b', N_CORNERS * N_PERM_4),
+           'phase2_edgemerge': ('H', N_U_EDGES_PHASE2 * N_PERM_4),
+           'phase2_succ': (uint32, N_CORNERS_CLASS * N_UD_EDGES),
+           'phase2_succ_mask': ('H', N_CORNERS_CLASS * N_UD_EDGES),
+           'phase2_prun_full': (uint32, N_CORNERS_CLASS * N_UD_EDGES // 16),
+           'phase2_prun_exact': (uint32, N_CORNERS_CLASS * N_UD_EDGES // 8),
+           'phase1_prun_huge': (uint32, N_FLIPSLICE_CLASS * N_TWIST * N_CORNER_TETRAD // 16 + 1)}
+OPTIONAL_FILES = ('phase2_succ', 'phase2_succ_mask', 'phase2_prun_full', 'phase2_prun_exact', 'phase1_prun_huge')
+FILES = tuple(fname for fname in FORMATS if fname not in OPTIONAL_FILES)
+
+# The options for the optional tables with their possible values, the first value is the default.
+# successors: the phase 2 successor table pruning.phase2_successors, 'mask' (223 MB) or 'full' (446 MB)
+# phase2_prun: the phase 2 pruning table, 'depth10' is only filled up to depth 10, 'full' is complete (28 MB, both
+#  depths mod 3), 'exact' holds the depths with 4 bits in pruning.corners_ud_edges_depth (56 MB)
+# phase1_prun: 'huge' adds the table pruning.flipslice_twist_tetrad_depth3 (2.5 GB), which bounds the length of the
+#  complete maneuver in phase 1
+OPTIONS = {'successors': ('off', 'mask', 'full'), 'phase2_prun': ('depth10', 'full', 'exact'),
+           'phase1_prun': ('normal', 'huge')}
+# the variables of the optional tables with their option and the option values which enable them
+OPTIONAL_TABLES = {'phase2_successors': ('successors', ('mask', 'full')),
+                   'phase2_successor_slot': ('successors', ('mask', 'full')),
+                   'corners_ud_edges_depth': ('phase2_prun', ('exact',)),
+                   'flipslice_twist_tetrad_depth3': ('phase1_prun', ('huge',))}
+DEPENDENT_TABLES = {'corners_ud_edges_depth3': 'phase2_prun'}  # always used, but the file depends on the option
+options = {name: values[0] for name, values in OPTIONS.items()}
+
+BUNDLE_FILE = 'tables.bundle'
+BUNDLE_MAGIC = b'TWOPHASE'
+BUNDLE_VERSION = 1
+bundle = None  # (file path, mmap, header, offset of the table data) of the opened bundle file
+
+
+def _modules():
+    """The modules which hold tables, in the order of their dependencies."""
+    import twophase.symmetries as sy
+    import twophase.moves as mv
+    import twophase.pruning as pr
+    import twophase.coord as coord
+    return sy, mv, pr, coord
+
+
+def configure(folder=None, mode=None, store=None, **kwargs):
+    """
+    Set the folder and the load mode for tables which are not yet initialized.
+    :param folder: The folder with the table files. Missing files are created there.
+    :param mode: 'mmap' maps the table files read-only into memory, so all processes on a host share one copy.
+     'memory' reads the table files into private arrays. 'build' creates all tables from scratch and overwrites the
+     table files. 'shm' attaches to the shared memory block published by create_store().
+    :param store: The name of the shared memory block for mode 'shm'
+    :param kwargs: Values for the options of the optional tables, see OPTIONS. Changing an option drops the tables
+     which depend on it.
+    """
+    global table_folder, load_mode, store_name
+    for name, value in kwargs.items():
+        if name not in OPTIONS:
+            raise ValueError('unknown option ' + name + ', the options are ' + ', '.join(OPTIONS))
+        if value is None:
+            continue
+        if value not in OPTIONS[name]:
+            raise ValueError(name + ' must be one of ' + ', '.join(OPTIONS[name]))
+        if value != options[name]:
+            options[name] = value
+            for module in _modules():
+                for table in module.table_creators:
+                    if OPTIONAL_TABLES.get(table, (None,))[0] == name or DEPENDENT_TABLES.get(table) == name:
+                        vars(module).pop(table, None)
+    if mode is not None:
+        if mode not in MODES:
+            raise ValueError('mode must be one of ' + ', '.join(MODES))
+        load_mode = mode
+    if folder is not None:
+        table_folder = folder
+    if store is not None:
+        store_name = store
+
+
+def load(folder=None, mode=None, store=None, **kwargs):
+    """
+    Initialize all tables now instead of on first access. With missing table files this takes half an hour or longer.
+    :param folder: The folder with the table files, see configure
+    :param mode: 'mmap', 'memory', 'build' or 'shm', see configure
+    :param store: The name of the shared memory block for mode 'shm'
+    :param kwargs: Values for the options of the optional tables, see configure. Only enabled optional tables are
+     initialized.
+    """
+    with lock:
+        if folder not in (None, table_folder) or mode not in (None, load_mode) or store not in (None, store_name):
+            unload()
+        configure(folder, mode, store, **kwargs)
+        for module in _modules():
+            for name in module.table_creators:
+                if enabled(name):
+                    getattr(module, name)
+
+
+def enabled(name):
+    """Check if the table variable name is used with the current options. Tables which are not optional always are."""
+    if name not in OPTIONAL_TABLES:
+        return True
+    option, values = OPTIONAL_TABLES[name]
+    return options[option] in values
+
+
+def unload():
+    """Drop all initialized tables. They are initialized again on the next access."""
+    global bundle
+    with lock:
+        bundle = None
+        for module in _modules():
+            for name in module.table_creators:
+                vars(module).pop(name, None)
+
+
+def status():
+    """Return a dictionary which tells for each table variable if it is initialized."""
+    st = {}
+    for module in _modules():
+        for name in module.table_creators:
+            st[module.__name__.split('.')[-1] + '.' + name] = name in vars(module)
+    return st
+
+
+def missing_files():
+    """Return the names of the table files which do not exist yet. Cheap, suitable for health checks. Optional tables
+    are not considered."""
+    return [fname for fname in FILES if not available(fname)]
+
+
+def available(fname):
+    """Check if the table file fname exists in the bundle file or in the table folder."""
+    return in_bundle(fname) or path.isfile(path.join(table_folder, fname))
+
+
+def available_files():
+    """The names of all tables which can be published in a shared memory block or packed into a bundle: all required
+    tables and the optional tables which have been created."""
+    return FILES + tuple(fname for fname in OPTIONAL_FILES if available(fname))
+
+
+def init_table(module_globals, table_creators, name):
+    """Create or load the table with variable name on first access. Used by the module level __getattr__ functions."""
+    if name not in table_creators:
+        raise AttributeError('module ' + module_globals['__name__'] + ' has no attribute ' + name)
+    with lock:
+        if name not in module_globals:  # another thread may have initialized the table meanwhile
+            table_creators[name]()
+    return module_globals[name]
+
+
+def must_create(*fnames):
+    """Check if a table has to be created because a file is missing or the mode is 'build'."""
+    if load_mode == 'shm':
+        return False  # the tables in the shared memory block are complete
+    if load_mode != 'build' and all(in_bundle(fname) for fname in fnames):
+        return False
+    return load_mode == 'build' or not all(path.isfile(path.join(table_folder, fname)) for fname in fnames)
+
+
+def save_table(fname, table):
+    """Write a freshly created table to its file."""
+    if not path.exists(table_folder):
+        makedirs(table_folder)
+    with open(path.join(table_folder, fname), 'wb') as fh:
+        table.tofile(fh)
+
+
+def load_table(fname, typecode, count):
+    """Load a table file according to the current mode."""
+    if load_mode == 'shm':
+        return store_table(fname, typecode, count)
+    if in_bundle(fname):
+        return bundle_table(fname, typecode, count)
+    if load_mode == 'memory':
+        return read_table(table_folder, fname, typecode, count)
+    return map_table(table_folder, fname, typecode, count)
+
+
+def read_table(folder, fname, typecode, count):
+    """Read a table file into an array.array which is private to the process."""
+    table = ar.array(typecode)
+    with open(path.join(folder, fname), 'rb') as fh:
+        table.fromfile(fh, count)
+    return table
+
+
+def map_table(folder, fname, typecode, count):
+    """
+    Map a table file read-only into memory. The returned memoryview is indexed like an array.array of the same type
+    code. Pages are loaded lazily by the operating system and all processes which map the same file share a single
+    physical copy of the table.
+    :param folder: The folder with the table files
+    :param fname: The name of the table file
+    :param typecode: The array type code of the table entries
+    :param count: The number of table entries
+    :return: A read-only memoryview of the table
+    """
+    nbytes = count * ar.array(typecode).itemsize
+    with open(path.join(folder, fname), 'rb') as fh:
+        if path.getsize(path.join(folder, fname)) < nbytes:
+            raise EOFError('table file ' + fname + ' is too short, delete it to create it again')
+        mm = mmap.mmap(fh.fileno(), nbytes, access=mmap.ACCESS_READ)  # the mapping stays valid after closing fh
+    return memoryview(mm).cast(typecode)
+
+
+# ################################## The shared memory table store ####################################################
+
+# The shared memory block starts with the length of a JSON index (8 bytes, little endian) followed by the index, which
+# maps each table file name to the offset and the size of its data in the block. The table data are 8-byte aligned.
+
+def create_store(name=STORE_NAME):
+    """
+    Publish all tables in a new shared memory block. Missing table files are created first, optional tables are
+    included if they have been created. The block exists until remove_store() is called or the creating process ends,
+    so the creating process has to keep running as long as solver processes use the tables.
+    :param name: The name of the shared memory block
+    :return: The multiprocessing.shared_memory.SharedMemory object of the block
+    """
+    with lock:
+        if load_mode == 'shm':
+            raise ValueError("create_store needs the table files, the load mode must not be 'shm'")
+        from multiprocessing import shared_memory  # Python >= 3.8, only needed for the shared memory store
+        load()  # creates missing table files
+        index = {}
+        offset = 0
+        for fname in available_files():
+            size = len(raw_table(fname))
+            index[fname] = (offset, size)
+            offset += (size + 7) // 8 * 8
+        header = json.dumps(index).encode()
+        start = (8 + len(header) + 7) // 8 * 8
+        shm = shared_memory.SharedMemory(name, create=True, size=start + offset)
+        created_stores.add(shm.name)
+        shm.buf[:8] = len(header).to_bytes(8, 'little')
+        shm.buf[8:8 + len(header)] = header
+        for fname, (offset, size) in index.items():
+            shm.buf[start + offset:start + offset + size] = raw_table(fname)
+        return shm
+
+
+def remove_store(name=STORE_NAME):
+    """Remove the shared memory block. Processes which already use the tables keep their views."""
+    shm = attach_store(name)
+    shm.unlink()
+
+
+def attach_store(name):
+    """Attach to an existing shared memory block without taking over the responsibility for its removal."""
+    from multiprocessing import shared_memory, resource_tracker  # Python >= 3.8
+
+    class AttachedStore(shared_memory.SharedMemory):
+        """A shared memory block which stays mapped until the process ends, the table variables are views into it."""
+
+        def close(self):
+            pass  # closing the block fails while views exist
+
+    try:
+        shm = AttachedStore(name, track=False)  # Python >= 3.13
+    except TypeError:
+        shm = AttachedStore(name)
+        if shm.name not in created_stores and hasattr(resource_tracker, 'unregister') and hasattr(shm, '_name'):
+            # Python 3.8 to 3.12 register each attached block with the resource tracker, which removes the block when
+            # this process ends although the creating process still publishes it, see CPython issue gh-82300
+            # (bpo-38119). Python 3.13 added track=False for this. unregister and _name are CPython internals.
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def store_table(fname, typecode, count):
+    """Return a read-only view of a table in the shared memory block store_name."""
+    global store, store_index
+    if store is None or store.name != store_name:
+        shm = attach_store(store_name)
+        n = int.from_bytes(shm.buf[:8], 'little')
+        start = (8 + n + 7) // 8 * 8
+        index = json.loads(bytes(shm.buf[8:8 + n]))
+        store_index = {fname: (start + offset, size) for fname, (offset, size) in index.items()}
+        store = shm
+    if fname not in store_index:
+        raise ValueError('table ' + fname + ' is not in shared memory block ' + store_name)
+    offset, size = store_index[fname]
+    nbytes = count * ar.array(typecode).itemsize
+    if size < nbytes:
+        raise EOFError('table ' + fname + ' in shared memory block ' + store_name + ' is too short')
+    return store.buf[offset:offset + nbytes].toreadonly().cast(typecode)
+
+
+# ################################## The table bundle file ############################################################
+
+# The bundle file starts with BUNDLE_MAGIC and the length of a JSON header (4 bytes, little endian) followed by the
+# header. The header holds the format version, the byte order and for each table its type code, item size, number of
+# entries, offset, size and CRC-32 checksum. The table data follow 8-byte aligned.
+# Loading a table only checks the header, so the pages of a mapped bundle are read when the search needs them.
+# verify_bundle() checks the CRC-32 checksums of all tables, which reads the whole file.
+
+def has_bundle():
+    """Check if there is a bundle file in the table folder."""
+    return path.isfile(path.join(table_folder, BUNDLE_FILE))
+
+
+def in_bundle(fname):
+    """Check if there is a bundle file in the table folder which holds the table fname."""
+    return has_bundle() and fname in open_bundle()[2]['tables']
+
+
+def raw_table(fname):
+    """Return the bytes of a table from the bundle file or the table file."""
+    if has_bundle():
+        fpath, mm, header, start = open_bundle()
+        if fname not in header['tables']:
+            if fname in OPTIONAL_FILES:  # an optional table created after the bundle
+                with open(path.join(table_folder, fname), 'rb') as fh:
+                    return fh.read()
+            raise ValueError('table ' + fname + ' is missing in ' + fpath)
+        t = header['tables'][fname]
+        return memoryview(mm)[start + t['offset']:start + t['offset'] + t['size']]
+    with open(path.join(table_folder, fname), 'rb') as fh:
+        return fh.read()
+
+
+def create_bundle(target=None):
+    """
+    Pack all tables into one bundle file. Missing tables are created first. Optional tables are included if they have
+    been created.
+    :param target: The path of the bundle file, by default tables.bundle in the table folder
+    """
+    global bundle
+    if target is None:
+        target = path.join(table_folder, BUNDLE_FILE)
+    with lock:
+        load()  # creates missing table files
+        entries = {}
+        offset = 0
+        for fname in available_files():
+            typecode, count = FORMATS[fname]
+            data = raw_table(fname)
+            entries[fname] = {'typecode': typecode, 'itemsize': ar.array(typecode).itemsize, 'count': count,
+                              'offset': offset, 'size': len(data), 'crc32': zlib.crc32(data)}
+            offset += (len(data) + 7) // 8 * 8
+        header = json.dumps({'version': BUNDLE_VERSION, 'byteorder': sys.byteorder, 'tables': entries}).encode()
+        start = (len(BUNDLE_MAGIC) + 4 + len(header) + 7) // 8 * 8
+        with open(target + '.tmp', 'wb') as fh:  # a partially written bundle never replaces a complete one
+            fh.write(BUNDLE_MAGIC + len(header).to_bytes(4, 'little') + header)
+            for fname, t in entries.items():
+                fh.seek(start + t['offset'])
+                fh.write(raw_table(fname))
+            fh.truncate(start + offset)
+        os.replace(target + '.tmp', target)
+        bundle = None  # the tables already loaded keep the mapping of a replaced bundle file
+
+
+def open_bundle():
+    """Map the bundle file of the table folder into memory and check its header. The mapping is kept."""
+    global bundle
+    fpath = path.join(table_folder, BUNDLE_FILE)
+    if bundle is not None and bundle[0] == fpath:
+        return bundle
+    n = len(BUNDLE_MAGIC)
+    if path.getsize(fpath) < n + 4:
+        raise ValueError(fpath + ' is not a table bundle')
+    with open(fpath, 'rb') as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:n] != BUNDLE_MAGIC:
+        raise ValueError(fpath + ' is not a table bundle')
+    length = int.from_bytes(mm[n:n + 4], 'little')
+    try:
+        header = json.loads(mm[n + 4:n + 4 + length])
+    except ValueError:
+        raise ValueError('the header of ' + fpath + ' is damaged')
+    if header['version'] != BUNDLE_VERSION:
+        raise ValueError(fpath + ' has format version ' + str(header['version']) + ', expected '
+                         + str(BUNDLE_VERSION))
+    if header['byteorder'] != sys.byteorder:
+        raise ValueError(fpath + ' was created on a ' + header['byteorder'] + ' endian machine')
+    start = (n + 4 + length + 7) // 8 * 8
+    for fname, t in header['tables'].items():
+        if start + t['offset'] + t['size'] > len(mm):
+            raise EOFError(fpath + ' is truncated, table ' + fname + ' is incomplete')
+    bundle = (fpath, mm, header, start)
+    return bundle
+
+
+def verify_bundle():
+    """
+    Check the CRC-32 checksums of all tables in the bundle file of the table folder. This reads the whole file, so it
+    is not done when the tables are loaded.
+    :return: The names of the checked tables
+    """
+    fpath, mm, header, start = open_bundle()
+    for fname, t in header['tables'].items():
+        if zlib.crc32(memoryview(mm)[start + t['offset']:start + t['offset'] + t['size']]) != t['crc32']:
+            raise ValueError('table ' + fname + ' in ' + fpath + ' is damaged, checksum error')
+    return list(header['tables'])
+
+
+def bundle_table(fname, typecode, count):
+    """
+    Return a table of the bundle file. Only the header entry of the table is checked, see verify_bundle.
+    :return: A read-only memoryview into the mapped bundle file, or an array.array in mode 'memory'
+    """
+    fpath, mm, header, start = open_bundle()
+    data = raw_table(fname)
+    t = header['tables'][fname]
+    itemsize = ar.array(typecode).itemsize
+    if t['typecode'] != typecode or t['itemsize'] != itemsize or t['count'] != count or \
+            t['size'] < count * itemsize or t['offset'] % 8 != 0:
+        raise ValueError('table ' + fname + ' in ' + fpath + ' has the wrong format')
+    data = data[:count * itemsize]
+    if load_mode == 'memory':
+        table = ar.array(typecode)
+        table.frombytes(data)
+        return table
+    return data.cast(typecode)
@@ -0,0 +1,4 @@
+from setuptools import setup, Extension
+
+# The compiled search kernel is optional. If it cannot be built, the solver uses the pure Python search.
+setup(ext_modules=[Extension('twophase.csearch', ['package_src/twophase/csearch.c'], optional=True)])
@@ -0,0 +1,53 @@
+# The worker processes of build_tables must create the same table files as the serial creation on the first run of the
+# solver. The main process creates the serial tables while the pool of build_tables.worker_pool creates the same tables
+# in another folder, so the pool replaces its workers while the main thread holds tables.lock, as in build_tables.build.
+# The tables are created from scratch, no prebuilt tables are needed.
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'package_src')
+
+# the tables which are created in a few seconds
+SUBSET = [('symmetries', 'twist_conj'), ('symmetries', 'corner_classidx'), ('moves', 'flip_move'),
+          ('moves', 'twist_move'), ('moves', 'slice_sorted_move'), ('moves', 'u_edges_move'),
+          ('moves', 'd_edges_move'), ('coord', 'u_edges_plus_d_edges_to_ud_edges')]
+
+BUILD = '''
+import importlib, sys
+import twophase.build_tables as bt
+import twophase.tables as tables
+serial, parallel, subset = sys.argv[1], sys.argv[2], eval(sys.argv[3])
+tables.configure(serial, 'mmap')
+with bt.worker_pool(2) as pool:
+    results = bt.create_tables(pool, subset, parallel)
+    for module_name, name in subset:
+        getattr(importlib.import_module('twophase.' + module_name), name)
+    for r in results:
+        r.get()
+'''
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_tables_identical(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            serial, parallel = os.path.join(tmp, 'serial'), os.path.join(tmp, 'parallel')
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC, os.environ.get('PYTHONPATH', '')]))
+            # a deadlocked worker makes the build wait forever
+            res = subprocess.run([sys.executable, '-c', BUILD, serial, parallel, repr(SUBSET)], env=env,
+                                 capture_output=True, text=True, timeout=600)
+            self.assertEqual(res.returncode, 0, res.stderr)
+            files = sorted(os.listdir(serial))
+            self.assertTrue(files)
+            self.assertEqual(sorted(os.listdir(parallel)), files)
+            for fname in files:
+                with open(os.path.join(serial, fname), 'rb') as fs, open(os.path.join(parallel, fname), 'rb') as fp:
+                    self.assertEqual(fs.read(), fp.read(), fname)
+
+
+if __name__ == '__main__':
+    unittest.main()
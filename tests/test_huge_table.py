@@ -0,0 +1,91 @@
+# The huge phase 1 pruning table must give the distance to the positions with solved phase 1 and the corners URF, ULB,
+# DLF and DRB at their places. The check is done on a reduced set of cubes: for cubes close to this goal the distance is
+# computed by a breadth first search on the coordinates flip, twist, slice and corner_tetrad, which gives the phase 1
+# distance of get_depth_phase1 too. The tables are taken from the folder in the environment variable TWOPHASE_TABLES
+# (default: twophase in the working directory) and the tests are skipped if the huge table has not been created yet.
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'package_src'))
+import twophase.tables as tables  # noqa: E402
+import twophase.bench as bench  # noqa: E402
+import twophase.coord as coord  # noqa: E402
+import twophase.cubie as cubie  # noqa: E402
+import twophase.moves as mv  # noqa: E402
+from twophase.defs import N_MOVE, N_PERM_4  # noqa: E402
+from twophase.enums import Move  # noqa: E402
+
+TABLES = os.path.abspath(os.environ.get('TWOPHASE_TABLES', 'twophase'))
+tables.configure(TABLES)
+
+MAX_DEPTH = 4  # the depth of the breadth first search
+PHASE2_MOVES = (Move.U1, Move.U2, Move.U3, Move.R2, Move.F2, Move.D1, Move.D2, Move.D3, Move.L2, Move.B2)
+
+
+def distances(co):
+    """Return the distances of CoordCube co to H and to H with solved corner tetrad, None if larger than MAX_DEPTH."""
+    dist, dist_tetrad = None, None
+    layer = {(co.flip, co.twist, co.slice_sorted, co.corner_tetrad)}
+    seen = set(layer)
+    for depth in range(MAX_DEPTH + 1):
+        for flip, twist, slice_sorted, tetrad in layer:
+            if flip == 0 and twist == 0 and slice_sorted < N_PERM_4:
+                dist = depth if dist is None else dist
+                if tetrad == 0:
+                    return dist, depth
+        next_layer = set()
+        for flip, twist, slice_sorted, tetrad in layer:
+            for m in Move:
+                state = (mv.flip_move[N_MOVE * flip + m], mv.twist_move[N_MOVE * twist + m],
+                         mv.slice_sorted_move[N_MOVE * slice_sorted + m], mv.corner_tetrad_move[N_MOVE * tetrad + m])
+                if state not in seen:
+                    seen.add(state)
+                    next_layer.add(state)
+        layer = next_layer
+    return dist, dist_tetrad
+
+
+@unittest.skipIf(tables.missing_files() or not tables.available('phase1_prun_huge'),
+                 'the huge phase 1 table has not been created in ' + TABLES)
+class TestHugeTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        tables.configure(phase1_prun='huge')
+
+    @classmethod
+    def tearDownClass(cls):
+        tables.configure(phase1_prun='normal')
+
+    def test_close_cubes(self):
+        # phase 2 cubes with a few further moves, so both distances are small
+        rng = random.Random(3)
+        for i in range(25):
+            cc = bench.scramble(rng, 12, PHASE2_MOVES)
+            cc.multiply(bench.scramble(rng, i % (MAX_DEPTH + 1)))
+            co = coord.CoordCube(cc)
+            dist, dist_tetrad = distances(co)
+            with self.subTest(i=i):
+                self.assertEqual(co.get_depth_phase1(), dist)
+                if dist_tetrad is None:
+                    self.assertGreater(co.get_depth_phase1_huge(), MAX_DEPTH)
+                else:
+                    self.assertEqual(co.get_depth_phase1_huge(), dist_tetrad)
+
+    def test_random_cubes(self):
+        # the huge table adds the corner tetrad to the goal, so its distance is at least the phase 1 distance
+        rng = random.Random(4)
+        for i in range(100):
+            cc = cubie.CubieCube()
+            cc.randomize(rng)
+            co = coord.CoordCube(cc)
+            with self.subTest(i=i):
+                self.assertLessEqual(co.get_depth_phase1(), co.get_depth_phase1_huge())
+                self.assertLessEqual(co.get_depth_phase1_huge(), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# Each table getter must create or load its table on the first access, without tables.load(). Every check runs in a
+# fresh interpreter, so the getter is really the first access. The tables are taken from the folder in the environment
+# variable TWOPHASE_TABLES (default: twophase in the working directory) and the tests are skipped if the required
+# tables have not been created yet.
+
+import os
+import subprocess
+import sys
+import unittest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'package_src')
+sys.path.insert(0, SRC)
+import twophase.tables as tables  # noqa: E402
+
+TABLES = os.path.abspath(os.environ.get('TWOPHASE_TABLES', 'twophase'))
+tables.configure(TABLES)
+
+SCRAMBLED = '''
+import twophase.cubie as cubie
+cc = cubie.CubieCube()
+for m in (0, 4, 7, 10, 14, 2, 17, 9):
+    cc.multiply(cubie.moveCube[m])
+'''
+
+
+def run_fresh(code, **options):
+    """Run code in a fresh interpreter with the table folder and options configured, return its output."""
+    setup = 'import twophase.tables as tables\ntables.configure(%r, **%r)\n' % (TABLES, options)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC, os.environ.get('PYTHONPATH', '')]))
+    res = subprocess.run([sys.executable, '-c', setup + code], env=env, capture_output=True, text=True)
+    if res.returncode != 0:
+        raise AssertionError(res.stderr)
+    return res.stdout.split()[-1]
+
+
+@unittest.skipIf(tables.missing_files(), 'the tables have not been created in ' + TABLES)
+class TestFirstAccess(unittest.TestCase):
+
+    def test_get_flipslice_twist_depth3(self):
+        self.assertEqual(run_fresh('import twophase.pruning as pr\nprint(pr.get_flipslice_twist_depth3(0))'), '0')
+
+    def test_get_corners_ud_edges_depth3(self):
+        self.assertEqual(run_fresh('import twophase.pruning as pr\nprint(pr.get_corners_ud_edges_depth3(0))'), '0')
+
+    def test_get_corners_ud_edges_depth(self):
+        if not tables.available('phase2_prun_exact'):
+            self.skipTest('the exact phase 2 table has not been created')
+        out = run_fresh('import twophase.pruning as pr\nprint(pr.get_corners_ud_edges_depth(0))', phase2_prun='exact')
+        self.assertEqual(out, '0')
+
+    def test_get_flipslice_twist_tetrad_depth3(self):
+        if not tables.available('phase1_prun_huge'):
+            self.skipTest('the huge phase 1 table has not been created')
+        out = run_fresh('import twophase.pruning as pr\nprint(pr.get_flipslice_twist_tetrad_depth3(0))',
+                        phase1_prun='huge')
+        self.assertEqual(out, '0')
+
+    def test_get_phase2_successors(self):
+        if not tables.available('phase2_succ_mask'):
+            self.skipTest('the phase 2 successor table has not been created')
+        out = run_fresh('import twophase.pruning as pr\nprint(len(pr.get_phase2_successors(0, 0, 0)))',
+                        successors='mask')
+        self.assertEqual(out, '0')  # no move decreases the depth of the solved cube
+
+    def test_get_depth_phase1(self):
+        out = run_fresh(SCRAMBLED + 'import twophase.coord as coord\nprint(coord.CoordCube(cc).get_depth_phase1())')
+        self.assertTrue(0 < int(out) <= 8)
+
+    def test_get_depth_phase1_huge(self):
+        if not tables.available('phase1_prun_huge'):
+            self.skipTest('the huge phase 1 table has not been created')
+        code = 'import twophase.coord as coord\nprint(coord.CoordCube(cc).get_depth_phase1_huge())'
+        out = run_fresh(SCRAMBLED + code, phase1_prun='huge')
+        self.assertTrue(0 < int(out) <= 8)
+
+    def test_get_depth_phase2(self):
+        code = ('import twophase.coord as coord\nimport twophase.moves as mv\n'
+                'corners = mv.corners_move[18 * 0 + 1]\nud_edges = mv.ud_edges_move[18 * 0 + 1]\n'
+                'print(coord.CoordCube.get_depth_phase2(corners, ud_edges))')
+        self.assertEqual(run_fresh(code), '1')  # after U2
+
+
+if __name__ == '__main__':
+    unittest.main()
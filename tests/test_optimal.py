@@ -0,0 +1,95 @@
+# solve_optimal must return a maneuver which solves the cube and whose length is the distance of the cube to the solved
+# cube. For short scrambles the distance is computed by brute force: BALL holds every cube within BALL_DEPTH moves with
+# its distance, and a cube within 2 * BALL_DEPTH moves is the product of two cubes of BALL. The tables are taken from
+# the folder in the environment variable TWOPHASE_TABLES (default: twophase in the working directory) and the tests are
+# skipped if the tables have not been created yet.
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'package_src'))
+import twophase.tables as tables  # noqa: E402
+import twophase.bench as bench  # noqa: E402
+import twophase.cubie as cubie  # noqa: E402
+import twophase.optimal as optimal  # noqa: E402
+from twophase.enums import Move  # noqa: E402
+
+TABLES = os.path.abspath(os.environ.get('TWOPHASE_TABLES', 'twophase'))
+tables.configure(TABLES)
+
+BALL_DEPTH = 4
+PHASE2_MOVES = (Move.U1, Move.U2, Move.U3, Move.R2, Move.F2, Move.D1, Move.D2, Move.D3, Move.L2, Move.B2)
+
+
+def ball(depth):
+    """Return the dictionary of the cubes (the bytes of CubieCube.data) within depth moves and their distances."""
+    dist = {bytes(cubie.CubieCube().data): 0}
+    layer = list(dist)
+    for d in range(1, depth + 1):
+        next_layer = []
+        for key in layer:
+            for m in Move:
+                cc = cubie.CubieCube()
+                cc.data[:] = key
+                cc.multiply(cubie.moveCube[m])
+                new = bytes(cc.data)
+                if new not in dist:
+                    dist[new] = d
+                    next_layer.append(new)
+        layer = next_layer
+    return dist
+
+
+BALL = ball(BALL_DEPTH)
+
+
+def distance(cc):
+    """Return the distance of cubie cube cc to the solved cube, cc must be within 2 * BALL_DEPTH moves."""
+    best = None
+    prod = cubie.CubieCube()
+    for key, d in BALL.items():
+        prod.data[:] = cc.data
+        other = cubie.CubieCube()
+        other.data[:] = key
+        prod.multiply(other)
+        d2 = BALL.get(bytes(prod.data))
+        if d2 is not None and (best is None or d + d2 < best):
+            best = d + d2
+    return best
+
+
+@unittest.skipIf(tables.missing_files(), 'the tables have not been created in ' + TABLES)
+class TestSolveOptimal(unittest.TestCase):
+
+    def check(self, cc):
+        man = optimal.solve_optimal(cc.to_facelet_cube().to_string())
+        moves = man.split()[:-1]
+        self.assertEqual(man.split()[-1], '(' + str(len(moves)) + 'f)')
+        solved = cubie.CubieCube()
+        solved.data[:] = cc.data
+        for m in moves:
+            solved.multiply(cubie.moveCube[Move[m]])
+        self.assertEqual(solved, cubie.CubieCube(), man)
+        self.assertEqual(len(moves), distance(cc), man)
+
+    def test_solved(self):
+        self.assertEqual(optimal.solve_optimal(cubie.CubieCube().to_facelet_cube().to_string()), '(0f)')
+
+    def test_scrambles(self):
+        rng = random.Random(1)
+        for length in range(1, 2 * BALL_DEPTH + 1):
+            with self.subTest(length=length):
+                self.check(bench.scramble(rng, length))
+
+    def test_phase2_scrambles(self):
+        # the shortest maneuvers of cubes in the subgroup H may leave H, the search must not miss them
+        rng = random.Random(2)
+        for length in range(4, 2 * BALL_DEPTH + 1):
+            with self.subTest(length=length):
+                self.check(bench.scramble(rng, length, PHASE2_MOVES))
+
+
+if __name__ == '__main__':
+    unittest.main()